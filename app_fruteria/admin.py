@@ -1,18 +1,57 @@
 # tienda/admin.py
 
 from django.contrib import admin
-from .models import Sucursal, Categoria, Producto, Oferta, PerfilCliente, Compra, DetalleCompra
+from .models import Sucursal, Categoria, Producto, Oferta, PerfilCliente, Compra, DetalleCompra, Existencia
 
 # Registra todos tus modelos para que aparezcan en el panel de administración
 admin.site.register(Sucursal)
-admin.site.register(Categoria)
+
+
+@admin.register(Categoria)
+class CategoriaAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'slug')
+    prepopulated_fields = {'slug': ('nombre',)}
+
+
 admin.site.register(Producto)
 admin.site.register(Oferta)
 
+
+@admin.register(Existencia)
+class ExistenciaAdmin(admin.ModelAdmin):
+    # Los kilos se editan desde la lista; el checkout los descuenta (pedidos.py)
+    list_display = ('producto', 'sucursal', 'kg_disponibles')
+    list_editable = ('kg_disponibles',)
+    list_select_related = ('producto', 'sucursal')
+    list_filter = ('sucursal',)
+    search_fields = ('producto__nombre',)
+    raw_id_fields = ('producto',)
+
 # Opcional: Para el PerfilCliente, lo registras junto al modelo de Usuario
 # admin.site.register(PerfilCliente) 
 
-# Puedes registrar Compra y DetalleCompra con opciones de visualización más avanzadas,
-# pero para empezar, un registro simple es suficiente.
-admin.site.register(Compra)
-admin.site.register(DetalleCompra)
\ No newline at end of file
+class DetalleCompraInline(admin.TabularInline):
+    model = DetalleCompra
+    fields = ('producto', 'nombre_producto', 'cantidad', 'precio_unitario', 'subtotal')
+    readonly_fields = ('nombre_producto', 'subtotal')
+    raw_id_fields = ('producto',)
+    extra = 0
+
+
+@admin.register(Compra)
+class CompraAdmin(admin.ModelAdmin):
+    # Las columnas salen de la propia compra (num_lineas y resumen guardados al comprar)
+    list_display = ('id', 'cliente', 'fecha_compra', 'estado', 'num_lineas', 'resumen', 'total_compra')
+    list_select_related = ('cliente',)
+    list_filter = ('estado',)
+    search_fields = ('=id', 'cliente__username', 'cliente__email')
+    date_hierarchy = 'fecha_compra'
+    raw_id_fields = ('cliente',)
+    inlines = [DetalleCompraInline]
+
+
+@admin.register(DetalleCompra)
+class DetalleCompraAdmin(admin.ModelAdmin):
+    list_display = ('compra', 'nombre_producto', 'cantidad', 'precio_unitario', 'subtotal')
+    readonly_fields = ('nombre_producto', 'subtotal')
+    raw_id_fields = ('compra', 'producto')
\ No newline at end of file
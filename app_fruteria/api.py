@@ -0,0 +1,276 @@
+# app_fruteria/api.py
+"""
+API JSON de solo lectura del catálogo.
+
+    GET /api/productos/                 lista paginada con cursor
+    GET /api/productos/<id>/            detalle de un producto
+    GET /api/categorias/                categorías con su número de productos
+    GET /api/ofertas/                   ofertas vigentes hoy
+    GET /api/buscar/?q=texto            búsqueda por texto (busqueda.py)
+
+Filtros de /api/productos/:
+
+    ?categoria=<id|nombre|slug>  ?en_oferta=1|0  ?precio_min=N  ?precio_max=N
+    ?orden=nombre|precio|-precio|id     ?limite=N (máx. FRUTERIA_API_LIMITE_MAXIMO)
+    ?cursor=<valor de "cursor_siguiente" de la página anterior>
+
+La paginación es por llave (keyset, ver paginacion.py): el costo de una
+página no depende de qué tan lejos esté (con OFFSET, SQLite recorre y
+descarta todas las filas anteriores).
+
+Las filas se leen con ``.values()`` (sin crear instancias del modelo) y el
+JSON se guarda en la caché con la misma clave versionada del HTML del
+catálogo (ver cache.py). El ETag se deriva de esa clave, así que es igual
+mientras no cambie el catálogo ni el día: un cliente o CDN que manda
+``If-None-Match`` recibe 304 sin tocar la base de datos.
+"""
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.http.response import HttpResponseBase
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_safe
+
+from . import busqueda
+from . import categorias as categorias_catalogo
+from . import ofertas as motor_ofertas
+from .cache import TIEMPO_CACHE, clave_fragmento
+from .dinero import CENTAVO
+from .models import Categoria, Oferta, Producto
+from .paginacion import ORDENES, CursorInvalido, Pagina
+
+# Tamaño de página por defecto y máximo de /api/productos/
+LIMITE_PAGINA = getattr(settings, 'FRUTERIA_API_LIMITE', 50)
+LIMITE_MAXIMO = getattr(settings, 'FRUTERIA_API_LIMITE_MAXIMO', 200)
+
+# max-age de las respuestas; con 0 el cliente/CDN revalida siempre (304)
+MAX_AGE = getattr(settings, 'FRUTERIA_API_MAX_AGE', 0)
+
+CAMPOS_LISTA = (
+    'id', 'nombre', 'precio', 'precio_efectivo', 'oferta_vigente', 'oferta_id',
+    'categoria_id', 'categoria__nombre', 'imagen',
+)
+CAMPOS_DETALLE = CAMPOS_LISTA + (
+    'descripcion', 'sucursal_id', 'oferta__nombre', 'oferta__porcentaje_descuento', 'oferta__fecha_fin',
+)
+
+
+class ParametroInvalido(Exception):
+    """Un parámetro de la consulta no se puede interpretar (respuesta 400)."""
+
+
+# --------------------------------------------------------------------------
+# ETag, caché y serialización
+# --------------------------------------------------------------------------
+
+def respuesta_versionada(nombre):
+    """
+    Decorador de las vistas de la API. La vista devuelve datos (dict/list) y
+    aquí se serializan, se cachean bajo la clave versionada del catálogo y se
+    responde con un ETag fuerte; si la vista devuelve una respuesta (404) se
+    entrega tal cual, sin caché.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            clave = clave_fragmento(f'api-{nombre}', [request.path, request.GET.urlencode()])
+            etag = '"%s"' % hashlib.md5(clave.encode('utf-8'), usedforsecurity=False).hexdigest()
+
+            coincidencias = parse_etags(request.headers.get('If-None-Match', ''))
+            if etag in coincidencias or '*' in coincidencias:
+                return _con_cabeceras(HttpResponseNotModified(), etag)
+
+            cuerpo = cache.get(clave)
+            if cuerpo is None:
+                try:
+                    datos = vista(request, *args, **kwargs)
+                except ParametroInvalido as e:
+                    return JsonResponse({'error': str(e)}, status=400)
+                if isinstance(datos, HttpResponseBase):
+                    return datos
+                cuerpo = json.dumps(
+                    datos, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'),
+                ).encode('utf-8')
+                cache.set(clave, cuerpo, TIEMPO_CACHE)
+            return _con_cabeceras(HttpResponse(cuerpo, content_type='application/json'), etag)
+        return envoltura
+    return decorador
+
+
+def _con_cabeceras(response, etag):
+    response.headers['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=MAX_AGE, must_revalidate=True)
+    return response
+
+
+def _url_imagen(nombre):
+    return Producto._meta.get_field('imagen').storage.url(nombre) if nombre else None
+
+
+def _producto_json(fila):
+    """Fila de ``.values(*CAMPOS_LISTA)`` -> dict de la respuesta."""
+    return {
+        'id': fila['id'],
+        'nombre': fila['nombre'],
+        'precio': fila['precio'],
+        # SQLite devuelve la expresión sin los ceros finales ('18')
+        'precio_final': fila['precio_efectivo'].quantize(CENTAVO),
+        'en_oferta': fila['oferta_vigente'],
+        'oferta': fila['oferta_id'] if fila['oferta_vigente'] else None,
+        'categoria': (
+            {'id': fila['categoria_id'], 'nombre': fila['categoria__nombre']}
+            if fila['categoria_id'] else None
+        ),
+        'imagen': _url_imagen(fila['imagen']),
+    }
+
+
+# --------------------------------------------------------------------------
+# Parámetros
+# --------------------------------------------------------------------------
+
+def _decimal(request, nombre):
+    valor = request.GET.get(nombre)
+    if not valor:
+        return None
+    try:
+        numero = Decimal(valor)
+    except InvalidOperation:
+        raise ParametroInvalido(f'{nombre} debe ser un número.')
+    if not numero.is_finite():
+        raise ParametroInvalido(f'{nombre} debe ser un número.')
+    return numero
+
+
+def _limite(request):
+    try:
+        limite = int(request.GET.get('limite', LIMITE_PAGINA))
+    except ValueError:
+        raise ParametroInvalido('limite debe ser un entero.')
+    return max(1, min(limite, LIMITE_MAXIMO))
+
+
+def _filtrar_productos(request, productos):
+    categoria = request.GET.get('categoria')
+    if categoria:
+        if categoria.isascii() and categoria.isdecimal():
+            # isdecimal() solo con ASCII: '²' o '٣' no son ids; los ids no pasan de 64 bits
+            categoria_id = int(categoria)
+            productos = productos.filter(categoria_id=categoria_id) if categoria_id < 2 ** 63 else productos.none()
+        else:
+            # Nombre o slug -> id con el mapa en memoria, sin JOIN por nombre
+            encontrada = categorias_catalogo.cargar().buscar(categoria)
+            productos = productos.filter(categoria_id=encontrada.id) if encontrada else productos.none()
+
+    en_oferta = request.GET.get('en_oferta')
+    if en_oferta:
+        if en_oferta not in ('1', '0'):
+            raise ParametroInvalido('en_oferta debe ser 1 o 0.')
+        productos = productos.filter(oferta_vigente=en_oferta == '1')
+
+    precio_min = _decimal(request, 'precio_min')
+    if precio_min is not None:
+        productos = productos.filter(precio_efectivo__gte=precio_min)
+    precio_max = _decimal(request, 'precio_max')
+    if precio_max is not None:
+        productos = productos.filter(precio_efectivo__lte=precio_max)
+    return productos
+
+
+# --------------------------------------------------------------------------
+# Vistas
+# --------------------------------------------------------------------------
+
+@require_safe
+@respuesta_versionada('productos')
+def productos(request):
+    orden = request.GET.get('orden', 'nombre')
+    if orden not in ORDENES:
+        raise ParametroInvalido(f'orden debe ser uno de: {", ".join(ORDENES)}.')
+
+    hoy = timezone.localdate()
+    consulta = _filtrar_productos(request, Producto.objects.with_precio_final(hoy).with_oferta_vigente(hoy))
+    try:
+        pagina = Pagina(
+            consulta, orden, request.GET.get('cursor'), _limite(request),
+            parametros=request.GET, campos=CAMPOS_LISTA,
+        )
+    except CursorInvalido as e:
+        raise ParametroInvalido(str(e))
+
+    return {
+        'resultados': [_producto_json(fila) for fila in pagina],
+        'cursor_siguiente': pagina.cursor_siguiente,
+        'siguiente': f'{request.path}?{pagina.parametros_siguiente}' if pagina.cursor_siguiente else None,
+    }
+
+
+@require_safe
+@respuesta_versionada('producto')
+def producto(request, producto_id):
+    hoy = timezone.localdate()
+    fila = (
+        Producto.objects.with_precio_final(hoy).with_oferta_vigente(hoy)
+        .filter(pk=producto_id).values(*CAMPOS_DETALLE).first()
+    )
+    if fila is None:
+        return JsonResponse({'error': 'Producto no encontrado.'}, status=404)
+
+    datos = _producto_json(fila)
+    datos['descripcion'] = fila['descripcion']
+    datos['sucursal'] = fila['sucursal_id']
+    if fila['oferta_vigente']:
+        datos['oferta'] = {
+            'id': fila['oferta_id'],
+            'nombre': fila['oferta__nombre'],
+            'porcentaje_descuento': fila['oferta__porcentaje_descuento'],
+            'fecha_fin': fila['oferta__fecha_fin'],
+        }
+    return datos
+
+
+@require_safe
+@respuesta_versionada('categorias')
+def categorias(request):
+    filas = (
+        Categoria.objects.order_by('nombre')
+        .values('id', 'nombre', 'slug', 'descripcion')
+        .annotate(productos=Count('producto'))
+    )
+    return {'resultados': list(filas)}
+
+
+@require_safe
+@respuesta_versionada('ofertas')
+def ofertas(request):
+    filas = (
+        Oferta.objects.filter(pk__in=motor_ofertas.vigentes().ids)
+        .order_by('fecha_fin', 'id')
+        .values('id', 'nombre', 'descripcion', 'porcentaje_descuento', 'fecha_inicio', 'fecha_fin')
+        .annotate(productos=Count('productos_en_oferta'))
+    )
+    return {'resultados': list(filas)}
+
+
+@require_safe
+@respuesta_versionada('buscar')
+def buscar(request):
+    """?q=texto: productos por relevancia (ver busqueda.py); sirve para sugerencias al escribir."""
+    limite = min(_limite(request), busqueda.LIMITE_RESULTADOS)
+    ids = busqueda.buscar(request.GET.get('q', ''), limite)
+    hoy = timezone.localdate()
+    filas = (
+        Producto.objects.with_precio_final(hoy).with_oferta_vigente(hoy)
+        .filter(pk__in=ids).values(*CAMPOS_LISTA)
+    )
+    por_id = {fila['id']: fila for fila in filas}
+    return {'resultados': [_producto_json(por_id[pk]) for pk in ids if pk in por_id]}
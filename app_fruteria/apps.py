@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AppFruteriaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_fruteria'
+
+    def ready(self):
+        # Registra los receptores de señales (invalidación de caché, etc.)
+        from . import signals  # noqa: F401
+        # PRAGMA de cada conexión SQLite (WAL, busy_timeout...)
+        from . import basedatos  # noqa: F401
@@ -0,0 +1,348 @@
+# app_fruteria/archivos.py
+"""
+Servido de archivos estáticos y de media en producción, sin pasar por Django.
+
+* `EstaticosComprimidos`: almacenamiento para ``collectstatic`` que agrega el
+  hash del contenido a cada nombre (``ManifestStaticFilesStorage``) y deja
+  junto a los archivos de texto su versión ``.gz`` (y ``.br`` si está
+  instalado ``brotli``).
+* `ServidorArchivosWSGI` / `ServidorArchivosASGI`: envuelven la aplicación
+  (ver ``backend_olivos/wsgi.py`` y ``asgi.py``) y responden directamente las
+  rutas de ``STATIC_URL`` y ``MEDIA_URL`` con ETag, ``Last-Modified``, 304,
+  ``Range`` y la variante comprimida según ``Accept-Encoding``. Los nombres
+  con hash (estáticos del manifiesto y derivados de imagen) se sirven con
+  ``Cache-Control: immutable``; el resto con ``FRUTERIA_ARCHIVOS_MAX_AGE``.
+
+Si el archivo no existe, la petición sigue hacia Django sin cambios.
+"""
+import asyncio
+import gzip
+import mimetypes
+import os
+import re
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli solo se genera .gz
+    brotli = None
+
+EXTENSIONES_COMPRIMIBLES = ('.css', '.js', '.mjs', '.svg', '.html', '.txt', '.json', '.xml', '.map')
+
+# Variantes precomprimidas, en orden de preferencia
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+# ``nombre.0123456789ab.css`` (manifiesto) o ``mango-0123456789ab-480w.webp`` (imagenes.py)
+RE_NOMBRE_CON_HASH = re.compile(r'[.-][0-9a-f]{12}[.-]')
+
+UN_ANO = 60 * 60 * 24 * 365
+BLOQUE = 64 * 1024
+
+
+# ======================================================================
+# collectstatic
+# ======================================================================
+def comprimir_archivo(ruta):
+    """Escribe ``ruta.gz`` (y ``ruta.br``) si ahorran al menos un 5 %. Devuelve las rutas creadas."""
+    with open(ruta, 'rb') as archivo:
+        datos = archivo.read()
+
+    compresores = [('.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        compresores.insert(0, ('.br', brotli.compress))
+
+    creadas = []
+    for sufijo, comprimir in compresores:
+        destino = ruta + sufijo
+        comprimido = comprimir(datos)
+        if len(comprimido) < len(datos) * 0.95:
+            with open(destino, 'wb') as archivo:
+                archivo.write(comprimido)
+            creadas.append(destino)
+        elif os.path.exists(destino):
+            os.remove(destino)
+    return creadas
+
+
+class EstaticosComprimidos(ManifestStaticFilesStorage):
+    """Manifiesto con hash + variantes .gz/.br creadas durante ``collectstatic``."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        nombres = set(paths) | set(self.hashed_files.values())
+        for nombre in sorted(nombres):
+            if not nombre.endswith(EXTENSIONES_COMPRIMIBLES):
+                continue
+            for creada in comprimir_archivo(self.path(nombre)):
+                yield nombre, os.path.relpath(creada, self.location).replace(os.sep, '/'), True
+
+
+# ======================================================================
+# Resolución de la respuesta (común a WSGI y ASGI)
+# ======================================================================
+class Respuesta:
+    __slots__ = ('estado', 'cabeceras', 'ruta', 'inicio', 'longitud')
+
+    def __init__(self, estado, cabeceras, ruta=None, inicio=0, longitud=0):
+        self.estado = estado
+        self.cabeceras = cabeceras
+        self.ruta = ruta          # None = sin cuerpo
+        self.inicio = inicio
+        self.longitud = longitud
+
+
+def _prefijo(url):
+    ruta = urlsplit(url or '')
+    if not url or ruta.netloc:  # vacío o servido desde otro dominio (CDN)
+        return None
+    prefijo = '/' + ruta.path.strip('/') + '/'
+    return prefijo if prefijo != '//' else None
+
+
+def rutas_por_defecto():
+    """[(prefijo_url, directorio)] para STATIC y MEDIA, si están configurados."""
+    rutas = []
+    for url, raiz in ((settings.STATIC_URL, settings.STATIC_ROOT), (settings.MEDIA_URL, settings.MEDIA_ROOT)):
+        prefijo = _prefijo(url)
+        if prefijo and raiz:
+            rutas.append((prefijo, os.path.realpath(raiz)))
+    return rutas
+
+
+def _etiquetas(valor):
+    return {e.strip().removeprefix('W/') for e in valor.split(',')}
+
+
+def _acepta(cabecera, codificacion):
+    for parte in cabecera.split(','):
+        nombre, _, parametros = parte.strip().partition(';')
+        if nombre.strip().lower() in (codificacion, '*'):
+            return parametros.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+def _rango(cabecera, tamano):
+    """
+    Interpreta ``Range: bytes=...`` para un solo rango. Devuelve (inicio, fin)
+    inclusivo, None si se ignora (mal formado o multirango) o False si no se
+    puede satisfacer.
+    """
+    unidad, _, especificacion = cabecera.partition('=')
+    if unidad.strip().lower() != 'bytes' or ',' in especificacion:
+        return None
+    inicio, guion, fin = especificacion.strip().partition('-')
+    if not guion:
+        return None
+    try:
+        if inicio == '':
+            sufijo = int(fin)
+            if sufijo <= 0:
+                return False
+            return max(tamano - sufijo, 0), tamano - 1
+        inicio = int(inicio)
+        fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    except ValueError:
+        return None
+    if inicio >= tamano or inicio > fin:
+        return False
+    return inicio, fin
+
+
+class ResolutorArchivos:
+    """Decide la respuesta para una ruta bajo STATIC_URL o MEDIA_URL."""
+
+    def __init__(self, rutas=None, max_age=None):
+        self.rutas = rutas_por_defecto() if rutas is None else rutas
+        if max_age is None:
+            max_age = getattr(settings, 'FRUTERIA_ARCHIVOS_MAX_AGE', 60)
+        self.max_age = max_age
+
+    def _archivo(self, ruta_url):
+        for prefijo, raiz in self.rutas:
+            if ruta_url.startswith(prefijo):
+                relativa = ruta_url[len(prefijo):]
+                if not relativa or '\x00' in relativa:
+                    return None
+                ruta = os.path.realpath(os.path.join(raiz, relativa))
+                if not ruta.startswith(raiz + os.sep):
+                    return None
+                try:
+                    estado = os.stat(ruta)
+                except OSError:
+                    return None
+                return (ruta, estado) if stat.S_ISREG(estado.st_mode) else None
+        return None
+
+    def resolver(self, metodo, ruta_url, cabeceras):
+        """
+        `ruta_url` ya decodificada y `cabeceras` en minúsculas. Devuelve una
+        `Respuesta` o None para que la petición siga hacia Django.
+        """
+        encontrado = self._archivo(ruta_url)
+        if encontrado is None:
+            return None
+        ruta, estado = encontrado
+        if metodo not in ('GET', 'HEAD'):
+            return Respuesta(405, [('Allow', 'GET, HEAD'), ('Content-Length', '0')])
+
+        tipo, _ = mimetypes.guess_type(ruta)
+        tipo = tipo or 'application/octet-stream'
+        if tipo.startswith('text/') or tipo in ('application/javascript', 'image/svg+xml', 'application/json'):
+            tipo += '; charset=utf-8'
+
+        codificacion = None
+        comprimible = ruta.endswith(EXTENSIONES_COMPRIMIBLES)
+        if comprimible:
+            aceptadas = cabeceras.get('accept-encoding', '')
+            for nombre, sufijo in CODIFICACIONES:
+                if aceptadas and _acepta(aceptadas, nombre):
+                    try:
+                        variante = os.stat(ruta + sufijo)
+                    except OSError:
+                        continue
+                    ruta, estado, codificacion = ruta + sufijo, variante, nombre
+                    break
+
+        etag = f'"{estado.st_size:x}-{estado.st_mtime_ns:x}{"-" + codificacion if codificacion else ""}"'
+        if RE_NOMBRE_CON_HASH.search(os.path.basename(ruta)):
+            cache_control = f'public, max-age={UN_ANO}, immutable'
+        else:
+            cache_control = f'public, max-age={self.max_age}'
+        comunes = [
+            ('ETag', etag),
+            ('Last-Modified', formatdate(estado.st_mtime, usegmt=True)),
+            ('Cache-Control', cache_control),
+        ]
+        if comprimible:
+            comunes.append(('Vary', 'Accept-Encoding'))
+
+        if self._no_modificado(cabeceras, etag, estado.st_mtime):
+            return Respuesta(304, comunes)
+
+        cabeceras_respuesta = [('Content-Type', tipo)] + comunes
+        tamano = estado.st_size
+        if codificacion:
+            cabeceras_respuesta.append(('Content-Encoding', codificacion))
+        else:
+            cabeceras_respuesta.append(('Accept-Ranges', 'bytes'))
+            rango = cabeceras.get('range')
+            if rango and self._rango_vigente(cabeceras.get('if-range'), etag, estado.st_mtime):
+                limites = _rango(rango, tamano)
+                if limites is False:
+                    cabeceras_respuesta.append(('Content-Range', f'bytes */{tamano}'))
+                    cabeceras_respuesta.append(('Content-Length', '0'))
+                    return Respuesta(416, cabeceras_respuesta)
+                if limites is not None:
+                    inicio, fin = limites
+                    longitud = fin - inicio + 1
+                    cabeceras_respuesta.append(('Content-Range', f'bytes {inicio}-{fin}/{tamano}'))
+                    cabeceras_respuesta.append(('Content-Length', str(longitud)))
+                    return Respuesta(206, cabeceras_respuesta, None if metodo == 'HEAD' else ruta, inicio, longitud)
+
+        cabeceras_respuesta.append(('Content-Length', str(tamano)))
+        return Respuesta(200, cabeceras_respuesta, None if metodo == 'HEAD' else ruta, 0, tamano)
+
+    @staticmethod
+    def _no_modificado(cabeceras, etag, mtime):
+        if 'if-none-match' in cabeceras:
+            etiquetas = _etiquetas(cabeceras['if-none-match'])
+            return '*' in etiquetas or etag in etiquetas
+        if 'if-modified-since' in cabeceras:
+            try:
+                return int(mtime) <= parsedate_to_datetime(cabeceras['if-modified-since']).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _rango_vigente(if_range, etag, mtime):
+        """Sin If-Range el rango aplica; con él, solo si el archivo no cambió."""
+        if not if_range:
+            return True
+        if if_range.startswith(('"', 'W/')):
+            return if_range == etag
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_range).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+
+def _leer(ruta, inicio, longitud):
+    with open(ruta, 'rb') as archivo:
+        archivo.seek(inicio)
+        while longitud > 0:
+            bloque = archivo.read(min(BLOQUE, longitud))
+            if not bloque:
+                break
+            longitud -= len(bloque)
+            yield bloque
+
+
+# ======================================================================
+# Adaptadores
+# ======================================================================
+class ServidorArchivosWSGI:
+    def __init__(self, aplicacion, rutas=None, max_age=None):
+        self.aplicacion = aplicacion
+        self.resolutor = ResolutorArchivos(rutas, max_age)
+
+    def __call__(self, environ, start_response):
+        cabeceras = {
+            clave[5:].replace('_', '-').lower(): valor
+            for clave, valor in environ.items() if clave.startswith('HTTP_')
+        }
+        # PATH_INFO llega como bytes UTF-8 leídos en latin-1 (PEP 3333)
+        ruta = environ.get('PATH_INFO', '').encode('latin-1').decode('utf-8', 'replace')
+        respuesta = self.resolutor.resolver(environ['REQUEST_METHOD'], ruta, cabeceras)
+        if respuesta is None:
+            return self.aplicacion(environ, start_response)
+
+        start_response(f'{respuesta.estado} {HTTPStatus(respuesta.estado).phrase}', respuesta.cabeceras)
+        if respuesta.ruta is None:
+            return []
+        envoltura = environ.get('wsgi.file_wrapper')
+        if envoltura is not None and respuesta.inicio == 0 and respuesta.estado == 200:
+            return envoltura(open(respuesta.ruta, 'rb'), BLOQUE)
+        return _leer(respuesta.ruta, respuesta.inicio, respuesta.longitud)
+
+
+class ServidorArchivosASGI:
+    def __init__(self, aplicacion, rutas=None, max_age=None):
+        self.aplicacion = aplicacion
+        self.resolutor = ResolutorArchivos(rutas, max_age)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.aplicacion(scope, receive, send)
+        cabeceras = {clave.decode('latin-1').lower(): valor.decode('latin-1') for clave, valor in scope['headers']}
+        respuesta = self.resolutor.resolver(scope['method'], scope['path'], cabeceras)
+        if respuesta is None:
+            return await self.aplicacion(scope, receive, send)
+
+        await send({
+            'type': 'http.response.start',
+            'status': respuesta.estado,
+            'headers': [(k.encode('latin-1'), v.encode('latin-1')) for k, v in respuesta.cabeceras],
+        })
+        if respuesta.ruta is None:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        bloques = _leer(respuesta.ruta, respuesta.inicio, respuesta.longitud)
+        try:
+            while True:
+                # La lectura de disco se hace en un hilo para no bloquear el loop
+                bloque = await asyncio.to_thread(next, bloques, None)
+                if bloque is None:
+                    break
+                await send({'type': 'http.response.body', 'body': bloque, 'more_body': True})
+        finally:
+            bloques.close()
+        await send({'type': 'http.response.body', 'body': b''})
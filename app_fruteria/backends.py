@@ -1,7 +1,10 @@
 # en app_fruteria/backends.py
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db.models import Q, Value
+from django.db.models.functions import Lower
+
+from . import usuarios
 
 class EmailOrUsernameBackend(ModelBackend):
     """
@@ -9,23 +12,37 @@ class EmailOrUsernameBackend(ModelBackend):
     usando su 'username' O su 'email'.
     """
     
+    @staticmethod
+    def usuarios_por_login(login):
+        """
+        Usuarios cuyo username O email coincide con `login` sin importar
+        mayúsculas. Se compara LOWER(columna) = LOWER(valor) para que la BD
+        pueda usar los índices funcionales de la migración 0002 (con
+        `iexact`, SQLite genera un LIKE que no usa índices).
+        """
+        return User.objects.alias(
+            username_lower=Lower('username'),
+            email_lower=Lower('email'),
+        ).filter(
+            Q(username_lower=Lower(Value(login))) | Q(email_lower=Lower(Value(login)))
+        )
+
     def authenticate(self, request, username=None, password=None, **kwargs):
         # El formulario de login siempre pasa el primer campo como 'username'
         # aunque nosotros le hayamos puesto la etiqueta 'Correo Electrónico'
         try:
             # Busca un usuario que coincida con el email O el username
-            # 'iexact' significa 'ignorar mayúsculas/minúsculas'
-            user = User.objects.get(
-                Q(username__iexact=username) | Q(email__iexact=username)
-            )
+            # (ignorando mayúsculas/minúsculas)
+            user = self.usuarios_por_login(username).get()
         except User.DoesNotExist:
-            # Si no se encuentra ningún usuario, falla la autenticación
+            # Si no se encuentra ningún usuario, falla la autenticación; se
+            # calcula un hash de todos modos (como ModelBackend) para que el
+            # tiempo de respuesta no revele qué correos existen
+            User().set_password(password)
             return None
         except User.MultipleObjectsReturned:
             # Si hay conflicto (raro), toma el primero
-             user = User.objects.filter(
-                Q(username__iexact=username) | Q(email__iexact=username)
-            ).order_by('id').first()
+             user = self.usuarios_por_login(username).order_by('id').first()
 
         # Si encontramos un usuario, verificamos su contraseña
         if user and user.check_password(password):
@@ -35,8 +52,12 @@ class EmailOrUsernameBackend(ModelBackend):
         return None
 
     def get_user(self, user_id):
-        # Esta parte es estándar y necesaria
-        try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            return None
\ No newline at end of file
+        # En cada petición con sesión: el usuario y su perfil salen de la
+        # caché (usuarios.py) en lugar de consultarse cada vez. Como en
+        # ModelBackend, un usuario inactivo no conserva la sesión.
+        usuario = usuarios.obtener(user_id)
+        return usuario if usuario is not None and self.user_can_authenticate(usuario) else None
+
+    async def aget_user(self, user_id):
+        usuario = await usuarios.aobtener(user_id)
+        return usuario if usuario is not None and self.user_can_authenticate(usuario) else None
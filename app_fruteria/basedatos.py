@@ -0,0 +1,84 @@
+# app_fruteria/basedatos.py
+"""
+SQLite en producción.
+
+Cada conexión nueva a SQLite recibe los PRAGMA de FRUTERIA_SQLITE_PRAGMAS
+(receptor de ``connection_created``, registrado en apps.py):
+
+* ``journal_mode=WAL``: los lectores no bloquean al escritor ni al revés;
+  solo dos escrituras simultáneas compiten por el candado.
+* ``synchronous=NORMAL``: con WAL no corrompe la base; un apagón puede
+  perder las últimas transacciones confirmadas, no dejarla inconsistente.
+* ``busy_timeout``: milisegundos que una conexión espera el candado de
+  escritura antes de fallar con "database is locked".
+* ``mmap_size`` / ``cache_size``: lecturas desde memoria mapeada y caché de
+  páginas más grande (negativo = KiB).
+
+En settings.py, ``'transaction_mode': 'IMMEDIATE'`` hace que cada
+``transaction.atomic()`` pida el candado de escritura desde el BEGIN. Con
+el modo por omisión (DEFERRED) una transacción que primero lee y luego
+escribe (el checkout) falla al instante si otra ya está escribiendo:
+SQLite no puede esperar sin arriesgar un interbloqueo y busy_timeout no
+sirve. Con WSGI ``CONN_MAX_AGE`` reutiliza la conexión entre peticiones,
+así los PRAGMA se aplican una vez por hilo y no en cada petición (bajo
+ASGI es 0, ver backend_olivos/bd.py).
+
+Con FRUTERIA_SQLITE_ESCRITOR_UNICO, `escritura()` además forma en fila a
+los hilos del proceso antes de abrir la transacción: esperan en Python en
+lugar de reintentar contra el candado de SQLite. Entre procesos sigue
+mandando busy_timeout.
+
+``journal_mode=WAL`` queda escrito en el encabezado del archivo, no en la
+conexión. El db.sqlite3 que viene en el repositorio está en modo DELETE:
+la primera vez que se corre el servidor o cualquier ``manage.py`` contra
+él se convierte a WAL (una sola vez) y git lo muestra modificado aunque no
+cambie ningún dato. No hay que subir esa conversión: con el servidor
+detenido, ``git checkout db.sqlite3`` y borrar db.sqlite3-wal y -shm lo
+dejan como estaba; o se trabaja con una copia (FRUTERIA_BD_NOMBRE).
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PRAGMAS = getattr(settings, 'FRUTERIA_SQLITE_PRAGMAS', {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,
+})
+
+ESCRITOR_UNICO = getattr(settings, 'FRUTERIA_SQLITE_ESCRITOR_UNICO', False)
+
+# Reentrante: un escritura() dentro de otro en el mismo hilo no se bloquea
+_escritor = threading.RLock()
+
+
+@receiver(connection_created)
+def configurar_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for nombre, valor in PRAGMAS.items():
+            cursor.execute(f'PRAGMA {nombre} = {valor}')
+
+
+@contextmanager
+def escritura(using=None):
+    """
+    ``transaction.atomic()`` para las escrituras concurrentes (checkout).
+
+    Con FRUTERIA_SQLITE_ESCRITOR_UNICO y SQLite, solo un hilo del proceso a
+    la vez entra a la transacción; los demás esperan su turno.
+    """
+    alias = using or 'default'
+    if ESCRITOR_UNICO and connections[alias].vendor == 'sqlite':
+        with _escritor, transaction.atomic(using=alias):
+            yield
+    else:
+        with transaction.atomic(using=alias):
+            yield
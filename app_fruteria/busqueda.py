@@ -0,0 +1,167 @@
+# app_fruteria/busqueda.py
+"""
+Búsqueda de productos por texto (nombre, descripción y categoría).
+
+El backend lo decide ``settings.FRUTERIA_BUSQUEDA_BACKEND``; si no se
+configura se elige según el motor de la base de datos:
+
+* `BuscadorFTS5` (SQLite): tabla virtual FTS5 creada por la migración 0004 y
+  mantenida por triggers. Tokenizador ``unicode61 remove_diacritics 2``
+  ("limon" encuentra "Limón"), prefijos para búsquedas mientras se escribe y
+  orden por relevancia: primero lo que coincide en el nombre, luego en la
+  categoría y al final el resto por bm25.
+* `BuscadorORM`: respaldo para otras bases, con ``icontains`` por palabra.
+  No usa índice ni ignora acentos; sirve mientras se escribe un backend
+  propio (basta heredar de `Buscador` e implementar `buscar`).
+
+Los resultados (ids en orden de relevancia) se guardan en la caché con la
+clave versionada del catálogo, como el HTML de las páginas.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils.module_loading import import_string
+
+from .cache import TIEMPO_CACHE, clave_fragmento
+from .models import Producto
+
+BACKEND_POR_MOTOR = {
+    'sqlite': 'app_fruteria.busqueda.BuscadorFTS5',
+}
+BACKEND_RESPALDO = 'app_fruteria.busqueda.BuscadorORM'
+
+# Resultados por búsqueda
+LIMITE_RESULTADOS = getattr(settings, 'FRUTERIA_BUSQUEDA_LIMITE', 60)
+# Palabras más cortas se ignoran: "c"* coincide con casi todo el catálogo
+MIN_CARACTERES = 2
+MAX_PALABRAS = 8
+
+RE_PALABRA = re.compile(r'\w+')
+
+
+def palabras(texto):
+    """Parte el texto en palabras (en minúsculas) como lo hace el tokenizador."""
+    return [p for p in RE_PALABRA.findall(texto.lower()) if len(p) >= MIN_CARACTERES][:MAX_PALABRAS]
+
+
+class Buscador:
+    """Interfaz de los backends de búsqueda."""
+
+    def buscar(self, palabras, limite):
+        """Ids de los productos que contienen todas las `palabras` (la última como prefijo)."""
+        raise NotImplementedError
+
+    def reconstruir(self):
+        """Regenera el índice desde cero (no hace nada si el backend no tiene índice)."""
+
+
+class BuscadorFTS5(Buscador):
+    tabla = 'app_fruteria_producto_fts'
+
+    def expresion(self, palabras):
+        # Cada palabra entre comillas (así no se interpreta como operador de
+        # FTS5) y como prefijo: "lim"* encuentra "limón" y "lima".
+        return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+    # Columnas en el orden de su peso en bm25 (migración 0004)
+    columnas = ('nombre', 'categoria')
+
+    def buscar(self, palabras, limite):
+        # bm25 se calcula para cada fila que coincide y un prefijo corto son
+        # miles ("man" ~12k filas en 100k productos, ~30 ms). Primero se
+        # piden las coincidencias en el nombre y luego en la categoría sin
+        # ORDER BY rank: FTS5 se detiene al juntar `limite` filas. Solo si no
+        # alcanzan (palabras repartidas entre columnas o solo en la
+        # descripción) se ordena todo el MATCH por relevancia. Dentro de una
+        # misma columna el orden es el del índice (rowid), no bm25.
+        expresion = self.expresion(palabras)
+        ids = []
+        for columna in self.columnas:
+            self._agregar(ids, self._consultar(f'{columna} : ({expresion})', limite), limite)
+            if len(ids) >= limite:
+                return ids
+        self._agregar(ids, self._consultar(expresion, limite, ordenar=True), limite)
+        return ids
+
+    def _consultar(self, expresion, limite, ordenar=False):
+        orden = ' ORDER BY rank' if ordenar else ''
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {self.tabla} WHERE {self.tabla} MATCH %s{orden} LIMIT %s',
+                [expresion, limite],
+            )
+            return [fila[0] for fila in cursor.fetchall()]
+
+    @staticmethod
+    def _agregar(ids, nuevos, limite):
+        vistos = set(ids)
+        ids.extend(pk for pk in nuevos if pk not in vistos)
+        del ids[limite:]
+
+    def reconstruir(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.tabla}')
+            cursor.execute(
+                f'INSERT INTO {self.tabla}(rowid, nombre, descripcion, categoria) '
+                'SELECT p.id, p.nombre, p.descripcion, c.nombre FROM app_fruteria_producto p '
+                'LEFT JOIN app_fruteria_categoria c ON c.id = p.categoria_id'
+            )
+            cursor.execute(f"INSERT INTO {self.tabla}({self.tabla}) VALUES ('optimize')")
+
+
+class BuscadorORM(Buscador):
+
+    def buscar(self, palabras, limite):
+        productos = Producto.objects.all()
+        for palabra in palabras:
+            productos = productos.filter(
+                Q(nombre__icontains=palabra)
+                | Q(descripcion__icontains=palabra)
+                | Q(categoria__nombre__icontains=palabra)
+            )
+        # Relevancia aproximada: primero los que empiezan con la primera palabra
+        relevancia = Case(
+            When(nombre__istartswith=palabras[0], then=Value(0)),
+            When(nombre__icontains=palabras[0], then=Value(1)),
+            default=Value(2),
+            output_field=IntegerField(),
+        )
+        return list(productos.order_by(relevancia, 'nombre', 'id').values_list('id', flat=True)[:limite])
+
+
+@lru_cache(maxsize=None)
+def _clase_buscador(ruta):
+    return import_string(ruta)
+
+
+def obtener_buscador():
+    """Instancia el backend configurado (o el que corresponde al motor de la BD)."""
+    ruta = getattr(settings, 'FRUTERIA_BUSQUEDA_BACKEND', None) or BACKEND_POR_MOTOR.get(
+        connection.vendor, BACKEND_RESPALDO
+    )
+    return _clase_buscador(ruta)()
+
+
+def buscar(texto, limite=LIMITE_RESULTADOS):
+    """Ids de productos que coinciden con `texto`, del más al menos relevante."""
+    terminos = palabras(texto)
+    if not terminos:
+        return []
+    clave = clave_fragmento('busqueda', [' '.join(terminos), limite])
+    ids = cache.get(clave)
+    if ids is None:
+        ids = obtener_buscador().buscar(terminos, limite)
+        cache.set(clave, ids, TIEMPO_CACHE)
+    return ids
+
+
+def ordenar_por_ids(productos, ids):
+    """Filtra el queryset a `ids` y lo ordena como vienen (relevancia)."""
+    if not ids:
+        return productos.none()
+    posicion = Case(*[When(pk=pk, then=Value(i)) for i, pk in enumerate(ids)], output_field=IntegerField())
+    return productos.filter(pk__in=ids).order_by(posicion)
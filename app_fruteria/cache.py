@@ -0,0 +1,134 @@
+# app_fruteria/cache.py
+"""
+Caché versionada del catálogo.
+
+Las páginas del catálogo solo cambian cuando se edita un Producto, una
+Categoría o una Oferta, o cuando cambia el día (las ofertas tienen fechas).
+Por eso cada fragmento se guarda bajo una clave que incluye:
+
+* la versión del catálogo, que se incrementa desde `signals.py`;
+* la fecha local (TIME_ZONE), para que a medianoche todo se regenere solo.
+
+Así nunca hay que borrar claves: las viejas simplemente dejan de usarse y
+expiran. De la URL solo entran a la clave los parámetros que cambian el
+HTML (`parametros_catalogo`): ``?utm_source=`` o ``?_=123`` no crean
+fragmentos nuevos.
+"""
+import hashlib
+from decimal import ROUND_FLOOR, Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import QueryDict
+from django.utils import timezone
+
+from .paginacion import ORDENES
+
+CLAVE_VERSION = 'catalogo:version'
+CLAVE_ACIERTOS = 'catalogo:aciertos'
+CLAVE_FALLOS = 'catalogo:fallos'
+
+# Tiempo máximo que vive un fragmento en la caché (segundos)
+TIEMPO_CACHE = getattr(settings, 'FRUTERIA_CACHE_CATALOGO_SEGUNDOS', 60 * 60)
+
+
+def version_catalogo():
+    """Devuelve la versión actual del catálogo (empieza en 1)."""
+    cache.add(CLAVE_VERSION, 1, timeout=None)
+    return cache.get(CLAVE_VERSION, 1)
+
+
+def invalidar_catalogo():
+    """Incrementa la versión: todos los fragmentos anteriores quedan obsoletos."""
+    try:
+        return cache.incr(CLAVE_VERSION)
+    except ValueError:
+        # La clave no existía (caché recién iniciada o expulsada)
+        cache.set(CLAVE_VERSION, 2, timeout=None)
+        return 2
+
+
+def clave_con_version(version, nombre, variantes=()):
+    """Como `clave_fragmento` pero con la versión ya leída (para armar muchas claves)."""
+    variante = hashlib.md5(
+        '|'.join(str(v) for v in variantes).encode('utf-8'), usedforsecurity=False
+    ).hexdigest()
+    hoy = timezone.localdate().isoformat()
+    return f'catalogo:{version}:{hoy}:{nombre}:{variante}'
+
+
+def clave_fragmento(nombre, variantes=()):
+    """Arma la clave de un fragmento a partir de la versión, el día y las variantes."""
+    return clave_con_version(version_catalogo(), nombre, variantes)
+
+
+# Parámetros de la URL que cambian el HTML del catálogo (views.py)
+PARAMETROS_CATALOGO = ('orden', 'precio_max', 'cursor', 'q')
+
+
+def parametros_catalogo(parametros):
+    """
+    QueryDict con solo los PARAMETROS_CATALOGO de `parametros` (request.GET),
+    normalizados y en orden fijo; lo que la vista ignoraría no aparece. Se
+    usa para la clave del fragmento y para los enlaces que quedan dentro de
+    él (página siguiente), así el HTML en caché no lleva parámetros ajenos.
+    """
+    normalizados = QueryDict(mutable=True)
+    orden = parametros.get('orden', '').strip()
+    if orden in ORDENES and orden != 'nombre':
+        normalizados['orden'] = orden
+    try:
+        # Los precios tienen centavos: "50", "50.00" y "50.009" filtran igual
+        precio_max = Decimal(parametros.get('precio_max', '').strip()).quantize(
+            Decimal('0.01'), rounding=ROUND_FLOOR,
+        )
+    except InvalidOperation:
+        # No numérico, Infinity o enorme: la vista no filtra
+        pass
+    else:
+        if precio_max.is_finite():
+            normalizados['precio_max'] = str(precio_max)
+    for nombre in ('cursor', 'q'):
+        valor = parametros.get(nombre, '').strip()
+        if valor:
+            normalizados[nombre] = valor
+    return normalizados
+
+
+# --- Versiones async (vistas de views_async.py) ---
+async def aversion_catalogo():
+    await cache.aadd(CLAVE_VERSION, 1, timeout=None)
+    return await cache.aget(CLAVE_VERSION, 1)
+
+
+async def aclave_fragmento(nombre, variantes=()):
+    return clave_con_version(await aversion_catalogo(), nombre, variantes)
+
+
+def _incrementar(clave):
+    cache.add(clave, 0, timeout=None)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        pass
+
+
+def registrar_acierto():
+    _incrementar(CLAVE_ACIERTOS)
+
+
+def registrar_fallo():
+    _incrementar(CLAVE_FALLOS)
+
+
+def estadisticas():
+    """Contadores de aciertos/fallos de la caché del catálogo."""
+    aciertos = cache.get(CLAVE_ACIERTOS, 0)
+    fallos = cache.get(CLAVE_FALLOS, 0)
+    total = aciertos + fallos
+    return {
+        'version': version_catalogo(),
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'tasa_aciertos': round(aciertos / total, 4) if total else 0.0,
+    }
@@ -0,0 +1,605 @@
+# app_fruteria/carrito.py
+"""
+Servicios del carrito de compras.
+
+En memoria el carrito es un diccionario compacto ``{'<producto_id>': [kg, precio_centavos]}``.
+Dónde se guarda entre peticiones lo decide ``settings.FRUTERIA_CARRITO_BACKEND``:
+
+* `CarritoFirmado`: cookie firmada con la codificación compacta (no toca la BD);
+  si no cabe en una cookie, pasa a la caché como `CarritoCache`.
+* `CarritoCache`: el carrito vive en la caché; la cookie solo lleva un ID firmado.
+* `CarritoSesion`: el formato histórico dentro de ``request.session['carrito']``
+  (``{'cantidad': int, 'precio': str}``), por compatibilidad.
+
+`CarritoMiddleware` crea ``request.carrito`` y lo persiste al final de la
+petición solo si cambió. `hidratar_carrito` convierte el carrito en líneas
+con su Producto cargado, usando una sola consulta para todo el carrito.
+
+Las vistas async (views_async.py) usan las variantes con prefijo ``a``:
+``await request.carrito.apreparar()``, `adatos_producto_carrito` y
+`ahidratar_carrito`; el middleware persiste con ``aguardar`` bajo ASGI.
+"""
+import decimal
+import uuid
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from .cache import (
+    aclave_fragmento, aversion_catalogo, clave_con_version, clave_fragmento, version_catalogo, TIEMPO_CACHE,
+)
+from .dinero import a_centavos, a_decimal, calcular_totales
+from .models import Producto
+
+BACKEND_POR_DEFECTO = 'app_fruteria.carrito.CarritoSesion'
+
+
+# ======================================================================
+# Almacenes del carrito
+# ======================================================================
+class AlmacenCarrito:
+    """
+    Interfaz común de los almacenes. Las subclases solo implementan
+    `cargar()` (devolver el diccionario compacto) y `persistir(response)`;
+    si hacen E/S, también `acargar()` y `apersistir(response)`.
+    """
+    clave = 'carrito'
+
+    def __init__(self, request):
+        self.request = request
+        self._lineas = None
+        self.modificado = False
+
+    # --- A implementar por cada almacén ---
+    def cargar(self):
+        raise NotImplementedError
+
+    def persistir(self, response):
+        raise NotImplementedError
+
+    # Por defecto no hay E/S (cookie firmada): la versión async es la misma
+    async def acargar(self):
+        return self.cargar()
+
+    async def apersistir(self, response):
+        self.persistir(response)
+
+    # --- API pública ---
+    @property
+    def lineas(self):
+        """Diccionario ``{id_str: [kg, centavos]}`` (se carga la primera vez)."""
+        if self._lineas is None:
+            self._lineas = self.cargar()
+        return self._lineas
+
+    def guardar(self, response):
+        if self.modificado:
+            self.persistir(response)
+            self.modificado = False
+
+    async def apreparar(self):
+        """Carga las líneas sin bloquear; después se usa la API normal. Devuelve el almacén."""
+        if self._lineas is None:
+            self._lineas = await self.acargar()
+        return self
+
+    async def aguardar(self, response):
+        if self.modificado:
+            await self.apersistir(response)
+            self.modificado = False
+
+    def __contains__(self, producto_id):
+        return str(producto_id) in self.lineas
+
+    def __len__(self):
+        return len(self.lineas)
+
+    def __bool__(self):
+        return bool(self.lineas)
+
+    def cantidad(self, producto_id):
+        linea = self.lineas.get(str(producto_id))
+        return linea[0] if linea else 0
+
+    def precio_centavos(self, producto_id):
+        linea = self.lineas.get(str(producto_id))
+        return linea[1] if linea else 0
+
+    def agregar(self, producto_id, precio_centavos, cantidad=1):
+        """Suma `cantidad` kg (actualizando el precio) y devuelve el total de kg."""
+        nueva = self.cantidad(producto_id) + cantidad
+        self.lineas[str(producto_id)] = [nueva, int(precio_centavos)]
+        self.modificado = True
+        return nueva
+
+    def fijar_cantidad(self, producto_id, cantidad):
+        linea = self.lineas.get(str(producto_id))
+        if linea is not None and linea[0] != cantidad:
+            linea[0] = cantidad
+            self.modificado = True
+
+    def eliminar(self, producto_id):
+        if self.lineas.pop(str(producto_id), None) is None:
+            return False
+        self.modificado = True
+        return True
+
+    def totales(self):
+        """Totales (`dinero.Totales`) calculados solo con los datos del carrito."""
+        return calcular_totales(self.lineas.values())
+
+    def actualizar_precios(self, precios):
+        """Guarda los precios vigentes ``{id_str: centavos}`` (ver `CarritoHidratado.cambiados`)."""
+        for id_str, centavos in precios.items():
+            linea = self.lineas.get(str(id_str))
+            if linea is not None and linea[1] != centavos:
+                linea[1] = centavos
+                self.modificado = True
+
+    def vaciar(self):
+        if self.lineas:
+            self._lineas = {}
+            self.modificado = True
+
+    def reemplazar(self, lineas):
+        """Sustituye todas las líneas de una vez (ver `aplicar_lote`)."""
+        if lineas != self.lineas:
+            self._lineas = lineas
+            self.modificado = True
+
+    @staticmethod
+    def _limpiar(datos):
+        """Valida un diccionario compacto; descarta las entradas corruptas."""
+        limpias = {}
+        if not isinstance(datos, dict):
+            return limpias
+        for id_str, linea in datos.items():
+            try:
+                cantidad, centavos = int(linea[0]), int(linea[1])
+                int(id_str)
+            except (TypeError, ValueError, IndexError, KeyError):
+                continue
+            if cantidad > 0 and centavos >= 0:
+                limpias[str(id_str)] = [cantidad, centavos]
+        return limpias
+
+
+class CarritoSesion(AlmacenCarrito):
+    """Formato histórico en la sesión (tabla django_session por defecto)."""
+
+    def cargar(self):
+        return self._desde_sesion(self.request.session.get(self.clave, {}))
+
+    async def acargar(self):
+        return self._desde_sesion(await self.request.session.aget(self.clave, {}))
+
+    def _desde_sesion(self, datos):
+        lineas = {}
+        for id_str, data in datos.items():
+            try:
+                lineas[id_str] = [int(data['cantidad']), a_centavos(data['precio'])]
+            except (KeyError, TypeError, ValueError, decimal.InvalidOperation):
+                self.modificado = True # Se descarta la entrada corrupta
+        return self._limpiar(lineas)
+
+    def persistir(self, response):
+        # Solo se marca la sesión; SessionMiddleware la escribe después.
+        if self.lineas:
+            self.request.session[self.clave] = {
+                id_str: {'cantidad': cantidad, 'precio': str(a_decimal(centavos))}
+                for id_str, (cantidad, centavos) in self.lineas.items()
+            }
+        else:
+            self.request.session.pop(self.clave, None)
+
+
+class CarritoFirmado(AlmacenCarrito):
+    """
+    Cookie firmada (y comprimida) con el diccionario compacto. Cada línea
+    ocupa ~15 bytes, así que caben cientos de productos en los 4 KB de una
+    cookie. El navegador descarta sin avisar las cookies más grandes: si el
+    valor firmado pasa de `max_bytes`, el carrito se guarda como
+    `CarritoCache` (la cookie ``carrito_id`` solo lleva el ID) hasta que
+    vuelva a caber.
+    """
+    sal = 'app_fruteria.carrito'
+    # Margen para el nombre y los atributos dentro de los 4096 bytes
+    max_bytes = 3800
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.respaldo = CarritoCache(request)
+
+    @property
+    def edad_maxima(self):
+        return getattr(settings, 'FRUTERIA_CARRITO_EDAD_MAXIMA', 60 * 60 * 24 * 14)
+
+    def cargar(self):
+        valor = self.request.COOKIES.get(self.clave)
+        if not valor:
+            return self.respaldo.cargar()
+        try:
+            datos = signing.loads(valor, salt=self.sal, max_age=self.edad_maxima)
+        except signing.BadSignature:
+            self.modificado = True # Cookie alterada o vencida: se reemplaza
+            return {}
+        return self._limpiar(datos)
+
+    async def acargar(self):
+        if not self.request.COOKIES.get(self.clave):
+            return await self.respaldo.acargar()
+        return self.cargar()
+
+    def persistir(self, response):
+        if self._poner_cookie(response):
+            self.respaldo.persistir(response)
+
+    async def apersistir(self, response):
+        if self._poner_cookie(response):
+            await self.respaldo.apersistir(response)
+
+    def _poner_cookie(self, response):
+        """
+        Escribe (o borra) la cookie firmada y deja en el respaldo las líneas
+        que no cupieron ({} para borrar uno anterior). Devuelve True si hay
+        que persistir el respaldo.
+        """
+        valor = signing.dumps(self.lineas, salt=self.sal, compress=True) if self.lineas else ''
+        grande = len(valor) > self.max_bytes
+        if valor and not grande:
+            response.set_cookie(
+                self.clave,
+                valor,
+                max_age=self.edad_maxima,
+                httponly=True,
+                samesite='Lax',
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        else:
+            response.delete_cookie(self.clave, samesite='Lax')
+        self.respaldo._lineas = self.lineas if grande else {}
+        return self.respaldo._leer_id() is not None or grande
+
+
+class CarritoCache(AlmacenCarrito):
+    """El carrito vive en la caché; la cookie solo guarda un identificador firmado."""
+    clave = 'carrito_id'
+    sal = 'app_fruteria.carrito.cache'
+
+    @property
+    def edad_maxima(self):
+        return getattr(settings, 'FRUTERIA_CARRITO_EDAD_MAXIMA', 60 * 60 * 24 * 14)
+
+    def _clave_cache(self, carrito_id):
+        return f'carrito:{carrito_id}'
+
+    def _leer_id(self):
+        self.carrito_id = None
+        valor = self.request.COOKIES.get(self.clave)
+        if valor:
+            try:
+                self.carrito_id = signing.loads(valor, salt=self.sal)
+            except signing.BadSignature:
+                pass
+        return self.carrito_id
+
+    def cargar(self):
+        if self._leer_id() is None:
+            return {}
+        return self._limpiar(cache.get(self._clave_cache(self.carrito_id)))
+
+    async def acargar(self):
+        if self._leer_id() is None:
+            return {}
+        return self._limpiar(await cache.aget(self._clave_cache(self.carrito_id)))
+
+    def persistir(self, response):
+        if not self.lineas:
+            if self.carrito_id:
+                cache.delete(self._clave_cache(self.carrito_id))
+            response.delete_cookie(self.clave, samesite='Lax')
+            return
+        if self.carrito_id is None:
+            self.carrito_id = uuid.uuid4().hex
+        cache.set(self._clave_cache(self.carrito_id), self.lineas, self.edad_maxima)
+        self._poner_cookie(response)
+
+    async def apersistir(self, response):
+        if not self.lineas:
+            if self.carrito_id:
+                await cache.adelete(self._clave_cache(self.carrito_id))
+            response.delete_cookie(self.clave, samesite='Lax')
+            return
+        if self.carrito_id is None:
+            self.carrito_id = uuid.uuid4().hex
+        await cache.aset(self._clave_cache(self.carrito_id), self.lineas, self.edad_maxima)
+        self._poner_cookie(response)
+
+    def _poner_cookie(self, response):
+        response.set_cookie(
+            self.clave,
+            signing.dumps(self.carrito_id, salt=self.sal),
+            max_age=self.edad_maxima,
+            httponly=True,
+            samesite='Lax',
+            secure=settings.SESSION_COOKIE_SECURE,
+        )
+
+
+@lru_cache(maxsize=None)
+def _clase_almacen(ruta):
+    return import_string(ruta)
+
+
+def obtener_almacen(request):
+    """Instancia el almacén configurado en FRUTERIA_CARRITO_BACKEND."""
+    ruta = getattr(settings, 'FRUTERIA_CARRITO_BACKEND', BACKEND_POR_DEFECTO)
+    return _clase_almacen(ruta)(request)
+
+
+class CarritoMiddleware:
+    """
+    Pone ``request.carrito`` a disposición de las vistas y lo guarda al final.
+    Debe ir después de SessionMiddleware en MIDDLEWARE. Funciona con WSGI y
+    ASGI (en ASGI no obliga a Django a pasar la petición a un hilo).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.carrito = obtener_almacen(request)
+        response = self.get_response(request)
+        request.carrito.guardar(response)
+        return response
+
+    async def __acall__(self, request):
+        request.carrito = obtener_almacen(request)
+        response = await self.get_response(request)
+        await request.carrito.aguardar(response)
+        return response
+
+
+# ======================================================================
+# Datos de producto para el carrito (sin tocar la BD si está en caché)
+# ======================================================================
+def datos_producto_carrito(producto_id):
+    """
+    Devuelve ``(nombre, precio_final_centavos)`` de un producto, o None si no
+    existe. Se guarda en la caché ligada a la versión del catálogo, así que
+    los clics de "Añadir" repetidos no consultan la base de datos.
+    """
+    clave = clave_fragmento('carrito-producto', [producto_id])
+    datos = cache.get(clave)
+    if datos is None:
+        producto = Producto.objects.with_precio_final().filter(pk=producto_id).first()
+        if producto is None:
+            return None
+        datos = (producto.nombre, a_centavos(producto.precio_final))
+        cache.set(clave, datos, TIEMPO_CACHE)
+    return datos
+
+
+async def adatos_producto_carrito(producto_id):
+    """Igual que `datos_producto_carrito`, con la caché y el ORM async."""
+    clave = await aclave_fragmento('carrito-producto', [producto_id])
+    datos = await cache.aget(clave)
+    if datos is None:
+        producto = await Producto.objects.with_precio_final().filter(pk=producto_id).afirst()
+        if producto is None:
+            return None
+        datos = (producto.nombre, a_centavos(producto.precio_final))
+        await cache.aset(clave, datos, TIEMPO_CACHE)
+    return datos
+
+
+def datos_productos_carrito(ids):
+    """
+    Versión en bloque de `datos_producto_carrito`: ``{id: (nombre, centavos)}``
+    con un solo ``get_many`` y, para los que falten, una sola consulta.
+    Los IDs inexistentes no aparecen en el resultado.
+    """
+    claves = _claves_productos(version_catalogo(), ids)
+    datos = {claves[clave]: valor for clave, valor in cache.get_many(claves).items()}
+    faltan = [pid for pid in ids if pid not in datos]
+    if faltan:
+        nuevos = _datos_desde_productos(Producto.objects.with_precio_final().filter(pk__in=faltan))
+        cache.set_many(_por_clave(claves, nuevos), TIEMPO_CACHE)
+        datos.update(nuevos)
+    return datos
+
+
+async def adatos_productos_carrito(ids):
+    claves = _claves_productos(await aversion_catalogo(), ids)
+    datos = {claves[clave]: valor for clave, valor in (await cache.aget_many(claves)).items()}
+    faltan = [pid for pid in ids if pid not in datos]
+    if faltan:
+        productos = [p async for p in Producto.objects.with_precio_final().filter(pk__in=faltan)]
+        nuevos = _datos_desde_productos(productos)
+        await cache.aset_many(_por_clave(claves, nuevos), TIEMPO_CACHE)
+        datos.update(nuevos)
+    return datos
+
+
+def _claves_productos(version, ids):
+    return {clave_con_version(version, 'carrito-producto', [pid]): pid for pid in ids}
+
+
+def _datos_desde_productos(productos):
+    return {p.pk: (p.nombre, a_centavos(p.precio_final)) for p in productos}
+
+
+def _por_clave(claves, datos):
+    return {clave: datos[pid] for clave, pid in claves.items() if pid in datos}
+
+
+# ======================================================================
+# Operaciones en lote (un solo request y una sola escritura por lote)
+# ======================================================================
+MAX_OPERACIONES = 100
+TIPOS_OPERACION = ('agregar', 'fijar', 'eliminar')
+
+
+class OperacionInvalida(Exception):
+    """El lote tiene una operación inválida; no se aplica ninguna."""
+
+
+def normalizar_operaciones(operaciones):
+    """
+    Valida la lista recibida en JSON y la convierte en tuplas
+    ``(tipo, producto_id, cantidad)``:
+
+    * ``{"op": "agregar", "producto": 7, "cantidad": 2}`` suma kg (1 por defecto);
+    * ``{"op": "fijar", "producto": 7, "cantidad": 5}`` deja exactamente 5 kg;
+    * ``{"op": "eliminar", "producto": 7}`` quita la línea.
+    """
+    if not isinstance(operaciones, list) or not operaciones:
+        raise OperacionInvalida('Se esperaba una lista de operaciones.')
+    if len(operaciones) > MAX_OPERACIONES:
+        raise OperacionInvalida(f'Máximo {MAX_OPERACIONES} operaciones por lote.')
+
+    normalizadas = []
+    for operacion in operaciones:
+        if not isinstance(operacion, dict) or operacion.get('op') not in TIPOS_OPERACION:
+            raise OperacionInvalida(f'Operación inválida: {operacion!r}.')
+        tipo = operacion['op']
+        try:
+            producto_id = int(operacion.get('producto'))
+            cantidad = int(operacion.get('cantidad', 1 if tipo == 'agregar' else 0))
+        except (TypeError, ValueError):
+            raise OperacionInvalida(f'Operación inválida: {operacion!r}.')
+        if tipo != 'eliminar' and cantidad < 1:
+            raise OperacionInvalida('Las cantidades deben ser de al menos 1 kg.')
+        normalizadas.append((tipo, producto_id, cantidad))
+    return normalizadas
+
+
+def productos_por_consultar(carrito, operaciones):
+    """IDs cuyo precio hace falta: lo agregado y lo fijado que no está en el carrito."""
+    return sorted({
+        producto_id for tipo, producto_id, _ in operaciones
+        if tipo == 'agregar' or (tipo == 'fijar' and producto_id not in carrito)
+    })
+
+
+def aplicar_lote(carrito, operaciones, datos):
+    """
+    Aplica las operaciones sobre una copia y solo al final la guarda en el
+    carrito: si alguna falla (producto inexistente) el carrito queda intacto.
+    `datos` es el resultado de `datos_productos_carrito`.
+    """
+    lineas = {id_str: list(linea) for id_str, linea in carrito.lineas.items()}
+    for tipo, producto_id, cantidad in operaciones:
+        id_str = str(producto_id)
+        if tipo == 'eliminar':
+            lineas.pop(id_str, None)
+        elif tipo == 'fijar' and id_str in lineas:
+            lineas[id_str][0] = cantidad
+        else:
+            if producto_id not in datos:
+                raise OperacionInvalida(f'El producto {producto_id} no existe.')
+            actual = lineas.get(id_str, [0])[0] if tipo == 'agregar' else 0
+            lineas[id_str] = [actual + cantidad, datos[producto_id][1]]
+    carrito.reemplazar(lineas)
+
+
+# ======================================================================
+# Hidratación (carrito -> líneas con su Producto)
+# ======================================================================
+@dataclass
+class LineaCarrito:
+    """Un producto del carrito con su cantidad y su precio final vigente."""
+    producto: Producto
+    cantidad: int
+    precio_centavos: int
+
+    @property
+    def subtotal_centavos(self):
+        return self.precio_centavos * self.cantidad
+
+    # --- Decimal, solo para mostrar ---
+    @property
+    def precio_unitario(self):
+        return a_decimal(self.precio_centavos)
+
+    @property
+    def subtotal(self):
+        return a_decimal(self.subtotal_centavos)
+
+
+@dataclass
+class CarritoHidratado:
+    lineas: list = field(default_factory=list)
+    # IDs (como texto) que estaban en el carrito pero ya no son válidos
+    obsoletos: list = field(default_factory=list)
+    # {id_str: centavos vigentes} de las líneas cuyo precio guardado ya no es el actual
+    cambiados: dict = field(default_factory=dict)
+
+    def totales(self):
+        return calcular_totales((linea.cantidad, linea.precio_centavos) for linea in self.lineas)
+
+    @property
+    def subtotal(self):
+        return self.totales().subtotal
+
+
+def hidratar_carrito(lineas):
+    """
+    Carga en bloque todos los productos del carrito (con su oferta y el precio
+    final anotado) y devuelve un `CarritoHidratado`.
+
+    `lineas` es el diccionario compacto ``{id_str: [kg, centavos]}`` (por
+    ejemplo ``request.carrito.lineas``). Las líneas llevan el precio final
+    vigente, no el guardado en el carrito (una oferta pudo vencer); las que
+    cambiaron se reportan en `cambiados` y las entradas cuyo producto ya no
+    existe en `obsoletos`. Quien llama decide si actualiza o borra.
+    """
+    resultado, datos_validos = _validar_lineas(lineas)
+    productos = _productos_carrito().in_bulk(datos_validos) if datos_validos else {}
+    return _armar_hidratado(resultado, datos_validos, productos)
+
+
+async def ahidratar_carrito(lineas):
+    """Igual que `hidratar_carrito`, con el ORM async."""
+    resultado, datos_validos = _validar_lineas(lineas)
+    productos = await _productos_carrito().ain_bulk(datos_validos) if datos_validos else {}
+    return _armar_hidratado(resultado, datos_validos, productos)
+
+
+def _productos_carrito():
+    return Producto.objects.select_related('oferta').with_precio_final()
+
+
+def _validar_lineas(lineas):
+    resultado = CarritoHidratado()
+    datos_validos = {}
+    for id_str, (cantidad, centavos) in lineas.items():
+        try:
+            datos_validos[int(id_str)] = (id_str, int(cantidad), int(centavos))
+        except (ValueError, TypeError):
+            resultado.obsoletos.append(id_str)
+    return resultado, datos_validos
+
+
+def _armar_hidratado(resultado, datos_validos, productos):
+    for producto_id, (id_str, cantidad, centavos) in datos_validos.items():
+        producto = productos.get(producto_id)
+        if producto is None:
+            resultado.obsoletos.append(id_str)
+            continue
+        vigente = a_centavos(producto.precio_final)
+        if vigente != centavos:
+            resultado.cambiados[id_str] = vigente
+        resultado.lineas.append(LineaCarrito(producto, cantidad, vigente))
+    return resultado
@@ -0,0 +1,111 @@
+# app_fruteria/categorias.py
+"""
+Mapa de categorías en memoria del proceso: slug / nombre -> categoría.
+
+Las categorías casi nunca cambian y se necesitan en cada página (la ruta
+``/categoria/<slug>/``, el menú de navegación, ``?categoria=`` de la API).
+Se cargan con una sola consulta y quedan en el proceso:
+
+* `signals.py` llama a `invalidar()` al guardar o borrar una Categoría, así
+  el proceso que hizo el cambio lo ve de inmediato;
+* los demás procesos (otros workers) la recargan cuando pasan
+  ``FRUTERIA_CATEGORIAS_SEGUNDOS``.
+
+Con el id ya resuelto, los productos se filtran por ``categoria_id`` (índice
+producto_categoria_nombre_idx) en lugar de unir con la tabla de categorías
+para comparar el nombre.
+"""
+import time
+from typing import NamedTuple
+
+from django.conf import settings
+
+from .models import Categoria
+
+# Segundos que un proceso usa el mapa antes de volver a leerlo de la BD
+TIEMPO_VIDA = getattr(settings, 'FRUTERIA_CATEGORIAS_SEGUNDOS', 5 * 60)
+
+CAMPOS = ('id', 'nombre', 'slug', 'descripcion')
+
+
+class InfoCategoria(NamedTuple):
+    id: int
+    nombre: str
+    slug: str
+    descripcion: str
+
+
+class MapaCategorias(NamedTuple):
+    categorias: tuple    # InfoCategoria ordenadas por nombre
+    por_slug: dict
+    por_nombre: dict     # nombre en minúsculas
+    expira: float
+
+    def buscar(self, valor):
+        """Categoría por slug o por nombre (sin distinguir mayúsculas); None si no existe."""
+        return self.por_slug.get(valor) or self.por_nombre.get(valor.lower())
+
+
+_mapa = None
+# Se incrementa en cada invalidación: una carga que empezó antes no se guarda
+_generacion = 0
+
+
+def _construir(filas):
+    categorias = tuple(InfoCategoria(*fila) for fila in filas)
+    return MapaCategorias(
+        categorias=categorias,
+        por_slug={c.slug: c for c in categorias},
+        por_nombre={c.nombre.lower(): c for c in categorias},
+        expira=time.monotonic() + TIEMPO_VIDA,
+    )
+
+
+def _vigente():
+    mapa = _mapa
+    if mapa is not None and mapa.expira > time.monotonic():
+        return mapa
+    return None
+
+
+def _guardar(mapa, generacion):
+    global _mapa
+    if generacion == _generacion:
+        _mapa = mapa
+    return mapa
+
+
+def cargar():
+    """El mapa vigente; lo lee de la BD (una consulta) si no hay o ya expiró."""
+    mapa = _vigente()
+    if mapa is None:
+        generacion = _generacion
+        filas = Categoria.objects.order_by('nombre').values_list(*CAMPOS)
+        mapa = _guardar(_construir(filas), generacion)
+    return mapa
+
+
+async def acargar():
+    """Como `cargar()` con el ORM async (vistas de views_async.py)."""
+    mapa = _vigente()
+    if mapa is None:
+        generacion = _generacion
+        filas = [fila async for fila in Categoria.objects.order_by('nombre').values_list(*CAMPOS)]
+        mapa = _guardar(_construir(filas), generacion)
+    return mapa
+
+
+def todas():
+    """Todas las categorías ordenadas por nombre (menú de navegación)."""
+    return cargar().categorias
+
+
+def por_slug(slug):
+    return cargar().por_slug.get(slug)
+
+
+def invalidar():
+    """Descarta el mapa de este proceso; la siguiente consulta lo vuelve a leer."""
+    global _mapa, _generacion
+    _generacion += 1
+    _mapa = None
@@ -0,0 +1,14 @@
+# app_fruteria/context_processors.py
+"""
+Procesadores de contexto de la app (ver TEMPLATES en settings.py).
+"""
+from . import categorias as categorias_catalogo
+
+
+def categorias(request):
+    """
+    `categorias_menu` para el submenú de navegación. Se pasa la función, no
+    la lista: la plantilla la llama solo si la usa, y sale del mapa en memoria
+    (categorias.py), así que normalmente no consulta la BD.
+    """
+    return {'categorias_menu': categorias_catalogo.todas}
@@ -0,0 +1,61 @@
+# app_fruteria/dinero.py
+"""
+Aritmética de dinero en centavos enteros.
+
+Dentro del carrito todos los importes son `int` (centavos) y se suman con
+aritmética entera. Solo se convierte a `Decimal` en los bordes: al mostrar
+en plantillas/JSON y al guardar `Compra.total_compra`.
+"""
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+
+CENTAVO = Decimal('0.01')
+
+
+def a_centavos(precio):
+    """Decimal/str con dos decimales -> entero en centavos."""
+    return int((Decimal(precio) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def a_decimal(centavos):
+    """Entero en centavos -> Decimal con dos decimales."""
+    return (Decimal(centavos) / 100).quantize(CENTAVO)
+
+
+def costo_envio_centavos():
+    """Costo fijo de envío; se configura en settings.FRUTERIA_COSTO_ENVIO_CENTAVOS."""
+    return getattr(settings, 'FRUTERIA_COSTO_ENVIO_CENTAVOS', 4000)
+
+
+@dataclass(frozen=True)
+class Totales:
+    """Totales de un carrito en centavos, con accesos en Decimal para las plantillas."""
+    subtotal_centavos: int
+    envio_centavos: int
+
+    @property
+    def total_centavos(self):
+        return self.subtotal_centavos + self.envio_centavos
+
+    @property
+    def subtotal(self):
+        return a_decimal(self.subtotal_centavos)
+
+    @property
+    def envio(self):
+        return a_decimal(self.envio_centavos)
+
+    @property
+    def total(self):
+        return a_decimal(self.total_centavos)
+
+
+def calcular_totales(lineas):
+    """
+    `lineas` es un iterable de pares ``(kg, precio_centavos)``. El envío solo
+    se cobra si el carrito tiene algo.
+    """
+    subtotal = sum(cantidad * centavos for cantidad, centavos in lineas)
+    return Totales(subtotal, costo_envio_centavos() if subtotal > 0 else 0)
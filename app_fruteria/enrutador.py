@@ -0,0 +1,85 @@
+# app_fruteria/enrutador.py
+"""
+Router de base de datos: el catálogo se lee de la réplica.
+
+Si settings.FRUTERIA_BD_REPLICA nombra un alias (backend_olivos/bd.py lo
+agrega con FRUTERIA_BD_REPLICA_HOST), las lecturas de Producto, Categoria,
+Oferta y Sucursal van a ese alias. Todo lo demás (usuarios, sesiones,
+Compra, DetalleCompra) y todas las escrituras van a la primaria, así las
+páginas de pedidos siempre ven la compra que se acaba de registrar.
+
+El catálogo también se lee de la primaria:
+
+* dentro de una transacción (``registrar_compra`` relee los precios en la
+  misma transacción en la que escribe la compra);
+* durante FRUTERIA_BD_REPLICA_RETRASO segundos después de que cualquier
+  proceso guarda algo del catálogo (``signals.py``). Los guardados
+  invalidan las cachés del catálogo y las categorías/ofertas en memoria
+  de todos los procesos; si se rellenaran desde una réplica atrasada,
+  guardarían datos viejos hasta su siguiente vencimiento. Por eso el
+  "hasta cuándo" se guarda en la caché compartida (reloj de pared, el
+  monotónico no se compara entre procesos) y cada proceso lo consulta en
+  las lecturas del catálogo. Con una caché por proceso (LocMem) solo lo
+  ve el proceso que guardó: con réplica hace falta una caché compartida,
+  igual que para la versión del catálogo.
+
+Sin réplica el router no opina y todo va a ``default``.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+MODELOS_CATALOGO = frozenset({
+    'app_fruteria.producto',
+    'app_fruteria.categoria',
+    'app_fruteria.oferta',
+    'app_fruteria.sucursal',
+})
+
+RETRASO = getattr(settings, 'FRUTERIA_BD_REPLICA_RETRASO', 5)
+
+# Hasta cuándo (time.time()) todos los procesos leen el catálogo de la primaria
+CLAVE_PRIMARIA = 'catalogo:primaria_hasta'
+
+# Copia local (time.monotonic()): el proceso que guardó no consulta la caché
+_primaria_hasta = 0.0
+
+
+def catalogo_escrito():
+    """Llamado al guardar el catálogo: la réplica aún puede no tener el cambio."""
+    global _primaria_hasta
+    _primaria_hasta = time.monotonic() + RETRASO
+    cache.set(CLAVE_PRIMARIA, time.time() + RETRASO, RETRASO + 1)
+
+
+def leer_de_primaria():
+    """¿Algún proceso guardó el catálogo hace menos de RETRASO segundos?"""
+    if time.monotonic() < _primaria_hasta:
+        return True
+    return time.time() < cache.get(CLAVE_PRIMARIA, 0.0)
+
+
+class EnrutadorReplica:
+
+    def db_for_read(self, model, **hints):
+        replica = getattr(settings, 'FRUTERIA_BD_REPLICA', None)
+        if replica is None or model._meta.label_lower not in MODELOS_CATALOGO:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block or leer_de_primaria():
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        # Explícito: sin esto Django escribiría en la base de la que se leyó
+        # la instancia (la réplica)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Un DetalleCompra (primaria) puede apuntar a un Producto leído de la réplica
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe el esquema por replicación
+        return db != getattr(settings, 'FRUTERIA_BD_REPLICA', None)
@@ -0,0 +1,118 @@
+# app_fruteria/imagenes.py
+"""
+Derivados redimensionados de `Producto.imagen`.
+
+Por cada imagen se generan versiones WebP y JPEG a varios anchos
+(``FRUTERIA_IMAGEN_ANCHOS``) junto al original, con nombres que incluyen un
+hash del contenido: ``productos/mango-1a2b3c4d5e6f-480w.webp``. Como el nombre
+cambia cuando cambia la imagen, se pueden servir con caché "immutable".
+
+El mapa de derivados se guarda en `Producto.imagen_derivados` y lo usa la
+etiqueta ``{% imagen_producto %}`` para emitir ``srcset``.
+"""
+import hashlib
+import logging
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+ANCHOS = getattr(settings, 'FRUTERIA_IMAGEN_ANCHOS', (120, 240, 480, 960))
+CALIDAD = getattr(settings, 'FRUTERIA_IMAGEN_CALIDAD', 80)
+
+# (formato de Pillow, extensión)
+FORMATOS = [('JPEG', 'jpg')]
+if features.check('webp'):
+    FORMATOS.insert(0, ('WEBP', 'webp'))
+
+
+def _huella(contenido):
+    return hashlib.sha256(contenido).hexdigest()[:12]
+
+
+def _anchos_para(ancho_original):
+    """Anchos a generar sin agrandar la imagen (al menos uno)."""
+    anchos = [a for a in ANCHOS if a < ancho_original]
+    return anchos or [ancho_original]
+
+
+def generar_derivados(producto, forzar=False):
+    """
+    Genera (si hace falta) los derivados de la imagen del producto y devuelve
+    el mapa que debe guardarse en `imagen_derivados`. No guarda el producto.
+    """
+    if not producto.imagen:
+        return {}
+
+    with producto.imagen.open('rb') as archivo:
+        contenido = archivo.read()
+    huella = _huella(contenido)
+    actuales = producto.imagen_derivados or {}
+    if not forzar and actuales.get('huella') == huella and actuales.get('original') == producto.imagen.name:
+        return actuales
+
+    imagen = ImageOps.exif_transpose(Image.open(BytesIO(contenido)))
+    if imagen.mode not in ('RGB', 'RGBA'):
+        imagen = imagen.convert('RGBA' if 'transparency' in imagen.info else 'RGB')
+
+    almacenamiento = producto.imagen.storage
+    base = posixpath.splitext(producto.imagen.name)[0]
+    variantes = {extension: [] for _, extension in FORMATOS}
+
+    for ancho in _anchos_para(imagen.width):
+        alto = max(1, round(imagen.height * ancho / imagen.width))
+        redimensionada = imagen.resize((ancho, alto), Image.Resampling.LANCZOS)
+        for formato, extension in FORMATOS:
+            nombre = f'{base}-{huella}-{ancho}w.{extension}'
+            if forzar or not almacenamiento.exists(nombre):
+                salida = redimensionada if formato != 'JPEG' else redimensionada.convert('RGB')
+                buffer = BytesIO()
+                salida.save(buffer, format=formato, quality=CALIDAD, optimize=True)
+                if almacenamiento.exists(nombre):
+                    almacenamiento.delete(nombre)
+                nombre = almacenamiento.save(nombre, ContentFile(buffer.getvalue()))
+            variantes[extension].append([ancho, nombre])
+
+    return {
+        'huella': huella,
+        'original': producto.imagen.name,
+        'ancho': imagen.width,
+        'alto': imagen.height,
+        'variantes': variantes,
+    }
+
+
+def eliminar_derivados_obsoletos(almacenamiento, anteriores, nuevos):
+    """Borra los archivos de `anteriores` que ya no aparecen en `nuevos`."""
+    vigentes = {
+        nombre for lista in (nuevos or {}).get('variantes', {}).values() for _, nombre in lista
+    }
+    for lista in (anteriores or {}).get('variantes', {}).values():
+        for _, nombre in lista:
+            if nombre not in vigentes and almacenamiento.exists(nombre):
+                almacenamiento.delete(nombre)
+
+
+def actualizar_derivados(producto, forzar=False):
+    """
+    Regenera los derivados si la imagen cambió y guarda el mapa con un
+    UPDATE directo (sin volver a disparar post_save). Devuelve True si cambió.
+    """
+    anteriores = producto.imagen_derivados or {}
+    try:
+        nuevos = generar_derivados(producto, forzar=forzar)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        logger.warning('No se pudieron generar derivados de %s: %s', producto.imagen.name, error)
+        return False
+
+    if nuevos == anteriores:
+        return False
+    if producto.imagen:
+        eliminar_derivados_obsoletos(producto.imagen.storage, anteriores, nuevos)
+    type(producto).objects.filter(pk=producto.pk).update(imagen_derivados=nuevos)
+    producto.imagen_derivados = nuevos
+    return True
@@ -0,0 +1,155 @@
+# app_fruteria/management/commands/bench_fruteria.py
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from app_fruteria.management.commands.seed_fruteria import CONTRASENA
+from app_fruteria.models import Compra, Producto
+
+AJAX = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide tiempo y número de consultas de cada URL de app_fruteria con el cliente '
+        'de pruebas, sobre una base temporal llenada con seed_fruteria. Resultado en JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', type=float, default=1.0, help='Se pasa a seed_fruteria')
+        parser.add_argument('--semilla', type=int, default=0, help='Se pasa a seed_fruteria')
+        parser.add_argument('--repeticiones', type=int, default=20, help='Peticiones por escenario')
+        parser.add_argument('--lineas-carrito', type=int, default=10, help='Productos en el carrito de prueba')
+        parser.add_argument('--solo', nargs='*', help='Nombres de escenarios a ejecutar')
+        parser.add_argument('--salida', help='Archivo donde escribir el JSON (por defecto stdout)')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        nombre_bd = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            call_command('seed_fruteria', escala=options['escala'], semilla=options['semilla'], verbosity=0)
+            cache.clear()
+            resultados = self.ejecutar(options)
+        finally:
+            connection.creation.destroy_test_db(nombre_bd, verbosity=0)
+            teardown_test_environment()
+
+        informe = {
+            'meta': {
+                'fecha': timezone.now().isoformat(),
+                'escala': options['escala'],
+                'semilla': options['semilla'],
+                'repeticiones': options['repeticiones'],
+                'lineas_carrito': options['lineas_carrito'],
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'motor_bd': connection.vendor,
+            },
+            'escenarios': resultados,
+        }
+        texto = json.dumps(informe, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto)
+            self.stderr.write(f"Resultados guardados en {options['salida']}")
+        else:
+            self.stdout.write(texto)
+
+    # ------------------------------------------------------------------
+    def escenarios(self, options):
+        """
+        Cada escenario: (nombre, método, url, preparar, extra). `preparar` se
+        ejecuta antes de cada petición y no se cronometra.
+        """
+        productos = list(Producto.objects.order_by('pk').values_list('pk', flat=True)[:max(1, options['lineas_carrito'])])
+        uno = productos[0]
+        compra = Compra.objects.filter(cliente=self.usuario).order_by('-pk').first()
+
+        def llenar_carrito():
+            for pk in productos:
+                self.client.get(reverse('agregar_al_carrito', args=[pk]), **AJAX)
+
+        def asegurar_producto():
+            self.client.get(reverse('agregar_al_carrito', args=[uno]), **AJAX)
+
+        def nada():
+            pass
+
+        return [
+            ('inicio', 'get', reverse('inicio'), nada, {}),
+            ('menu', 'get', reverse('menu_virtual'), nada, {}),
+            ('citricas', 'get', reverse('categoria', args=['citricas']), nada, {}),
+            ('dulces', 'get', reverse('categoria', args=['dulces']), nada, {}),
+            ('neutras', 'get', reverse('categoria', args=['neutras']), nada, {}),
+            ('ofertas', 'get', reverse('ver_ofertas'), nada, {}),
+            ('iniciar_sesion', 'get', reverse('iniciar_sesion'), nada, {}),
+            ('perfil', 'get', reverse('perfil'), nada, {}),
+            ('carrito_agregar', 'get', reverse('agregar_al_carrito', args=[uno]), nada, AJAX),
+            ('carrito_ajustar', 'get', reverse('ajustar_cantidad', args=[uno, 'aumentar']), asegurar_producto, AJAX),
+            ('carrito_eliminar', 'get', reverse('eliminar_item_carrito', args=[uno]), asegurar_producto, AJAX),
+            ('carrito', 'get', reverse('ver_carrito'), llenar_carrito, {}),
+            ('compra_get', 'get', reverse('confirmar_compra'), llenar_carrito, {}),
+            ('compra_post', 'post', reverse('confirmar_compra'), llenar_carrito, {'data': {'numero_tarjeta': '4111'}}),
+            ('orden_confirmada', 'get', reverse('orden_confirmada', args=[compra.pk]), nada, {}),
+        ]
+
+    def ejecutar(self, options):
+        from django.contrib.auth.models import User
+
+        self.usuario = User.objects.filter(is_staff=False).order_by('pk').first()
+        self.client = Client()
+        if not self.client.login(username=self.usuario.username, password=CONTRASENA):
+            raise RuntimeError('No se pudo iniciar sesión con el usuario sintético.')
+
+        resultados = {}
+        for nombre, metodo, url, preparar, extra in self.escenarios(options):
+            if options['solo'] and nombre not in options['solo']:
+                continue
+            tiempos, consultas, estados = [], [], set()
+            for _ in range(options['repeticiones']):
+                preparar()
+                peticion = getattr(self.client, metodo)
+                with CaptureQueriesContext(connection) as capturadas:
+                    inicio = time.perf_counter()
+                    respuesta = peticion(url, **extra)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                consultas.append(len(capturadas))
+                estados.add(respuesta.status_code)
+
+            resultados[nombre] = {
+                'metodo': metodo.upper(),
+                'url': url,
+                'ms': {
+                    'min': round(min(tiempos), 3),
+                    'p50': round(statistics.median(tiempos), 3),
+                    'p95': round(percentil(tiempos, 95), 3),
+                    'max': round(max(tiempos), 3),
+                    'media': round(statistics.fmean(tiempos), 3),
+                },
+                'consultas': {
+                    'min': min(consultas),
+                    'max': max(consultas),
+                    'media': round(statistics.fmean(consultas), 2),
+                },
+                'status': sorted(estados),
+            }
+            self.stderr.write(f"{nombre:<18} p50={resultados[nombre]['ms']['p50']:>8.2f} ms  "
+                              f"consultas={resultados[nombre]['consultas']['media']}")
+        return resultados
@@ -0,0 +1,32 @@
+# app_fruteria/management/commands/generar_derivados.py
+from django.core.management.base import BaseCommand
+
+from app_fruteria.cache import invalidar_catalogo
+from app_fruteria.imagenes import actualizar_derivados
+from app_fruteria.models import Producto
+
+
+class Command(BaseCommand):
+    help = 'Genera las miniaturas WebP/JPEG de las imágenes de productos existentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='IDs de producto (por defecto todos)')
+        parser.add_argument('--forzar', action='store_true',
+                            help='Regenera aunque la imagen no haya cambiado')
+
+    def handle(self, *args, **options):
+        productos = Producto.objects.exclude(imagen='').exclude(imagen__isnull=True).order_by('pk')
+        if options['ids']:
+            productos = productos.filter(pk__in=options['ids'])
+
+        actualizados = 0
+        for producto in productos.iterator():
+            if actualizar_derivados(producto, forzar=options['forzar']):
+                actualizados += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'  {producto.pk} {producto.imagen.name}')
+
+        if actualizados:
+            invalidar_catalogo()
+        if options['verbosity']:
+            self.stdout.write(self.style.SUCCESS(f'Derivados actualizados en {actualizados} producto(s).'))
@@ -0,0 +1,43 @@
+# app_fruteria/management/commands/programar_ofertas.py
+"""
+Deja calculadas las ofertas vigentes del día (app_fruteria/ofertas.py).
+
+Sin opciones lo hace una vez y termina; pensado para cron a medianoche en
+la hora de la tienda:
+
+    CRON_TZ=America/Mexico_City
+    0 0 * * *  python manage.py programar_ofertas
+
+Con ``--continuo`` queda corriendo (p. ej. como servicio de systemd) y
+repite el cálculo en cada cambio de día local. En los dos casos es solo un
+precálculo: si no corre, la primera petición del día lo hace.
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app_fruteria import ofertas
+
+# Margen después de medianoche para no despertar un instante antes
+MARGEN = timedelta(seconds=1)
+
+
+class Command(BaseCommand):
+    help = 'Calcula las ofertas vigentes del día; con --continuo, en cada medianoche local.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--continuo', action='store_true', help='Repetir en cada cambio de día.')
+
+    def handle(self, *args, **options):
+        while True:
+            vigentes = ofertas.refrescar()
+            if options['verbosity']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{vigentes.dia}: {len(vigentes.descuentos)} ofertas vigentes.'
+                ))
+            if not options['continuo']:
+                return
+            espera = (vigentes.valida_hasta + MARGEN - timezone.now()).total_seconds()
+            time.sleep(max(espera, 0))
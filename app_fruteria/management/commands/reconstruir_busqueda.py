@@ -0,0 +1,16 @@
+# app_fruteria/management/commands/reconstruir_busqueda.py
+from django.core.management.base import BaseCommand
+
+from app_fruteria.busqueda import obtener_buscador
+from app_fruteria.cache import invalidar_catalogo
+
+
+class Command(BaseCommand):
+    help = 'Regenera el índice de búsqueda de productos (FTS5 en SQLite).'
+
+    def handle(self, *args, **options):
+        buscador = obtener_buscador()
+        buscador.reconstruir()
+        invalidar_catalogo()
+        if options['verbosity']:
+            self.stdout.write(self.style.SUCCESS(f'Índice reconstruido ({type(buscador).__name__}).'))
@@ -0,0 +1,46 @@
+# app_fruteria/management/commands/registrar_compra.py
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from app_fruteria.models import Sucursal
+from app_fruteria.pedidos import PedidoInvalido, registrar_compra
+
+
+class Command(BaseCommand):
+    help = 'Registra una compra para un usuario. Ej: registrar_compra ana 3:2 7:1 (producto:kg)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usuario', help='username del cliente')
+        parser.add_argument('lineas', nargs='+', help='pares producto_id:kg')
+        parser.add_argument('--sucursal', type=int, help='ID de la sucursal (por defecto la de cada producto)')
+        parser.add_argument('--estado', default='Pagado')
+
+    def handle(self, *args, **options):
+        try:
+            cliente = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f"No existe el usuario {options['usuario']!r}.")
+
+        cantidades = {}
+        for par in options['lineas']:
+            producto_id, _, kg = par.partition(':')
+            try:
+                cantidades[int(producto_id)] = cantidades.get(int(producto_id), 0) + int(kg or 1)
+            except ValueError:
+                raise CommandError(f'Línea inválida {par!r}; usa producto_id:kg.')
+
+        sucursal = None
+        if options['sucursal']:
+            try:
+                sucursal = Sucursal.objects.get(pk=options['sucursal'])
+            except Sucursal.DoesNotExist:
+                raise CommandError(f"No existe la sucursal {options['sucursal']}.")
+
+        try:
+            compra = registrar_compra(cliente, cantidades, sucursal=sucursal, estado=options['estado'])
+        except PedidoInvalido as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Compra #{compra.pk} registrada: ${compra.total_compra:.2f}'
+        ))
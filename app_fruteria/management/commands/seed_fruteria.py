@@ -0,0 +1,208 @@
+# app_fruteria/management/commands/seed_fruteria.py
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from app_fruteria.models import (
+    Categoria, Compra, DetalleCompra, Existencia, Oferta, PerfilCliente, Producto, Sucursal,
+)
+from app_fruteria.pedidos import resumir
+
+# Volúmenes para --escala 1; cada opción explícita los reemplaza
+BASE = {
+    'sucursales': 3,
+    'productos': 200,
+    'ofertas': 20,
+    'usuarios': 50,
+    'compras': 500,
+}
+
+FRUTAS = {
+    'Cítricas': ['Limón', 'Lima', 'Naranja', 'Mandarina', 'Toronja', 'Pomelo', 'Kumquat'],
+    'Dulces': ['Mango', 'Plátano', 'Uva', 'Pera', 'Manzana', 'Cereza', 'Papaya', 'Melón', 'Sandía', 'Higo'],
+    'Neutras': ['Aguacate', 'Coco', 'Almendra', 'Nuez', 'Aceituna', 'Pepino', 'Castaña'],
+}
+VARIEDADES = ['', 'Orgánico', 'Premium', 'de Temporada', 'Criollo', 'Importado', 'Miniatura', 'Silvestre']
+
+# Contraseña de todos los usuarios sintéticos (para las pruebas de carga)
+CONTRASENA = 'olivos-verdes-123'
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera datos sintéticos realistas (sucursales, categorías, productos, ofertas, '
+        'existencias, usuarios, compras y detalles). Ej: seed_fruteria --escala 10 --semilla 1'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semilla', type=int, default=0, help='Semilla del generador aleatorio')
+        parser.add_argument('--escala', type=float, default=1.0, help='Multiplicador de los volúmenes base')
+        for nombre in BASE:
+            parser.add_argument(f'--{nombre}', type=int, help=f'Cantidad exacta de {nombre}')
+        parser.add_argument('--lineas-por-compra', type=int, default=4,
+                            help='Máximo de DetalleCompra por compra (0 = sin detalles)')
+        parser.add_argument('--lote', type=int, default=2000, help='Tamaño de cada bulk_create')
+        parser.add_argument('--limpiar', action='store_true',
+                            help='Borra primero los datos de la tienda y los usuarios no staff')
+
+    def handle(self, *args, **options):
+        azar = random.Random(options['semilla'])
+        volumen = {
+            nombre: options[nombre] if options[nombre] is not None else max(1, round(base * options['escala']))
+            for nombre, base in BASE.items()
+        }
+        self.lote = options['lote']
+
+        with transaction.atomic():
+            if options['limpiar']:
+                self.limpiar()
+            sucursales = self.crear_sucursales(volumen['sucursales'])
+            categorias = self.crear_categorias()
+            ofertas = self.crear_ofertas(azar, volumen['ofertas'])
+            productos = self.crear_productos(azar, volumen['productos'], sucursales, categorias, ofertas)
+            volumen['existencias'] = self.crear_existencias(azar, productos, sucursales)
+            usuarios = self.crear_usuarios(volumen['usuarios'])
+            total_detalles = self.crear_compras(
+                azar, volumen['compras'], usuarios, sucursales, productos, options['lineas_por_compra'],
+            )
+
+        volumen['detalles'] = total_detalles
+        if options['verbosity']:
+            self.stdout.write(self.style.SUCCESS(
+                'Datos generados: ' + ', '.join(f'{n}={v}' for n, v in volumen.items())
+            ))
+
+    # ------------------------------------------------------------------
+    def limpiar(self):
+        DetalleCompra.objects.all().delete()
+        Compra.objects.all().delete()
+        Producto.objects.all().delete()
+        Oferta.objects.all().delete()
+        Categoria.objects.all().delete()
+        Sucursal.objects.all().delete()
+        User.objects.filter(is_staff=False).delete()
+
+    def crear_en_lotes(self, modelo, objetos):
+        creados = []
+        for inicio in range(0, len(objetos), self.lote):
+            creados.extend(modelo.objects.bulk_create(objetos[inicio:inicio + self.lote]))
+        return creados
+
+    def crear_sucursales(self, cantidad):
+        inicio = Sucursal.objects.count()
+        return self.crear_en_lotes(Sucursal, [
+            Sucursal(nombre=f'Sucursal {inicio + i + 1}', direccion=f'Av. de los Olivos {100 + inicio + i}')
+            for i in range(cantidad)
+        ])
+
+    def crear_categorias(self):
+        return {
+            nombre: Categoria.objects.get_or_create(nombre=nombre)[0]
+            for nombre in FRUTAS
+        }
+
+    def crear_ofertas(self, azar, cantidad):
+        hoy = timezone.localdate()
+        ofertas = []
+        for i in range(cantidad):
+            inicio = hoy + timedelta(days=azar.randint(-30, 10))
+            ofertas.append(Oferta(
+                nombre=f'Oferta {i + 1}',
+                descripcion='Descuento por temporada.',
+                activo=azar.random() < 0.85,
+                fecha_inicio=inicio,
+                fecha_fin=inicio + timedelta(days=azar.randint(3, 45)),
+                porcentaje_descuento=Decimal(azar.choice([5, 10, 15, 20, 25, 30, 40])),
+            ))
+        return self.crear_en_lotes(Oferta, ofertas)
+
+    def crear_productos(self, azar, cantidad, sucursales, categorias, ofertas):
+        nombres = [(cat, fruta) for cat, frutas in FRUTAS.items() for fruta in frutas]
+        productos = []
+        for i in range(cantidad):
+            categoria, fruta = azar.choice(nombres)
+            variedad = azar.choice(VARIEDADES)
+            productos.append(Producto(
+                nombre=f'{fruta} {variedad} {i + 1}'.replace('  ', ' '),
+                precio=Decimal(azar.randint(1500, 18000)) / 100,
+                descripcion=f'{fruta} fresco de temporada, vendido por kilo.',
+                categoria=categorias[categoria],
+                sucursal=azar.choice(sucursales),
+                oferta=azar.choice(ofertas) if ofertas and azar.random() < 0.15 else None,
+            ))
+        return self.crear_en_lotes(Producto, productos)
+
+    def crear_existencias(self, azar, productos, sucursales):
+        """Kilos de cada producto en cada sucursal; algunos agotados."""
+        return len(self.crear_en_lotes(Existencia, [
+            Existencia(
+                producto=producto,
+                sucursal=sucursal,
+                kg_disponibles=0 if azar.random() < 0.05 else azar.randint(20, 500),
+            )
+            for producto in productos
+            for sucursal in sucursales
+        ]))
+
+    def crear_usuarios(self, cantidad):
+        contrasena = make_password(CONTRASENA) # Un solo hash para todos
+        inicio = User.objects.count()
+        usuarios = self.crear_en_lotes(User, [
+            User(
+                username=f'cliente{inicio + i}',
+                email=f'cliente{inicio + i}@ejemplo.mx',
+                first_name='Cliente',
+                last_name=str(inicio + i),
+                password=contrasena,
+            )
+            for i in range(cantidad)
+        ])
+        self.crear_en_lotes(PerfilCliente, [
+            PerfilCliente(user=u, direccion=f'Calle {u.pk}', telefono='5550000000') for u in usuarios
+        ])
+        return usuarios
+
+    def crear_compras(self, azar, cantidad, usuarios, sucursales, productos, max_lineas):
+        ahora = timezone.now()
+        total_detalles = 0
+        for inicio in range(0, cantidad, self.lote):
+            compras = Compra.objects.bulk_create([
+                Compra(
+                    cliente=azar.choice(usuarios),
+                    sucursal=azar.choice(sucursales),
+                    estado='Pagado',
+                )
+                for _ in range(min(self.lote, cantidad - inicio))
+            ])
+            detalles = []
+            for compra in compras:
+                lineas = [
+                    DetalleCompra(
+                        compra=compra,
+                        producto=producto,
+                        cantidad=azar.randint(1, 5),
+                        precio_unitario=producto.precio,
+                        nombre_producto=producto.nombre,
+                    )
+                    for producto in azar.sample(productos, min(len(productos), azar.randint(1, max_lineas)))
+                ] if max_lineas > 0 else []
+                for d in lineas:
+                    d.subtotal = d.cantidad * d.precio_unitario
+                compra.total_compra = sum((d.subtotal for d in lineas), Decimal('0.00'))
+                compra.num_lineas = len(lineas)
+                compra.resumen = resumir((d.nombre_producto, d.cantidad) for d in lineas)
+                compra.fecha_compra = ahora - timedelta(minutes=azar.randint(0, 60 * 24 * 365))
+                detalles.extend(lineas)
+            # fecha_compra es auto_now_add: se corrige después de insertar
+            Compra.objects.bulk_update(
+                compras, ['total_compra', 'num_lineas', 'resumen', 'fecha_compra'], batch_size=self.lote,
+            )
+            self.crear_en_lotes(DetalleCompra, detalles)
+            total_detalles += len(detalles)
+        return total_detalles
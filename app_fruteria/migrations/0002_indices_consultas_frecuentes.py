@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_fruteria', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='compra',
+            index=models.Index(fields=['cliente', 'id'], name='compra_cliente_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='oferta',
+            index=models.Index(fields=['activo', 'fecha_inicio', 'fecha_fin'], name='oferta_vigencia_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['nombre'], name='producto_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['categoria', 'nombre'], name='producto_categoria_nombre_idx'),
+        ),
+        # Índices funcionales sobre auth_user para EmailOrUsernameBackend
+        # (LOWER(username) = LOWER(?) OR LOWER(email) = LOWER(?)). La tabla es de
+        # django.contrib.auth, por eso se crean con SQL y no con Meta.indexes.
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS auth_user_username_lower_idx ON auth_user (LOWER(username));',
+            reverse_sql='DROP INDEX IF EXISTS auth_user_username_lower_idx;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS auth_user_email_lower_idx ON auth_user (LOWER(email));',
+            reverse_sql='DROP INDEX IF EXISTS auth_user_email_lower_idx;',
+        ),
+    ]
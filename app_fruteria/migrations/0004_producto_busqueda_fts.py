@@ -0,0 +1,83 @@
+# Índice de búsqueda de texto completo (FTS5) para app_fruteria/busqueda.py.
+#
+# Solo en SQLite: la tabla virtual se mantiene al día con triggers, así que
+# también cubre bulk_create (seed_fruteria), .update() y el admin. En otras
+# bases la migración no hace nada y busqueda.py usa otro backend.
+
+from django.db import migrations
+
+TABLA = 'app_fruteria_producto_fts'
+
+CREAR = [
+    # remove_diacritics 2: "limon" encuentra "Limón"; prefix: índices para
+    # búsquedas de 2 y 3 letras mientras se escribe.
+    f"""CREATE VIRTUAL TABLE {TABLA} USING fts5(
+        nombre, descripcion, categoria,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )""",
+    # ORDER BY rank = bm25 con más peso al nombre que a la categoría y la descripción
+    f"INSERT INTO {TABLA}({TABLA}, rank) VALUES ('rank', 'bm25(10.0, 1.0, 4.0)')",
+]
+
+# También los usa 0005, que los quita mientras SQLite reconstruye la tabla de categorías
+TRIGGERS = [
+    f"""CREATE TRIGGER {TABLA}_ai AFTER INSERT ON app_fruteria_producto BEGIN
+        INSERT INTO {TABLA}(rowid, nombre, descripcion, categoria)
+        VALUES (new.id, new.nombre, new.descripcion,
+                (SELECT nombre FROM app_fruteria_categoria WHERE id = new.categoria_id));
+    END""",
+    f"""CREATE TRIGGER {TABLA}_ad AFTER DELETE ON app_fruteria_producto BEGIN
+        DELETE FROM {TABLA} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER {TABLA}_au AFTER UPDATE OF nombre, descripcion, categoria_id
+        ON app_fruteria_producto BEGIN
+        DELETE FROM {TABLA} WHERE rowid = old.id;
+        INSERT INTO {TABLA}(rowid, nombre, descripcion, categoria)
+        VALUES (new.id, new.nombre, new.descripcion,
+                (SELECT nombre FROM app_fruteria_categoria WHERE id = new.categoria_id));
+    END""",
+    f"""CREATE TRIGGER {TABLA}_categoria_au AFTER UPDATE OF nombre ON app_fruteria_categoria BEGIN
+        UPDATE {TABLA} SET categoria = new.nombre
+        WHERE rowid IN (SELECT id FROM app_fruteria_producto WHERE categoria_id = new.id);
+    END""",
+]
+
+LLENAR = [
+    # Productos que ya existían
+    f"""INSERT INTO {TABLA}(rowid, nombre, descripcion, categoria)
+        SELECT p.id, p.nombre, p.descripcion, c.nombre
+        FROM app_fruteria_producto p LEFT JOIN app_fruteria_categoria c ON c.id = p.categoria_id""",
+]
+
+ELIMINAR_TRIGGERS = [
+    f'DROP TRIGGER IF EXISTS {TABLA}_categoria_au',
+    f'DROP TRIGGER IF EXISTS {TABLA}_au',
+    f'DROP TRIGGER IF EXISTS {TABLA}_ad',
+    f'DROP TRIGGER IF EXISTS {TABLA}_ai',
+]
+
+ELIMINAR = [*ELIMINAR_TRIGGERS, f'DROP TABLE IF EXISTS {TABLA}']
+
+
+def crear_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in CREAR + TRIGGERS + LLENAR:
+            schema_editor.execute(sql)
+
+
+def eliminar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in ELIMINAR:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_fruteria', '0003_producto_imagen_derivados'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
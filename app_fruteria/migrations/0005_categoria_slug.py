@@ -0,0 +1,61 @@
+# Slug de las categorías para la vista única /categoria/<slug>/.
+#
+# Se agrega la columna vacía, se llena con el nombre (slugify: "Cítricas" ->
+# "citricas", las mismas rutas que tenían las vistas anteriores) y después se
+# vuelve única. En SQLite ese último paso reconstruye la tabla, y no se
+# puede renombrar mientras los triggers del índice FTS5 (migración 0004) la
+# mencionan: se quitan antes y se vuelven a crear al final (y al revertir).
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+fts = import_module('app_fruteria.migrations.0004_producto_busqueda_fts')
+
+
+def llenar_slugs(apps, schema_editor):
+    Categoria = apps.get_model('app_fruteria', 'Categoria')
+    usados = set()
+    for categoria in Categoria.objects.order_by('id'):
+        slug = slugify(categoria.nombre) or str(categoria.id)
+        if slug in usados:
+            slug = f'{slug}-{categoria.id}'
+        usados.add(slug)
+        categoria.slug = slug
+        categoria.save(update_fields=['slug'])
+
+
+def quitar_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in fts.ELIMINAR_TRIGGERS:
+            schema_editor.execute(sql)
+
+
+def crear_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in fts.TRIGGERS:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_fruteria', '0004_producto_busqueda_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(quitar_triggers, crear_triggers),
+        migrations.AddField(
+            model_name='categoria',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=60, null=True),
+        ),
+        migrations.RunPython(llenar_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='categoria',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=60, unique=True),
+        ),
+        migrations.RunPython(crear_triggers, quitar_triggers),
+    ]
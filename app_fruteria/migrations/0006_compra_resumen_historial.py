@@ -0,0 +1,84 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:26
+#
+# Resumen desnormalizado de cada compra (número de líneas y texto) y copia del
+# nombre del producto y del subtotal en cada línea; se llenan para las compras
+# que ya existían.
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery
+
+# Copia congelada de pedidos.resumir() tal como estaba al escribir esta
+# migración: si pedidos.py cambia, esta migración sigue dando el mismo texto.
+PRODUCTOS_EN_RESUMEN = 3
+LARGO_RESUMEN = 255
+
+
+def resumir(lineas):
+    lineas = list(lineas)
+    partes = [f'{nombre} ({kg} kg)' for nombre, kg in lineas[:PRODUCTOS_EN_RESUMEN]]
+    texto = ', '.join(partes)
+    if len(lineas) > PRODUCTOS_EN_RESUMEN:
+        texto += f' y {len(lineas) - PRODUCTOS_EN_RESUMEN} más'
+    return texto if len(texto) <= LARGO_RESUMEN else texto[:LARGO_RESUMEN - 1] + '…'
+
+
+def llenar_resumenes(apps, schema_editor):
+    Compra = apps.get_model('app_fruteria', 'Compra')
+    DetalleCompra = apps.get_model('app_fruteria', 'DetalleCompra')
+    Producto = apps.get_model('app_fruteria', 'Producto')
+
+    DetalleCompra.objects.update(
+        subtotal=ExpressionWrapper(
+            F('cantidad') * F('precio_unitario'), output_field=DecimalField(max_digits=8, decimal_places=2),
+        ),
+        nombre_producto=Subquery(Producto.objects.filter(pk=OuterRef('producto_id')).values('nombre')[:1]),
+    )
+
+    lineas = defaultdict(list)
+    filas = DetalleCompra.objects.order_by('compra_id', 'id').values_list('compra_id', 'nombre_producto', 'cantidad')
+    for compra_id, nombre, cantidad in filas.iterator():
+        lineas[compra_id].append((nombre, cantidad))
+    compras = list(Compra.objects.filter(pk__in=lineas).only('id'))
+    for compra in compras:
+        compra.num_lineas = len(lineas[compra.pk])
+        compra.resumen = resumir(lineas[compra.pk])
+    Compra.objects.bulk_update(compras, ['num_lineas', 'resumen'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_fruteria', '0005_categoria_slug'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compra',
+            name='num_lineas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='compra',
+            name='resumen',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='detallecompra',
+            name='nombre_producto',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='detallecompra',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=8),
+        ),
+        migrations.AddIndex(
+            model_name='compra',
+            index=models.Index(fields=['cliente', 'fecha_compra'], name='compra_cliente_fecha_idx'),
+        ),
+        migrations.RunPython(llenar_resumenes, migrations.RunPython.noop),
+    ]
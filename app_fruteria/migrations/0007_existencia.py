@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:49
+#
+# Inventario por sucursal. No se inventan existencias para los productos que
+# ya había: sin fila el producto no lleva control de inventario y se sigue
+# vendiendo; el control empieza al cargar sus kilos en el admin (Existencias).
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_fruteria', '0006_compra_resumen_historial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Existencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kg_disponibles', models.PositiveIntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='existencias', to='app_fruteria.producto')),
+                ('sucursal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='existencias', to='app_fruteria.sucursal')),
+            ],
+            options={
+                'verbose_name_plural': 'Existencias',
+                'constraints': [models.UniqueConstraint(fields=('sucursal', 'producto'), name='existencia_sucursal_producto_uniq'), models.CheckConstraint(condition=models.Q(('kg_disponibles__gte', 0)), name='existencia_kg_no_negativo')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:06
+#
+# compra_cliente_id_idx (0002) sobraba: orden_confirmada busca por
+# WHERE id = ? AND cliente_id = ?, y la llave primaria ya da la fila; el
+# índice solo costaba espacio y una escritura más por compra. El historial
+# usa compra_cliente_fecha_idx, que también empieza por cliente_id.
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_fruteria', '0007_existencia'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='compra',
+            name='compra_cliente_id_idx',
+        ),
+    ]
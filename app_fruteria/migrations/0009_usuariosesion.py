@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:09
+#
+# Proxy de User para el usuario de la sesión en caché (usuarios.py), sin el
+# hash de la contraseña. No crea tablas.
+
+import django.contrib.auth.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_fruteria', '0008_quitar_compra_cliente_id_idx'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsuarioSesion',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('auth.user',),
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+    ]
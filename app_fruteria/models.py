@@ -1,6 +1,10 @@
-from datetime import date
+from decimal import Decimal
 from django.db import models
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, IntegerField, Q, Value, When
+from django.db.models.functions import Cast, Round
 from django.contrib.auth.models import User 
+from django.utils import timezone
+from django.utils.text import slugify
 
 # ======================================================================
 # 1. Sucursal
@@ -19,8 +23,15 @@ class Sucursal(models.Model):
 class Categoria(models.Model):
     """Representa una categoría de fruta (Cítricas o Dulces)."""
     nombre = models.CharField(max_length=50, unique=True)
+    # URL de la categoría: /categoria/<slug>/ (se llena con el nombre si se deja vacío)
+    slug = models.SlugField(max_length=60, unique=True, blank=True)
     descripcion = models.TextField(blank=True, null=True)
 
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = slugify(self.nombre)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.nombre
 
@@ -46,43 +57,154 @@ class Oferta(models.Model):
     
     class Meta:
         verbose_name_plural = "Ofertas"
+        indexes = [
+            # ofertas vigentes: activo = 1 AND fecha_inicio <= hoy AND fecha_fin >= hoy
+            models.Index(fields=['activo', 'fecha_inicio', 'fecha_fin'], name='oferta_vigencia_idx'),
+        ]
 # ======================================================================
 # 3. Producto (Tus Frutas)
 # ======================================================================
+def oferta_vigente_q(hoy=None, prefijo='oferta__'):
+    """Condición (Q) de una oferta activa cuyo periodo incluye el día `hoy`."""
+    hoy = hoy or timezone.localdate()
+    return Q(**{
+        f'{prefijo}activo': True,
+        f'{prefijo}fecha_inicio__lte': hoy,
+        f'{prefijo}fecha_fin__gte': hoy,
+    })
+
+
+class ProductoQuerySet(models.QuerySet):
+    """Consultas reutilizables del catálogo de productos."""
+
+    def catalogo(self, hoy=None):
+        """
+        Trae la oferta, la categoría y la sucursal en la misma consulta (JOIN),
+        para que las plantillas puedan leer `precio_final` y `categoria.nombre`
+        sin disparar una consulta extra por cada producto.
+        """
+        return self.select_related('oferta', 'categoria', 'sucursal').with_precio_final(hoy)
+
+    def with_precio_final(self, hoy=None):
+        """
+        Anota `precio_efectivo`: el precio con el descuento de la oferta vigente,
+        calculado por la base de datos. Permite ordenar y filtrar por el precio
+        real de venta (`order_by('precio_efectivo')`, `precio_efectivo__lte=...`).
+        """
+        salida = DecimalField(max_digits=8, decimal_places=2)
+        # En centavos y centésimas de punto enteros, con redondeo half-up
+        # entero: (centavos * (10000 - puntos) + 5000) // 10000. SQLite hace
+        # la aritmética decimal en REAL (0.29 al 50% daba 0.14); así coincide
+        # con OfertasVigentes.precio() (Decimal, ROUND_HALF_UP) en cualquier motor.
+        entero = IntegerField()
+        centavos = Cast(Round(F('precio') * Value(100)), entero)
+        puntos = Cast(Round(F('oferta__porcentaje_descuento') * Value(100)), entero)
+        centavos_con_descuento = ExpressionWrapper(
+            (centavos * (Value(10000) - puntos) + Value(5000)) / Value(10000), output_field=entero,
+        )
+        precio_con_descuento = ExpressionWrapper(
+            centavos_con_descuento * Value(Decimal('0.01')), output_field=salida,
+        )
+        return self.annotate(
+            precio_efectivo=Case(
+                When(oferta_vigente_q(hoy), then=precio_con_descuento),
+                default=F('precio'),
+                output_field=salida,
+            )
+        )
+
+    def en_oferta(self, hoy=None):
+        """
+        Productos con una oferta activa y vigente el día `hoy`. Las ofertas
+        vigentes salen del motor de ofertas (ofertas.py): ``oferta_id IN
+        (...)`` usa el índice de la llave foránea, sin JOIN ni fechas.
+        """
+        from .ofertas import vigentes  # ofertas.py importa este módulo
+        return self.filter(oferta_id__in=vigentes(hoy).ids)
+
+    def with_oferta_vigente(self, hoy=None):
+        """Anota `oferta_vigente` (bool): si la oferta del producto aplica el día `hoy`."""
+        from .ofertas import vigentes
+        return self.annotate(
+            oferta_vigente=Case(
+                When(oferta_id__in=vigentes(hoy).ids, then=Value(True)),
+                default=Value(False),
+                output_field=models.BooleanField(),
+            )
+        )
+
+
 class Producto(models.Model):
     """Representa una fruta o verdura disponible en la tienda."""
     nombre = models.CharField(max_length=100)
     precio = models.DecimalField(max_digits=6, decimal_places=2) 
     descripcion = models.TextField()
     imagen = models.ImageField(upload_to='productos/', null=True, blank=True) 
+    # Mapa de versiones redimensionadas (WebP/JPEG); lo llena imagenes.py
+    imagen_derivados = models.JSONField(default=dict, blank=True, editable=False)
     
     # Relaciones
     categoria = models.ForeignKey(Categoria, on_delete=models.SET_NULL, null=True) 
     sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, default=1) 
     oferta = models.ForeignKey(Oferta, on_delete=models.SET_NULL,  null=True,  blank=True, related_name='productos_en_oferta',verbose_name="Aplicar Oferta")
+
+    objects = ProductoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # menú completo ordenado por nombre
+            models.Index(fields=['nombre'], name='producto_nombre_idx'),
+            # páginas de categoría: WHERE categoria_id = ? ORDER BY nombre
+            models.Index(fields=['categoria', 'nombre'], name='producto_categoria_nombre_idx'),
+        ]
+
     @property
     def precio_final(self):
-        """Calcula el precio del producto aplicando el descuento de la oferta vigente."""
-        hoy = date.today()
-        
-        # 1. Verificar si hay una oferta asignada y si está vigente
-        if self.oferta and self.oferta.fecha_inicio <= hoy <= self.oferta.fecha_fin:
-            descuento_porcentaje = self.oferta.porcentaje_descuento
-            
-            # Cálculo: Precio original * (1 - Porcentaje / 100)
-            descuento_monto = self.precio * (descuento_porcentaje / 100)
-            precio_con_descuento = self.precio - descuento_monto
-            
-            # Devuelve el precio con descuento
-            return precio_con_descuento
-            
-        # 2. Si no hay oferta vigente, devuelve el precio original
-        return self.precio 
+        """
+        Precio del producto aplicando el descuento de la oferta vigente.
+
+        Si el producto viene de `with_precio_final()` (o `catalogo()`) se usa el
+        valor que ya calculó la base de datos; si no, se busca el descuento de
+        su oferta entre las vigentes del día (misma regla).
+        """
+        if 'precio_efectivo' in self.__dict__:
+            return self.precio_efectivo
+
+        # Ofertas vigentes de hoy ya calculadas (ofertas.py): no hace falta
+        # cargar self.oferta ni comparar fechas.
+        from .ofertas import vigentes
+        return vigentes().precio(self.precio, self.oferta_id)
 
     def __str__(self):
         return self.nombre
 
 
+# ======================================================================
+# 3b. Existencia (kilos disponibles de un Producto en una Sucursal)
+# ======================================================================
+class Existencia(models.Model):
+    """
+    Inventario por sucursal. Se descuenta al registrar la compra
+    (pedidos.py) con un UPDATE condicional; un producto sin fila en su
+    sucursal no lleva control de inventario.
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='existencias')
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, related_name='existencias')
+    kg_disponibles = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Existencias"
+        constraints = [
+            # checkout: WHERE sucursal_id = ? AND producto_id IN (...)
+            models.UniqueConstraint(fields=['sucursal', 'producto'], name='existencia_sucursal_producto_uniq'),
+            # El UPDATE condicional ya lo evita; la BD lo garantiza igual
+            models.CheckConstraint(condition=Q(kg_disponibles__gte=0), name='existencia_kg_no_negativo'),
+        ]
+
+    def __str__(self):
+        return f'{self.producto} en {self.sucursal}: {self.kg_disponibles} kg'
+
+
 # ======================================================================
 # 5. Cliente (Perfil que complementa al User de Django)
 # ======================================================================
@@ -102,6 +224,38 @@ class PerfilCliente(models.Model):
     def __str__(self):
         return f'Perfil de {self.user.username}'
 
+
+class UsuarioSesion(User):
+    """
+    El User de la sesión tal como se guarda en caché (usuarios.py): sin el
+    hash de la contraseña. `sin_contrasena()` calcula antes los hashes de
+    sesión (HMAC de la contraseña) que ``django.contrib.auth.get_user()``
+    compara en cada petición y deja ``password`` diferido: ``save()`` no lo
+    escribe y leerlo vuelve a consultar la BD.
+    """
+
+    class Meta:
+        proxy = True
+
+    def sin_contrasena(self):
+        self._hashes_sesion = (super().get_session_auth_hash(), list(super().get_session_auth_fallback_hash()))
+        del self.__dict__['password']
+        return self
+
+    def _con_contrasena(self):
+        # Sin hashes guardados, o con la contraseña de vuelta (set_password, refresh_from_db)
+        return not hasattr(self, '_hashes_sesion') or 'password' in self.__dict__
+
+    def get_session_auth_hash(self):
+        if self._con_contrasena():
+            return super().get_session_auth_hash()
+        return self._hashes_sesion[0]
+
+    def get_session_auth_fallback_hash(self):
+        if self._con_contrasena():
+            return super().get_session_auth_fallback_hash()
+        return iter(self._hashes_sesion[1])
+
 # ======================================================================
 # 6. Compra (El Encabezado de la Orden)
 # ======================================================================
@@ -112,6 +266,16 @@ class Compra(models.Model):
     sucursal = models.ForeignKey(Sucursal, on_delete=models.SET_NULL, null=True)
     total_compra = models.DecimalField(max_digits=8, decimal_places=2, default=0.00)
     estado = models.CharField(max_length=50, default='Pendiente') 
+    # Resumen guardado al registrar la compra (pedidos.py), para listar el
+    # historial sin leer los detalles
+    num_lineas = models.PositiveIntegerField(default=0)
+    resumen = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        indexes = [
+            # mis pedidos: WHERE cliente_id = ? ORDER BY fecha_compra DESC
+            models.Index(fields=['cliente', 'fecha_compra'], name='compra_cliente_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Compra #{self.id} de {self.cliente.username}"
@@ -125,10 +289,16 @@ class DetalleCompra(models.Model):
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE) 
     cantidad = models.IntegerField(default=1)
     precio_unitario = models.DecimalField(max_digits=6, decimal_places=2) 
+    # Copia al momento de la compra: el producto puede cambiar de nombre después
+    nombre_producto = models.CharField(max_length=100, blank=True, default='')
+    subtotal = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+
+    def save(self, *args, **kwargs):
+        if not self.nombre_producto:
+            self.nombre_producto = self.producto.nombre
+        self.subtotal = self.cantidad * self.precio_unitario
+        super().save(*args, **kwargs)
 
-    def subtotal(self):
-        return self.cantidad * self.precio_unitario
-    
     def __str__(self):
-        return f"{self.cantidad} x {self.producto.nombre}"
+        return f"{self.cantidad} x {self.nombre_producto}"
     
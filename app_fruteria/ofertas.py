@@ -0,0 +1,166 @@
+# app_fruteria/ofertas.py
+"""
+Motor de ofertas: qué ofertas están vigentes hoy y con qué descuento.
+
+Una oferta aplica si está activa y el día local (TIME_ZONE,
+America/Mexico_City) cae entre ``fecha_inicio`` y ``fecha_fin``; sin
+fechas no aplica. Como las fechas son días completos, el conjunto de
+ofertas vigentes solo cambia:
+
+* a medianoche, hora local: la clave lleva la fecha, así que el primer
+  acceso del día lo recalcula; ``manage.py programar_ofertas`` lo deja
+  listo antes de la primera petición;
+* al guardar o borrar una Oferta (`signals.py`).
+
+El resultado (`OfertasVigentes`: oferta -> porcentaje) se guarda en la
+caché compartida y cada proceso se queda con una copia en memoria durante
+FRUTERIA_OFERTAS_SEGUNDOS, atada a la versión del catálogo (cache.py) con
+la que se leyó: si otro proceso guarda una Oferta, la versión sube y la
+copia se descarta en el siguiente acceso. Si no, este proceso podría
+renderizar /ofertas/ con las ofertas viejas y guardar ese fragmento bajo
+la versión nueva, donde viviría FRUTERIA_CACHE_CATALOGO_SEGUNDOS.
+Con eso el precio de un producto es una búsqueda en un diccionario
+(``descuentos[producto.oferta_id]``) y "productos en oferta" es
+``oferta_id IN (...)`` sobre el índice de la llave foránea, sin JOIN con
+las ofertas ni comparar fechas en cada petición.
+
+`ProductoQuerySet.with_precio_final()` sigue calculando el precio en SQL
+con la misma regla: lo necesita para ordenar y paginar por precio.
+"""
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from datetime import time as hora
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import TIEMPO_CACHE, aversion_catalogo, invalidar_catalogo, version_catalogo
+from .dinero import CENTAVO
+from .models import Oferta, oferta_vigente_q
+
+# Segundos que un proceso usa su copia antes de volver a leer la caché compartida
+TIEMPO_VIDA = getattr(settings, 'FRUTERIA_OFERTAS_SEGUNDOS', 60)
+
+
+def clave(dia):
+    return f'ofertas:vigentes:{dia.isoformat()}'
+
+
+def inicio_del_dia(dia):
+    """Medianoche local (aware) en que empieza `dia`."""
+    return timezone.make_aware(datetime.combine(dia, hora.min))
+
+
+@dataclass(frozen=True)
+class OfertasVigentes:
+    """Ofertas que aplican el `dia`: ``{oferta_id: porcentaje_descuento}``."""
+
+    dia: date
+    descuentos: dict
+
+    @property
+    def ids(self):
+        return sorted(self.descuentos)
+
+    @property
+    def valida_hasta(self):
+        """Medianoche en que este conjunto deja de ser el del día."""
+        return inicio_del_dia(self.dia + timedelta(days=1))
+
+    def __contains__(self, oferta_id):
+        return oferta_id in self.descuentos
+
+    def precio(self, precio, oferta_id):
+        """`precio` con el descuento de la oferta si está vigente (misma regla que en SQL)."""
+        porcentaje = self.descuentos.get(oferta_id)
+        if porcentaje is None:
+            return precio
+        return (precio - precio * (porcentaje / 100)).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+
+# dia -> (OfertasVigentes, expira, versión del catálogo); normalmente solo el día actual
+_memoria = {}
+
+
+def _de_memoria(dia, version):
+    guardado = _memoria.get(dia)
+    if guardado is not None and guardado[1] > time.monotonic() and guardado[2] == version:
+        return guardado[0]
+    return None
+
+
+def _recordar(vigentes, version):
+    if len(_memoria) > 4:
+        # Días que ya pasaron (o consultados a mano)
+        _memoria.clear()
+    _memoria[vigentes.dia] = (vigentes, time.monotonic() + TIEMPO_VIDA, version)
+    return vigentes
+
+
+def _consulta(dia):
+    # Una consulta sobre oferta_vigencia_idx (activo, fecha_inicio, fecha_fin)
+    return Oferta.objects.filter(oferta_vigente_q(dia, prefijo='')).values_list('id', 'porcentaje_descuento')
+
+
+def calcular(dia):
+    """Lee de la BD las ofertas vigentes el `dia`, sin pasar por ninguna caché."""
+    return OfertasVigentes(dia, {oferta_id: Decimal(p) for oferta_id, p in _consulta(dia)})
+
+
+def vigentes(hoy=None):
+    """Ofertas vigentes el día `hoy` (por omisión, el día local actual)."""
+    dia = hoy or timezone.localdate()
+    version = version_catalogo()
+    resultado = _de_memoria(dia, version)
+    if resultado is None:
+        resultado = cache.get(clave(dia))
+        if resultado is None:
+            resultado = calcular(dia)
+            cache.set(clave(dia), resultado, TIEMPO_CACHE)
+        _recordar(resultado, version)
+    return resultado
+
+
+async def avigentes(hoy=None):
+    """Como `vigentes()` con el ORM async; después `vigentes(hoy)` sale de memoria."""
+    dia = hoy or timezone.localdate()
+    version = await aversion_catalogo()
+    resultado = _de_memoria(dia, version)
+    if resultado is None:
+        resultado = await cache.aget(clave(dia))
+        if resultado is None:
+            filas = [fila async for fila in _consulta(dia)]
+            resultado = OfertasVigentes(dia, {oferta_id: Decimal(p) for oferta_id, p in filas})
+            await cache.aset(clave(dia), resultado, TIEMPO_CACHE)
+        _recordar(resultado, version)
+    return resultado
+
+
+def refrescar(hoy=None):
+    """Recalcula y publica en la caché compartida las ofertas del día."""
+    resultado = calcular(hoy or timezone.localdate())
+    cache.set(clave(resultado.dia), resultado, TIEMPO_CACHE)
+    return _recordar(resultado, version_catalogo())
+
+
+def _publicar(hoy):
+    # Otra vez la versión: lo renderizado entre el guardado y el COMMIT
+    # pudo leer las ofertas anteriores
+    invalidar_catalogo()
+    refrescar(hoy)
+
+
+def ofertas_modificadas():
+    """
+    Una Oferta cambió: este proceso deja de usar su copia de inmediato y, al
+    confirmarse la transacción, se publica el conjunto nuevo para los demás
+    y sube la versión del catálogo, con la que descartan su copia.
+    """
+    hoy = timezone.localdate()
+    _memoria.clear()
+    cache.delete(clave(hoy))
+    transaction.on_commit(lambda: _publicar(hoy))
@@ -0,0 +1,183 @@
+# app_fruteria/paginacion.py
+"""
+Paginación por llave (keyset) del catálogo, compartida por la API (api.py) y
+las páginas HTML con scroll infinito (views.py), y del historial de pedidos.
+
+El cursor guarda el valor del orden y el id de la última fila entregada; la
+página siguiente se pide con ``WHERE (orden, id) > (valor, id)``. A
+diferencia de OFFSET, el costo de una página no depende de qué tan lejos
+esté, y los productos nuevos no desplazan ni repiten filas entre páginas.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import QueryDict
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+# ?orden= -> (campo, descendente). El id desempata y forma parte del cursor.
+ORDENES = {
+    'nombre': ('nombre', False),
+    'precio': ('precio_efectivo', False),
+    '-precio': ('precio_efectivo', True),
+    'id': ('id', False),
+}
+
+# Historial de pedidos: del más reciente al más antiguo (índice cliente, fecha_compra)
+ORDENES_PEDIDOS = {
+    '-fecha': ('fecha_compra', True),
+}
+
+
+def _texto(valor):
+    if not isinstance(valor, str):
+        raise ValueError
+    return valor
+
+
+def _decimal_finito(valor):
+    if not isinstance(valor, str):
+        raise ValueError
+    numero = Decimal(valor)
+    if not numero.is_finite():
+        raise ValueError
+    return numero
+
+
+def _entero(valor):
+    # Los ids son enteros de 64 bits con signo
+    if not isinstance(valor, int) or isinstance(valor, bool) or not 0 <= valor < 2 ** 63:
+        raise ValueError
+    return valor
+
+
+def _fecha(valor):
+    fecha = parse_datetime(_texto(valor))
+    if fecha is None:
+        raise ValueError
+    return fecha
+
+
+# Campo del orden -> valida el valor del cursor y lo devuelve con su tipo (el
+# JSON trae Decimal y datetime como texto). Un cursor bien formado puede
+# traer cualquier cosa: lo que no pase es CursorInvalido, no un error del ORM.
+VALORES_CURSOR = {
+    'nombre': _texto,
+    'precio_efectivo': _decimal_finito,
+    'id': _entero,
+    'fecha_compra': _fecha,
+}
+
+
+class CursorInvalido(ValueError):
+    """El cursor no se puede decodificar o es de otro orden."""
+
+
+def codificar_cursor(orden, valor, ultimo_id):
+    if isinstance(valor, datetime):
+        # DjangoJSONEncoder recorta a milisegundos; el cursor necesita el valor exacto
+        valor = valor.isoformat()
+    texto = json.dumps([orden, valor, ultimo_id], cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor, orden, ordenes=ORDENES):
+    """Devuelve ``(valor, id)`` de la última fila de la página anterior."""
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        orden_cursor, valor, ultimo_id = json.loads(texto)
+        if orden_cursor != orden:
+            raise ValueError
+        ultimo_id = _entero(ultimo_id)
+        valor = VALORES_CURSOR[ordenes[orden][0]](valor)
+    except (binascii.Error, ValueError, TypeError, InvalidOperation):
+        raise CursorInvalido('cursor inválido.')
+    return valor, ultimo_id
+
+
+class Pagina:
+    """
+    Una página de `productos` (queryset anotado con `with_precio_final()`), o
+    de otro queryset con su propio diccionario de `ordenes`.
+
+    Es perezosa como un queryset: la consulta se ejecuta la primera vez que
+    se itera, así una plantilla con el fragmento en caché no toca la BD.
+    Con `campos` las filas son diccionarios de ``.values(*campos)``.
+
+    `parametros` (``request.GET``) sirve para armar `parametros_siguiente`:
+    los mismos filtros con el cursor de la página que sigue.
+    """
+
+    def __init__(self, productos, orden, cursor=None, limite=24, parametros=None, campos=None,
+                 ordenes=ORDENES):
+        self.orden = orden
+        self.limite = limite
+        self.parametros = parametros
+        self.campo, descendente = ordenes[orden]
+
+        if cursor:
+            valor, ultimo_id = decodificar_cursor(cursor, orden, ordenes)
+            if self.campo == 'id':
+                productos = productos.filter(id__gt=ultimo_id)
+            else:
+                # (campo, id) > (valor, id) escrito de modo que SQLite pueda usar
+                # el índice de `campo` como rango: campo >= valor AND (...)
+                mayor, mayor_igual = ('lt', 'lte') if descendente else ('gt', 'gte')
+                productos = productos.filter(
+                    Q(**{f'{self.campo}__{mayor_igual}': valor}),
+                    Q(**{f'{self.campo}__{mayor}': valor}) | Q(id__gt=ultimo_id),
+                )
+
+        orden_sql = ('-' if descendente else '') + self.campo
+        productos = productos.order_by(*dict.fromkeys((orden_sql, 'id')))
+        if campos:
+            productos = productos.values(*campos)
+        # Una fila de más indica si hay página siguiente
+        self._consulta = productos[:limite + 1]
+
+    @cached_property
+    def _filas(self):
+        return list(self._consulta)
+
+    async def acargar(self):
+        """Ejecuta la consulta con el ORM async (vistas de views_async.py)."""
+        if '_filas' not in self.__dict__:
+            self.__dict__['_filas'] = [fila async for fila in self._consulta]
+        return self
+
+    @property
+    def filas(self):
+        return self._filas[:self.limite]
+
+    def __iter__(self):
+        return iter(self.filas)
+
+    def __len__(self):
+        return len(self.filas)
+
+    def __bool__(self):
+        return bool(self._filas)
+
+    def _valor(self, fila, campo):
+        return fila[campo] if isinstance(fila, dict) else getattr(fila, campo)
+
+    @cached_property
+    def cursor_siguiente(self):
+        if len(self._filas) <= self.limite:
+            return None
+        ultima = self._filas[self.limite - 1]
+        return codificar_cursor(self.orden, self._valor(ultima, self.campo), self._valor(ultima, 'id'))
+
+    @property
+    def parametros_siguiente(self):
+        """Query string de la página siguiente ('' si esta es la última)."""
+        if not self.cursor_siguiente:
+            return ''
+        parametros = self.parametros.copy() if self.parametros is not None else QueryDict(mutable=True)
+        parametros['cursor'] = self.cursor_siguiente
+        return parametros.urlencode()
@@ -0,0 +1,193 @@
+# app_fruteria/pedidos.py
+"""
+Registro de pedidos (Compra + DetalleCompra).
+
+`registrar_compra` se usa desde la vista de checkout, desde el comando
+``manage.py registrar_compra`` y desde las pruebas.
+
+Las existencias (Existencia) se descuentan en la misma transacción con un
+solo UPDATE condicional para todas las líneas: la condición
+``kg_disponibles >= kg`` y la resta los evalúa la base de datos sobre la
+fila ya bloqueada, así dos compras simultáneas del mismo producto no pueden
+vender el mismo kilo. Solo se bloquean las filas de esos productos en esas
+sucursales (en SQLite, el candado de escritura de siempre).
+
+Cada línea sale de la sucursal de su producto (``Producto.sucursal``), salvo
+que se indique una sucursal para todo el pedido. Un producto sin fila de
+Existencia en esa sucursal no lleva control de inventario y se vende sin
+límite, como antes de existir el modelo.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from .basedatos import escritura
+from .dinero import a_centavos, a_decimal
+from .models import Compra, DetalleCompra, Existencia, Producto
+
+
+# Productos que se nombran en Compra.resumen; el resto se cuenta ("y 3 más")
+PRODUCTOS_EN_RESUMEN = 3
+LARGO_RESUMEN = 255
+
+
+class PedidoInvalido(Exception):
+    """El pedido no se puede registrar (carrito vacío, productos inexistentes...)."""
+
+
+class SinExistencias(PedidoInvalido):
+    """
+    La sucursal no tiene los kilos pedidos de uno o más productos.
+    `faltantes` es ``{producto_id: kg_disponibles}`` de esas líneas.
+    """
+
+    def __init__(self, faltantes, productos):
+        self.faltantes = faltantes
+        partes = [
+            f'{productos[pid].nombre} ({f"quedan {kg} kg" if kg else "agotado"})'
+            for pid, kg in sorted(faltantes.items())
+        ]
+        super().__init__(f'Sin existencias suficientes: {", ".join(partes)}.')
+
+
+class PreciosCambiados(PedidoInvalido):
+    """
+    El precio vigente de una o más líneas no es el que vio el cliente.
+    `cambiados` es ``{producto_id: centavos_vigentes}`` de esas líneas.
+    """
+
+    def __init__(self, cambiados, productos):
+        self.cambiados = cambiados
+        partes = [f'{productos[pid].nombre} (ahora ${a_decimal(c)})' for pid, c in sorted(cambiados.items())]
+        super().__init__(f'Cambió el precio de: {", ".join(partes)}. Revisa el total antes de pagar.')
+
+
+def resumir(lineas):
+    """
+    Texto corto de una compra para el historial a partir de pares
+    ``(nombre, kg)``: "Limón (2 kg), Mango (1 kg), Uva (3 kg) y 2 más".
+    """
+    lineas = list(lineas)
+    partes = [f'{nombre} ({kg} kg)' for nombre, kg in lineas[:PRODUCTOS_EN_RESUMEN]]
+    texto = ', '.join(partes)
+    if len(lineas) > PRODUCTOS_EN_RESUMEN:
+        texto += f' y {len(lineas) - PRODUCTOS_EN_RESUMEN} más'
+    return texto if len(texto) <= LARGO_RESUMEN else texto[:LARGO_RESUMEN - 1] + '…'
+
+
+class _Incompleto(Exception):
+    pass
+
+
+def descontar_existencias(cantidades, productos, sucursal=None):
+    """
+    Resta `cantidades` (``{producto_id: kg}``) de las existencias en un solo
+    UPDATE; todo o nada. Cada línea se descuenta en la sucursal de su
+    producto, o en `sucursal` si se indica. Las líneas sin fila de
+    Existencia no se controlan. Debe llamarse dentro de una transacción.
+    Lanza `SinExistencias` si alguna línea controlada no alcanza.
+    """
+    def sucursal_de(pid):
+        return sucursal.pk if sucursal is not None else productos[pid].sucursal_id
+
+    filas = reduce(or_, (Q(producto_id=pid, sucursal_id=sucursal_de(pid)) for pid in cantidades))
+    controladas = set(Existencia.objects.filter(filas).values_list('producto_id', flat=True))
+    if not controladas:
+        return
+
+    kg = Case(
+        *[When(producto_id=pid, then=Value(cantidades[pid])) for pid in controladas],
+        output_field=IntegerField(),
+    )
+    try:
+        # Savepoint: si no alcanzó, se deshacen las líneas que sí se restaron
+        # y se leen las existencias reales para el mensaje
+        with transaction.atomic():
+            descontadas = Existencia.objects.filter(
+                filas, producto_id__in=controladas, kg_disponibles__gte=kg,
+            ).update(kg_disponibles=F('kg_disponibles') - kg)
+            if descontadas != len(controladas):
+                raise _Incompleto
+    except _Incompleto:
+        disponibles = dict(Existencia.objects.filter(filas).values_list('producto_id', 'kg_disponibles'))
+        faltantes = {pid: kg for pid, kg in disponibles.items() if kg < cantidades[pid]}
+        raise SinExistencias(faltantes, productos)
+
+
+def registrar_compra(cliente, cantidades, sucursal=None, estado='Pagado', precios_esperados=None):
+    """
+    Crea la Compra y todos sus DetalleCompra en una sola transacción.
+
+    `cantidades` es un diccionario ``{producto_id: kg}``. Los precios NO se
+    toman del carrito: se vuelven a leer de la base de datos (precio final con
+    la oferta vigente) dentro de la misma transacción. Con
+    `precios_esperados` (``{producto_id: centavos}``, los que se le
+    mostraron al cliente) se lanza `PreciosCambiados` si alguno ya no es el
+    vigente, en lugar de cobrar otro total.
+
+    La compra queda en `sucursal` si se indica (y todas las existencias se
+    descuentan ahí); si no, en la sucursal del primer producto del pedido, y
+    cada línea se descuenta en la sucursal de su producto.
+
+    Lanza `PedidoInvalido` si no hay líneas, si alguna cantidad no es positiva
+    o si algún producto ya no existe, y `SinExistencias` si no hay los kilos
+    (no se descuenta nada).
+    """
+    try:
+        cantidades = {int(pid): int(kg) for pid, kg in cantidades.items()}
+        if precios_esperados is not None:
+            precios_esperados = {int(pid): int(c) for pid, c in precios_esperados.items()}
+    except (TypeError, ValueError):
+        raise PedidoInvalido('El carrito contiene datos inválidos.')
+
+    if not cantidades:
+        raise PedidoInvalido('Tu carrito está vacío.')
+    if any(kg <= 0 for kg in cantidades.values()):
+        raise PedidoInvalido('Las cantidades deben ser mayores que cero.')
+
+    # BEGIN IMMEDIATE en SQLite (ver basedatos.py): toma el candado de
+    # escritura antes de leer precios, así espera en vez de fallar
+    with escritura():
+        productos = Producto.objects.with_precio_final().in_bulk(cantidades)
+        faltantes = sorted(set(cantidades) - set(productos))
+        if faltantes:
+            raise PedidoInvalido(f'Productos no disponibles: {faltantes}')
+        if precios_esperados is not None:
+            vigentes = {pid: a_centavos(productos[pid].precio_final) for pid in cantidades}
+            cambiados = {pid: c for pid, c in vigentes.items() if c != precios_esperados.get(pid)}
+            if cambiados:
+                raise PreciosCambiados(cambiados, productos)
+
+        descontar_existencias(cantidades, productos, sucursal)
+        if sucursal is None:
+            sucursal_id = productos[next(iter(cantidades))].sucursal_id
+        else:
+            sucursal_id = sucursal.pk
+
+        # bulk_create no llama a DetalleCompra.save(): las copias se llenan aquí
+        detalles = [
+            DetalleCompra(
+                producto=productos[pid],
+                cantidad=kg,
+                precio_unitario=productos[pid].precio_final,
+                nombre_producto=productos[pid].nombre,
+                subtotal=a_decimal(a_centavos(productos[pid].precio_final) * kg),
+            )
+            for pid, kg in cantidades.items()
+        ]
+
+        compra = Compra.objects.create(
+            cliente=cliente,
+            sucursal_id=sucursal_id,
+            total_compra=a_decimal(sum(a_centavos(d.subtotal) for d in detalles)),
+            estado=estado,
+            num_lineas=len(detalles),
+            resumen=resumir((d.nombre_producto, d.cantidad) for d in detalles),
+        )
+        for detalle in detalles:
+            detalle.compra = compra
+        DetalleCompra.objects.bulk_create(detalles)
+
+    return compra
@@ -0,0 +1,284 @@
+# app_fruteria/perfilamiento.py
+"""
+Perfilamiento por petición, sin necesidad de DEBUG.
+
+Se activa con ``FRUTERIA_PERFILAMIENTO_ACTIVO = True``. Por cada petición se
+mide:
+
+* tiempo total;
+* número y tiempo de consultas SQL (con ``connection.execute_wrapper``) y las
+  sentencias repetidas (patrón N+1);
+* tiempo de render de plantillas (backend `PlantillasCronometradas`);
+* bytes de sesión leídos/escritos.
+
+El resultado se envía en la cabecera ``Server-Timing`` y una muestra
+(``FRUTERIA_PERFILAMIENTO_MUESTREO``) se guarda en un buffer circular en
+memoria que se consulta en ``/perfilamiento/`` (solo personal).
+"""
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+# Tiempo de plantillas acumulado en la petición actual (None = no se mide)
+_tiempo_plantillas = ContextVar('tiempo_plantillas', default=None)
+
+# Una sentencia que se repite al menos estas veces en una petición se marca como N+1
+UMBRAL_REPETIDAS = 3
+
+
+def _config(nombre, defecto):
+    return getattr(settings, f'FRUTERIA_PERFILAMIENTO_{nombre}', defecto)
+
+
+# ======================================================================
+# Buffer circular de muestras
+# ======================================================================
+class BufferMuestras:
+    def __init__(self, capacidad):
+        self._muestras = deque(maxlen=capacidad)
+        self._candado = threading.Lock()
+
+    def agregar(self, muestra):
+        with self._candado:
+            self._muestras.append(muestra)
+
+    def muestras(self):
+        with self._candado:
+            return list(self._muestras)
+
+    def vaciar(self):
+        with self._candado:
+            self._muestras.clear()
+
+
+buffer = BufferMuestras(_config('CAPACIDAD', 1000))
+
+
+# ======================================================================
+# Medición de SQL y plantillas
+# ======================================================================
+class RegistroSQL:
+    """execute_wrapper que acumula cada sentencia con su duración."""
+
+    def __init__(self):
+        self.sentencias = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sentencias.append((sql, (time.perf_counter() - inicio) * 1000))
+
+    @property
+    def total_ms(self):
+        return sum(ms for _, ms in self.sentencias)
+
+    def repetidas(self):
+        conteo = Counter(sql for sql, _ in self.sentencias)
+        return {sql: n for sql, n in conteo.items() if n > 1}
+
+
+class _PlantillaCronometrada:
+    def __init__(self, plantilla):
+        self._plantilla = plantilla
+
+    def __getattr__(self, nombre):
+        return getattr(self._plantilla, nombre)
+
+    def render(self, context=None, request=None):
+        acumulado = _tiempo_plantillas.get()
+        if acumulado is None:
+            return self._plantilla.render(context, request)
+        inicio = time.perf_counter()
+        try:
+            return self._plantilla.render(context, request)
+        finally:
+            acumulado[0] += (time.perf_counter() - inicio) * 1000
+
+
+class PlantillasCronometradas(DjangoTemplates):
+    """
+    Backend de plantillas de Django que además mide el tiempo de render
+    cuando el perfilamiento está activo en la petición. Sin perfilamiento
+    el costo es una lectura de ContextVar por render.
+    """
+
+    def from_string(self, template_code):
+        return _PlantillaCronometrada(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _PlantillaCronometrada(super().get_template(template_name))
+
+
+# ======================================================================
+# Middleware
+# ======================================================================
+def _bytes_sesion(request):
+    """(leídos, escritos) aproximados: tamaño codificado de la sesión."""
+    sesion = getattr(request, 'session', None)
+    if sesion is None or not sesion.accessed:
+        return 0, 0
+    tamano = len(sesion.encode(dict(sesion.items())))
+    return tamano, tamano if sesion.modified else 0
+
+
+def _envolver_conexiones(pila, registro):
+    """El mismo registro en todas las conexiones configuradas (las del hilo actual)."""
+    for alias in connections:
+        pila.enter_context(connections[alias].execute_wrapper(registro))
+
+
+class PerfilamientoMiddleware:
+    """
+    Debe ir PRIMERO en MIDDLEWARE para que el tiempo total y la escritura de
+    la sesión (que hace SessionMiddleware al salir) queden dentro de la medición.
+
+    Síncrono y asíncrono: bajo ASGI corre en el event loop. Las conexiones
+    son por hilo y el ORM async corre en el hilo de ``sync_to_async`` de la
+    petición (uno por petición), así que el registro de SQL se pone y se
+    quita en ese hilo; instalarlo desde el event loop no vería ninguna
+    consulta. El tiempo de plantillas viaja en un ContextVar y no lo necesita.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not _config('ACTIVO', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.muestreo = _config('MUESTREO', 1.0)
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        with self._medir(request) as medicion, ExitStack() as pila:
+            _envolver_conexiones(pila, medicion['registro'])
+            medicion['response'] = self.get_response(request)
+        return medicion['response']
+
+    async def __acall__(self, request):
+        with self._medir(request) as medicion:
+            pila = ExitStack()
+            await sync_to_async(_envolver_conexiones)(pila, medicion['registro'])
+            try:
+                medicion['response'] = await self.get_response(request)
+            finally:
+                await sync_to_async(pila.close)()
+        return medicion['response']
+
+    @contextmanager
+    def _medir(self, request):
+        """
+        Mide lo que pasa dentro del bloque. El bloque instala
+        medicion['registro'] en las conexiones y deja la respuesta en
+        medicion['response'].
+        """
+        registro = RegistroSQL()
+        plantillas = [0.0]
+        medicion = {'registro': registro}
+        token = _tiempo_plantillas.set(plantillas)
+        inicio = time.perf_counter()
+        try:
+            yield medicion
+        finally:
+            _tiempo_plantillas.reset(token)
+        total_ms = (time.perf_counter() - inicio) * 1000
+        response = medicion['response']
+
+        lectura, escritura = _bytes_sesion(request)
+        repetidas = registro.repetidas()
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={total_ms:.2f}',
+            f'db;dur={registro.total_ms:.2f};desc="{len(registro.sentencias)} consultas"',
+            f'tpl;dur={plantillas[0]:.2f}',
+        ])
+
+        if random.random() < self.muestreo:
+            coincidencia = getattr(request, 'resolver_match', None)
+            buffer.agregar({
+                'vista': coincidencia.view_name if coincidencia else request.path,
+                'metodo': request.method,
+                'ruta': request.path,
+                'status': response.status_code,
+                'total_ms': total_ms,
+                'sql_ms': registro.total_ms,
+                'sql_consultas': len(registro.sentencias),
+                'plantillas_ms': plantillas[0],
+                'sesion_bytes_leidos': lectura,
+                'sesion_bytes_escritos': escritura,
+                'sql': [(sql, ms) for sql, ms in registro.sentencias],
+                'repetidas': repetidas,
+                'posible_n_mas_1': any(n >= UMBRAL_REPETIDAS for n in repetidas.values()),
+            })
+
+
+# ======================================================================
+# Resumen (para la vista de personal)
+# ======================================================================
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1)))]
+
+
+def resumen(limite=20):
+    """Vistas más lentas (por p95) y sentencias SQL más repetidas del buffer."""
+    muestras = buffer.muestras()
+
+    por_vista = defaultdict(list)
+    for m in muestras:
+        por_vista[m['vista']].append(m)
+    vistas = []
+    for vista, lista in por_vista.items():
+        tiempos = [m['total_ms'] for m in lista]
+        vistas.append({
+            'vista': vista,
+            'peticiones': len(lista),
+            'p50_ms': round(_percentil(tiempos, 50), 2),
+            'p95_ms': round(_percentil(tiempos, 95), 2),
+            'max_ms': round(max(tiempos), 2),
+            'sql_consultas_media': round(sum(m['sql_consultas'] for m in lista) / len(lista), 2),
+            'sql_ms_media': round(sum(m['sql_ms'] for m in lista) / len(lista), 2),
+            'plantillas_ms_media': round(sum(m['plantillas_ms'] for m in lista) / len(lista), 2),
+            'sesion_bytes_escritos_media': round(sum(m['sesion_bytes_escritos'] for m in lista) / len(lista)),
+            'posible_n_mas_1': sum(m['posible_n_mas_1'] for m in lista),
+        })
+    vistas.sort(key=lambda v: v['p95_ms'], reverse=True)
+
+    ejecuciones = Counter()
+    tiempo_sql = defaultdict(float)
+    peticiones_repetida = Counter()
+    for m in muestras:
+        for sql, ms in m['sql']:
+            ejecuciones[sql] += 1
+            tiempo_sql[sql] += ms
+        for sql in m['repetidas']:
+            peticiones_repetida[sql] += 1
+    sentencias = [
+        {
+            'sql': sql,
+            'ejecuciones': n,
+            'tiempo_total_ms': round(tiempo_sql[sql], 2),
+            'peticiones_con_repeticion': peticiones_repetida[sql],
+        }
+        for sql, n in ejecuciones.most_common(limite)
+    ]
+
+    return {
+        'muestras': len(muestras),
+        'vistas_mas_lentas': vistas[:limite],
+        'sql_mas_repetido': sentencias,
+    }
@@ -0,0 +1,76 @@
+# app_fruteria/signals.py
+"""
+Receptores de señales de la app. Se conectan en `AppFruteriaConfig.ready()`.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import categorias, enrutador, ofertas, usuarios
+from .cache import invalidar_catalogo
+from .imagenes import actualizar_derivados
+from .models import Categoria, Oferta, PerfilCliente, Producto, Sucursal, UsuarioSesion
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_save, sender=Oferta)
+@receiver(post_delete, sender=Oferta)
+def catalogo_modificado(sender, **kwargs):
+    """Cualquier cambio en el catálogo invalida el HTML cacheado."""
+    invalidar_catalogo()
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_save, sender=Oferta)
+@receiver(post_delete, sender=Oferta)
+@receiver(post_save, sender=Sucursal)
+@receiver(post_delete, sender=Sucursal)
+def catalogo_escrito(sender, **kwargs):
+    """Por unos segundos el catálogo se lee de la primaria (enrutador.py)."""
+    enrutador.catalogo_escrito()
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def categoria_modificada(sender, **kwargs):
+    """El mapa de categorías en memoria (categorias.py) se vuelve a leer."""
+    categorias.invalidar()
+
+
+@receiver(post_save, sender=Oferta)
+@receiver(post_delete, sender=Oferta)
+def oferta_modificada(sender, **kwargs):
+    """Se recalculan las ofertas vigentes del día (ofertas.py)."""
+    ofertas.ofertas_modificadas()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+# request.user sale de la caché como UsuarioSesion: el proxy es otro sender
+@receiver(post_save, sender=UsuarioSesion)
+@receiver(post_delete, sender=UsuarioSesion)
+def usuario_modificado(sender, instance, **kwargs):
+    """El usuario en caché (usuarios.py) se vuelve a leer en su siguiente petición."""
+    usuarios.invalidar(instance.pk)
+
+
+@receiver(post_save, sender=PerfilCliente)
+@receiver(post_delete, sender=PerfilCliente)
+def perfil_modificado(sender, instance, **kwargs):
+    usuarios.invalidar(instance.user_id)
+
+
+@receiver(post_save, sender=Producto)
+def producto_guardado_derivados(sender, instance, raw=False, **kwargs):
+    """Genera las miniaturas responsivas cuando cambia la imagen del producto."""
+    if raw or not getattr(settings, 'FRUTERIA_IMAGEN_DERIVADOS_AL_GUARDAR', True):
+        return
+    if actualizar_derivados(instance):
+        invalidar_catalogo()
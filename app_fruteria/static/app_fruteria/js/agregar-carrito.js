@@ -0,0 +1,21 @@
+/*
+ * app_fruteria/static/app_fruteria/js/agregar-carrito.js
+ *
+ * Botones "Añadir al Carrito" (.js-add-to-cart) del catálogo y las ofertas.
+ * Los clics se juntan y se envían en un solo lote (carrito-lote.js); el
+ * resultado se avisa con mostrarAviso (base.js).
+ *
+ * El listener está delegado en el documento: también cubre las tarjetas que
+ * llegan con el scroll infinito y el modal "Ver más".
+ */
+(function () {
+    CarritoLote.alResponder(data => mostrarAviso(data.message));
+    CarritoLote.alFallar(() => mostrarAviso('Error de conexión con el servidor.', 'error'));
+
+    document.addEventListener('click', function (e) {
+        const boton = e.target.closest('.js-add-to-cart');
+        if (boton) {
+            CarritoLote.agregar(boton.dataset.productId);
+        }
+    });
+})();
@@ -0,0 +1,40 @@
+/*
+ * app_fruteria/static/app_fruteria/js/base.js
+ *
+ * Comportamiento común de todas las páginas (plantilla base.html):
+ *
+ * - Menú hamburguesa (#menu-btn / #menu) y el submenú de categorías, que se
+ *   abre solo al dar clic.
+ * - mostrarAviso(mensaje, tipo): aviso flotante que desaparece solo; tipo
+ *   'success' (verde) o 'error' (rojo). Estilos en base.css (.toast).
+ */
+(function () {
+    const menuBtn = document.getElementById('menu-btn');
+    const menu = document.getElementById('menu');
+    if (menuBtn && menu) {
+        menuBtn.addEventListener('click', () => menu.classList.toggle('active'));
+    }
+
+    document.querySelectorAll('.has-submenu > a').forEach(function (toggle) {
+        const submenu = toggle.parentNode.querySelector('.submenu');
+        toggle.addEventListener('click', function (e) {
+            e.preventDefault();
+            submenu.classList.toggle('show');
+        });
+    });
+})();
+
+window.mostrarAviso = function (mensaje, tipo = 'success') {
+    const DURACION_MS = 1500;
+    const toast = document.createElement('div');
+    toast.className = `toast ${tipo}`;
+    toast.textContent = mensaje;
+    document.body.appendChild(toast);
+
+    // Mostrar y luego ocultar
+    setTimeout(() => toast.classList.add('visible'), 10);
+    setTimeout(() => {
+        toast.classList.remove('visible');
+        toast.addEventListener('transitionend', () => toast.remove());
+    }, DURACION_MS);
+};
@@ -0,0 +1,66 @@
+/*
+ * app_fruteria/static/app_fruteria/js/busqueda.js
+ *
+ * Sugerencias mientras se escribe en el buscador (form.buscador): pide
+ * `api/buscar/?q=...` cuando el usuario deja de escribir por ESPERA_MS y
+ * cancela la petición anterior si todavía no llegaba. Sin JS el formulario
+ * sigue funcionando (GET a la página de resultados).
+ *
+ * Uso: <script src="busqueda.js" data-url="{% url 'api_buscar' %}"></script>
+ */
+(function () {
+    const ESPERA_MS = 150;
+    const MIN_CARACTERES = 2;
+    const SUGERENCIAS = 8;
+    const url = document.currentScript.dataset.url;
+
+    document.querySelectorAll('form.buscador').forEach(function (form) {
+        const entrada = form.querySelector('input[name="q"]');
+        const lista = form.querySelector('.sugerencias');
+        let temporizador = null;
+        let peticion = null;
+
+        function ocultar() {
+            lista.hidden = true;
+            lista.replaceChildren();
+        }
+
+        function mostrar(resultados) {
+            lista.replaceChildren(...resultados.map(function (producto) {
+                const enlace = document.createElement('a');
+                enlace.href = form.action + '?q=' + encodeURIComponent(producto.nombre);
+                const nombre = document.createElement('span');
+                nombre.textContent = producto.nombre;
+                const precio = document.createElement('span');
+                precio.textContent = '$' + producto.precio_final + ' / kg';
+                enlace.append(nombre, precio);
+                const item = document.createElement('li');
+                item.append(enlace);
+                return item;
+            }));
+            lista.hidden = resultados.length === 0;
+        }
+
+        function sugerir() {
+            const texto = entrada.value.trim();
+            if (peticion) { peticion.abort(); }
+            if (texto.length < MIN_CARACTERES) { ocultar(); return; }
+            peticion = new AbortController();
+            fetch(url + '?' + new URLSearchParams({ q: texto, limite: SUGERENCIAS }), { signal: peticion.signal })
+                .then(response => response.json())
+                .then(data => mostrar(data.resultados || []))
+                .catch(error => { if (error.name !== 'AbortError') { ocultar(); } });
+        }
+
+        entrada.addEventListener('input', function () {
+            clearTimeout(temporizador);
+            temporizador = setTimeout(sugerir, ESPERA_MS);
+        });
+        entrada.addEventListener('keydown', function (e) {
+            if (e.key === 'Escape') { ocultar(); }
+        });
+        document.addEventListener('click', function (e) {
+            if (!form.contains(e.target)) { ocultar(); }
+        });
+    });
+})();
@@ -0,0 +1,96 @@
+/*
+ * app_fruteria/static/app_fruteria/js/carrito-lote.js
+ *
+ * Junta los clics del carrito y los manda en un solo POST a
+ * `carrito/lote/` (vista actualizar_carrito_lote) cuando el usuario deja de
+ * hacer clic por ESPERA_MS. Varios clics sobre el mismo producto se
+ * compactan en una sola operación.
+ *
+ * Uso: <script src="carrito-lote.js" data-url="..."></script>
+ * El token CSRF se lee de la cookie (las vistas usan ensure_csrf_cookie), así
+ * el HTML cacheado del catálogo no lleva datos por usuario.
+ *
+ *   CarritoLote.agregar(id, kg)    CarritoLote.fijar(id, kg)
+ *   CarritoLote.eliminar(id)       CarritoLote.enviar()  -> Promise
+ *   CarritoLote.alResponder(fn)    CarritoLote.alFallar(fn)
+ */
+window.CarritoLote = (function () {
+    const ESPERA_MS = 400;
+    const script = document.currentScript;
+    const url = script.dataset.url;
+
+    function tokenCsrf() {
+        const cookie = document.cookie.split('; ').find(c => c.startsWith('csrftoken='));
+        return cookie ? decodeURIComponent(cookie.split('=')[1]) : '';
+    }
+
+    // producto -> {op, producto, cantidad}; el orden de inserción se respeta
+    let pendientes = new Map();
+    let temporizador = null;
+    const oyentes = { respuesta: [], error: [] };
+
+    function programar() {
+        clearTimeout(temporizador);
+        temporizador = setTimeout(() => enviar().catch(() => {}), ESPERA_MS);
+    }
+
+    function encolar(operacion) {
+        const id = String(operacion.producto);
+        const previa = pendientes.get(id);
+        pendientes.delete(id); // se vuelve a insertar al final
+        if (operacion.op === 'agregar' && previa && previa.op !== 'eliminar') {
+            // agregar + agregar = agregar la suma; fijar + agregar = fijar la suma
+            operacion = { op: previa.op, producto: id, cantidad: previa.cantidad + operacion.cantidad };
+        } else if (operacion.op === 'agregar' && previa) {
+            // eliminar + agregar N = dejar exactamente N
+            operacion = { op: 'fijar', producto: id, cantidad: operacion.cantidad };
+        }
+        pendientes.set(id, operacion);
+        programar();
+    }
+
+    function enviar(opciones = {}) {
+        clearTimeout(temporizador);
+        if (pendientes.size === 0) {
+            return Promise.resolve(null);
+        }
+        const operaciones = Array.from(pendientes.values());
+        pendientes = new Map();
+        return fetch(url, {
+            method: 'POST',
+            credentials: 'same-origin',
+            keepalive: Boolean(opciones.keepalive),
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': tokenCsrf(),
+                'X-Requested-With': 'XMLHttpRequest',
+            },
+            body: JSON.stringify({ operaciones: operaciones }),
+        })
+        .then(response => response.json().then(data => {
+            if (!response.ok || !data.success) { throw data; }
+            oyentes.respuesta.forEach(fn => fn(data));
+            return data;
+        }))
+        .catch(error => {
+            console.error('Error:', error);
+            oyentes.error.forEach(fn => fn(error));
+            throw error;
+        });
+    }
+
+    // Si el usuario se va antes de que venza la espera, se manda lo pendiente
+    window.addEventListener('pagehide', () => {
+        enviar({ keepalive: true }).catch(() => {});
+    });
+
+    return {
+        agregar: (id, cantidad = 1) => encolar({ op: 'agregar', producto: String(id), cantidad: cantidad }),
+        fijar: (id, cantidad) => encolar({ op: 'fijar', producto: String(id), cantidad: cantidad }),
+        eliminar: (id) => encolar({ op: 'eliminar', producto: String(id) }),
+        pendiente: () => pendientes.size > 0,
+        enviar: enviar,
+        alResponder: (fn) => oyentes.respuesta.push(fn),
+        alFallar: (fn) => oyentes.error.push(fn),
+    };
+})();
@@ -0,0 +1,78 @@
+/*
+ * app_fruteria/static/app_fruteria/js/carrito.js
+ *
+ * Página del carrito: los clics (+, -, Eliminar) se aplican al instante en
+ * pantalla y se mandan juntos al servidor en un solo lote (carrito-lote.js).
+ * Con la respuesta se ponen las cantidades, subtotales y totales que
+ * calculó el servidor.
+ */
+(function () {
+    function pesos(valor) {
+        return `$${parseFloat(valor).toFixed(2)}`;
+    }
+
+    // Función reutilizable para actualizar todos los totales
+    function actualizarTotales(subtotal, totalFinal) {
+        const subtotalElement = document.getElementById('subtotal-productos');
+        const totalElement = document.getElementById('total-final');
+        if (subtotalElement) { subtotalElement.textContent = pesos(subtotal); }
+        if (totalElement) { totalElement.textContent = pesos(totalFinal); }
+    }
+
+    CarritoLote.alResponder(data => {
+        Object.entries(data.lineas).forEach(([productId, linea]) => {
+            const qtyElement = document.getElementById(`quantity-${productId}`);
+            if (qtyElement) { qtyElement.textContent = linea.cantidad; }
+            const itemSubtotalElement = document.getElementById(`subtotal-item-${productId}`);
+            if (itemSubtotalElement) { itemSubtotalElement.textContent = pesos(linea.subtotal); }
+        });
+        actualizarTotales(data.new_subtotal, data.new_total_final);
+        if (Object.keys(data.lineas).length === 0) {
+            setTimeout(() => window.location.reload(), 500);
+        }
+    });
+    CarritoLote.alFallar(error => {
+        mostrarAviso((error && error.message) || 'Error de conexión con el servidor.', 'error');
+        setTimeout(() => window.location.reload(), 1500);
+    });
+
+    document.querySelectorAll('.js-remove-item').forEach(button => {
+        button.addEventListener('click', function (e) {
+            e.preventDefault();
+            const rowToRemove = document.getElementById(this.dataset.rowId);
+            if (rowToRemove) { rowToRemove.remove(); }
+            CarritoLote.eliminar(this.dataset.productId);
+            mostrarAviso('Producto eliminado del carrito.');
+        });
+    });
+
+    document.querySelectorAll('.js-adjust-quantity').forEach(button => {
+        button.addEventListener('click', function (e) {
+            e.preventDefault();
+            const productId = this.dataset.productId;
+            const qtyElement = document.getElementById(`quantity-${productId}`);
+            const actual = parseInt(qtyElement.textContent, 10);
+
+            let nueva = actual;
+            if (this.dataset.action === 'aumentar') {
+                nueva = actual + 1;
+            } else if (actual > 1) {
+                nueva = actual - 1;
+            } else {
+                mostrarAviso('La cantidad mínima es 1.', 'error');
+                return;
+            }
+            qtyElement.textContent = nueva;
+            CarritoLote.fijar(productId, nueva);
+        });
+    });
+
+    // Antes de ir a pagar se envía lo que esté pendiente
+    document.querySelectorAll('.btn-checkout').forEach(link => {
+        link.addEventListener('click', function (e) {
+            if (!CarritoLote.pendiente()) { return; }
+            e.preventDefault();
+            CarritoLote.enviar().then(() => { window.location.href = this.href; });
+        });
+    });
+})();
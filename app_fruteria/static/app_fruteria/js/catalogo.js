@@ -0,0 +1,79 @@
+/*
+ * app_fruteria/static/app_fruteria/js/catalogo.js
+ *
+ * Scroll infinito y modal "Ver más" de las páginas del catálogo.
+ *
+ * - Cada página termina en <div class="mas-productos" data-siguiente="...">
+ *   (vista pagina_catalogo). Cuando ese div se acerca a la pantalla se pide
+ *   el fragmento y se pone en su lugar; el fragmento trae su propio div si
+ *   hay más. Sin JS el enlace de adentro lleva a la página siguiente.
+ * - Los botones .js-ver-detalle piden el contenido del modal (vista
+ *   detalle_producto) la primera vez que se abren.
+ *
+ * Necesita el #modal-producto de la página (clase .abierto en catalogo.css).
+ */
+(function () {
+    const MARGEN = '600px'; // se pide la página antes de llegar al final
+    const detalles = new Map();
+
+    function pedirHtml(url) {
+        return fetch(url, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+            .then(response => {
+                if (!response.ok) { throw new Error(response.status); }
+                return response.text();
+            });
+    }
+
+    // --- Scroll infinito ---
+    const observador = 'IntersectionObserver' in window && new IntersectionObserver(function (entradas) {
+        entradas.forEach(function (entrada) {
+            if (entrada.isIntersecting) { cargarSiguiente(entrada.target); }
+        });
+    }, { rootMargin: MARGEN });
+
+    function vigilar(raiz) {
+        if (!observador) { return; }
+        raiz.querySelectorAll('.mas-productos[data-siguiente]').forEach(div => observador.observe(div));
+    }
+
+    function cargarSiguiente(div) {
+        observador.unobserve(div);
+        pedirHtml(div.dataset.siguiente)
+            .then(html => {
+                const plantilla = document.createElement('template');
+                plantilla.innerHTML = html;
+                const seccion = div.parentNode;
+                div.replaceWith(plantilla.content);
+                vigilar(seccion);
+            })
+            .catch(() => { /* queda el enlace "Ver más productos" */ });
+    }
+
+    vigilar(document);
+
+    // --- Modal "Ver más" ---
+    const modal = document.getElementById('modal-producto');
+
+    function mostrarModal() { modal.classList.add('abierto'); }
+    function cerrarModal() { modal.classList.remove('abierto'); }
+
+    document.addEventListener('click', function (e) {
+        const boton = e.target.closest('.js-ver-detalle');
+        if (!boton) { return; }
+        const cuerpo = modal.querySelector('.modal-cuerpo');
+        const url = boton.dataset.url;
+        const html = detalles.get(url) || pedirHtml(url);
+        detalles.set(url, html);
+        html.then(contenido => {
+            cuerpo.innerHTML = contenido;
+            mostrarModal();
+        }).catch(() => detalles.delete(url));
+    });
+
+    // Cerrar con la X o al añadir al carrito desde el modal
+    modal.addEventListener('click', function (e) {
+        if (e.target.closest('.close, .js-add-to-cart')) {
+            cerrarModal();
+        }
+    });
+})();
@@ -0,0 +1,136 @@
+# app_fruteria/templatetags/fruteria.py
+from django import template
+from django.core.cache import cache
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from ..cache import TIEMPO_CACHE, clave_fragmento, parametros_catalogo, registrar_acierto, registrar_fallo
+
+register = template.Library()
+
+
+class CacheCatalogoNode(template.Node):
+    def __init__(self, nodelist, nombre, variantes):
+        self.nodelist = nodelist
+        self.nombre = nombre
+        self.variantes = variantes
+
+    def render(self, context):
+        # Las vistas async leen el fragmento antes de renderizar (ver views_async.py)
+        precargado = context.get('fragmento_precargado')
+        if precargado is not None:
+            registrar_acierto()
+            return precargado
+
+        nombre = self.nombre.resolve(context)
+        variantes = [v.resolve(context) for v in self.variantes]
+        clave = clave_fragmento(nombre, variantes)
+
+        contenido = cache.get(clave)
+        if contenido is not None:
+            registrar_acierto()
+            return contenido
+
+        registrar_fallo()
+        contenido = self.nodelist.render(context)
+        cache.set(clave, contenido, TIEMPO_CACHE)
+        return contenido
+
+
+@register.tag
+def cache_catalogo(parser, token):
+    """
+    Guarda en caché el HTML del bloque, ligado a la versión del catálogo.
+
+    Uso::
+
+        {% cache_catalogo 'menu' request.GET|consulta_catalogo %}
+            ... tarjetas de productos ...
+        {% endcache_catalogo %}
+
+    Lo que quede fuera del bloque (mensajes, menú con el usuario) se sigue
+    renderizando en cada petición. Las variantes que vienen de la URL deben
+    pasar por `consulta_catalogo`: con ``request.GET.urlencode`` cada
+    parámetro ajeno (``?utm_source=``) crearía otro fragmento.
+    """
+    partes = token.split_contents()
+    if len(partes) < 2:
+        raise template.TemplateSyntaxError(f"'{partes[0]}' requiere al menos un nombre.")
+    nodelist = parser.parse(('endcache_catalogo',))
+    parser.delete_first_token()
+    return CacheCatalogoNode(
+        nodelist,
+        parser.compile_filter(partes[1]),
+        [parser.compile_filter(p) for p in partes[2:]],
+    )
+
+
+@register.filter
+def consulta_catalogo(parametros):
+    """Query string con solo los parámetros que cambian el catálogo (cache.parametros_catalogo)."""
+    return parametros_catalogo(parametros).urlencode()
+
+
+# ==========================================
+# IMÁGENES RESPONSIVAS
+# ==========================================
+
+# Presentación -> (atributo sizes, ancho CSS con el que se elige el src de respaldo)
+PRESENTACIONES_IMAGEN = {
+    'tarjeta': ('230px', 230),
+    'detalle': ('(max-width: 500px) 90vw, 450px', 450),
+    'oferta': ('160px', 160),
+    'miniatura': ('60px', 60),
+}
+
+
+def _srcset(variantes, url):
+    return ', '.join(f'{url(nombre)} {ancho}w' for ancho, nombre in variantes)
+
+
+@register.simple_tag
+def imagen_producto(producto, presentacion='tarjeta'):
+    """
+    Emite la imagen del producto como ``<picture>`` con ``srcset`` de los
+    derivados WebP/JPEG (ver imagenes.py).
+
+    Uso::
+
+        {% imagen_producto producto 'tarjeta' %}
+
+    Si el producto aún no tiene derivados se usa la imagen original, y si no
+    tiene imagen, el placeholder estático.
+    """
+    sizes, ancho_css = PRESENTACIONES_IMAGEN[presentacion]
+    nombre = producto.nombre
+
+    if not producto.imagen:
+        return format_html(
+            '<img src="{}" alt="{}" loading="lazy" decoding="async">',
+            static('app_fruteria/imagenes/placeholder.jpg'), nombre,
+        )
+
+    derivados = producto.imagen_derivados or {}
+    variantes = derivados.get('variantes') or {}
+    jpeg = variantes.get('jpg')
+    if not jpeg or derivados.get('original') != producto.imagen.name:
+        return format_html(
+            '<img src="{}" alt="{}" loading="lazy" decoding="async">',
+            producto.imagen.url, nombre,
+        )
+
+    url = producto.imagen.storage.url
+    # Respaldo para navegadores sin srcset: el primer ancho que cubra 2x
+    respaldo = next((n for a, n in jpeg if a >= ancho_css * 2), jpeg[-1][1])
+    ancho, alto = derivados['ancho'], derivados['alto']
+    fuente_webp = ''
+    if variantes.get('webp'):
+        fuente_webp = format_html(
+            '<source type="image/webp" srcset="{}" sizes="{}">',
+            _srcset(variantes['webp'], url), sizes,
+        )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" '
+        'alt="{}" loading="lazy" decoding="async"></picture>',
+        fuente_webp, url(respaldo), _srcset(jpeg, url), sizes, ancho, alto, nombre,
+    )
@@ -1,3 +1,2008 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import html
+import json
+import os
+import pickle
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from time import perf_counter
 
-# Create your tests here.
+from unittest import mock
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.http import HttpResponse, QueryDict
+from django.template import engines
+from django.template.loader import get_template
+from django.template.loaders.cached import Loader as CachedLoader
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import include, path, reverse
+from PIL import Image
+
+from backend_olivos import bd
+
+from . import basedatos, busqueda, categorias, enrutador, ofertas, perfilamiento, usuarios
+from .archivos import ServidorArchivosWSGI
+from .backends import EmailOrUsernameBackend
+from .cache import parametros_catalogo
+from .carrito import CarritoCache, CarritoFirmado, CarritoMiddleware, hidratar_carrito
+from .dinero import a_centavos, a_decimal, calcular_totales
+from .models import Categoria, Compra, DetalleCompra, Existencia, Oferta, PerfilCliente, Producto, Sucursal
+from .paginacion import codificar_cursor
+from .pedidos import PedidoInvalido, PreciosCambiados, SinExistencias, registrar_compra, resumir
+from .urls import construir_urlpatterns
+
+# URLconf con las vistas async (como bajo ASGI), para VistasAsyncTests
+urlpatterns = [path('', include(construir_urlpatterns(asincronas=True)))]
+
+
+def crear_catalogo(cantidad, categoria_nombre='Cítricas', kg_disponibles=None):
+    """
+    Crea `cantidad` productos con categoría y oferta vigente en la sucursal 1;
+    con `kg_disponibles`, también sus existencias (si no, sin control de inventario).
+    """
+    sucursal, _ = Sucursal.objects.get_or_create(
+        pk=1, defaults={'nombre': 'Centro', 'direccion': 'Calle 1'}
+    )
+    categoria, _ = Categoria.objects.get_or_create(nombre=categoria_nombre)
+    hoy = date.today()
+    oferta = Oferta.objects.create(
+        nombre='Temporada',
+        fecha_inicio=hoy - timedelta(days=1),
+        fecha_fin=hoy + timedelta(days=1),
+        porcentaje_descuento=Decimal('10.00'),
+    )
+    inicio = Producto.objects.count()
+    productos = Producto.objects.bulk_create([
+        Producto(
+            nombre=f'Fruta {inicio + i:04d}',
+            precio=Decimal('20.00'),
+            descripcion='Fresca',
+            categoria=categoria,
+            sucursal=sucursal,
+            oferta=oferta,
+        )
+        for i in range(cantidad)
+    ])
+    if kg_disponibles is not None:
+        Existencia.objects.bulk_create([
+            Existencia(producto=p, sucursal=sucursal, kg_disponibles=kg_disponibles) for p in productos
+        ])
+    return productos
+
+
+def poner_carrito(client, lineas):
+    """Guarda en la cookie del cliente de pruebas un carrito compacto ``{id: [kg, centavos]}``."""
+    client.cookies[CarritoFirmado.clave] = signing.dumps(
+        {str(pid): linea for pid, linea in lineas.items()}, salt=CarritoFirmado.sal, compress=True,
+    )
+
+
+def leer_carrito(client):
+    valor = client.cookies[CarritoFirmado.clave].value
+    return signing.loads(valor, salt=CarritoFirmado.sal) if valor else {}
+
+
+class CatalogoConsultasTests(TestCase):
+    """El número de consultas de las páginas del catálogo no crece con el catálogo."""
+
+    vistas = [('menu_virtual',), ('categoria', 'citricas'), ('ver_ofertas',)]
+
+    def setUp(self):
+        cache.clear()
+
+    def contar_consultas(self, vista):
+        nombre_vista, *argumentos = vista
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse(nombre_vista, args=argumentos))
+        self.assertEqual(respuesta.status_code, 200)
+        return len(consultas)
+
+    def test_consultas_constantes(self):
+        crear_catalogo(2)
+        categorias.cargar()  # el mapa de categorías se lee una vez por proceso
+        pocas = {vista: self.contar_consultas(vista) for vista in self.vistas}
+
+        crear_catalogo(40)
+        cache.clear()
+        for vista in self.vistas:
+            with self.subTest(vista=vista):
+                self.assertEqual(self.contar_consultas(vista), pocas[vista])
+
+    def test_catalogo_carga_relaciones(self):
+        crear_catalogo(3)
+        with self.assertNumQueries(1):
+            productos = list(Producto.objects.catalogo())
+            for producto in productos:
+                producto.precio_final
+                producto.categoria.nombre
+                producto.sucursal.nombre
+
+
+class PrecioFinalAnotadoTests(TestCase):
+    """`with_precio_final()` calcula en SQL el mismo precio que la propiedad."""
+
+    def setUp(self):
+        cache.clear()
+        self.sucursal = Sucursal.objects.create(pk=1, nombre='Centro', direccion='Calle 1')
+        hoy = date.today()
+        self.vigente = Oferta.objects.create(
+            nombre='Vigente', porcentaje_descuento=Decimal('15.00'),
+            fecha_inicio=hoy - timedelta(days=2), fecha_fin=hoy + timedelta(days=2),
+        )
+        self.inactiva = Oferta.objects.create(
+            nombre='Inactiva', activo=False, porcentaje_descuento=Decimal('50.00'),
+            fecha_inicio=hoy - timedelta(days=2), fecha_fin=hoy + timedelta(days=2),
+        )
+        self.vencida = Oferta.objects.create(
+            nombre='Vencida', porcentaje_descuento=Decimal('50.00'),
+            fecha_inicio=hoy - timedelta(days=9), fecha_fin=hoy - timedelta(days=1),
+        )
+        datos = [
+            ('Limón', '25.50', self.vigente),
+            ('Mango', '40.00', self.inactiva),
+            ('Pera', '30.00', self.vencida),
+            ('Uva', '10.00', None),
+        ]
+        for nombre, precio, oferta in datos:
+            Producto.objects.create(
+                nombre=nombre, precio=Decimal(precio), descripcion='', oferta=oferta,
+            )
+
+    def test_anotacion_coincide_con_propiedad(self):
+        # Medio centavo exacto al 50%: half-up en SQL igual que en Python
+        hoy = date.today()
+        mitad = Oferta.objects.create(
+            nombre='Mitad', porcentaje_descuento=Decimal('50.00'),
+            fecha_inicio=hoy - timedelta(days=2), fecha_fin=hoy + timedelta(days=2),
+        )
+        for precio in ('0.29', '0.57', '2.53', '0.01'):
+            Producto.objects.create(nombre=f'Medio {precio}', precio=Decimal(precio), descripcion='', oferta=mitad)
+        anotados = {p.nombre: p.precio_efectivo for p in Producto.objects.with_precio_final()}
+        self.assertEqual(anotados, {
+            'Limón': Decimal('21.68'),
+            'Mango': Decimal('40.00'),
+            'Pera': Decimal('30.00'),
+            'Uva': Decimal('10.00'),
+            'Medio 0.29': Decimal('0.15'),
+            'Medio 0.57': Decimal('0.29'),
+            'Medio 2.53': Decimal('1.27'),
+            'Medio 0.01': Decimal('0.01'),
+        })
+        for producto in Producto.objects.all():
+            self.assertEqual(producto.precio_final, anotados[producto.nombre])
+
+    def test_ordenar_y_filtrar_por_precio_final(self):
+        respuesta = self.client.get(reverse('menu_virtual'), {'orden': 'precio', 'precio_max': '35'})
+        nombres = [p.nombre for p in respuesta.context['lista_productos']]
+        self.assertEqual(nombres, ['Uva', 'Limón', 'Pera'])
+
+    def test_precio_max_no_finito_se_ignora(self):
+        for url, valor in ((reverse('menu_virtual'), 'NaN'), (reverse('ver_ofertas'), 'sNaN'),
+                           (reverse('menu_virtual'), 'Infinity'), (reverse('menu_virtual'), 'mucho')):
+            respuesta = self.client.get(url, {'orden': 'precio', 'precio_max': valor})
+            self.assertEqual(respuesta.status_code, 200, valor)
+        self.assertEqual(len(respuesta.context['lista_productos']), 4)
+
+    def test_ofertas_solo_activas_y_vigentes(self):
+        respuesta = self.client.get(reverse('ver_ofertas'))
+        nombres = [p.nombre for p in respuesta.context['lista_productos']]
+        self.assertEqual(nombres, ['Limón'])
+
+
+class OfertasVigentesTests(TestCase):
+    """Las ofertas del día se calculan una vez y cambian a medianoche (hora de México)."""
+
+    dia = date(2026, 3, 31)
+
+    def en(self, dia, hora, minuto=0, segundo=0):
+        """Congela timezone.now() en la hora local (America/Mexico_City) indicada."""
+        momento = timezone.make_aware(datetime.combine(dia, time(hora, minuto, segundo)))
+        return mock.patch('django.utils.timezone.now', return_value=momento)
+
+    def setUp(self):
+        cache.clear()
+        Sucursal.objects.create(pk=1, nombre='Centro', direccion='Calle 1')
+        manana = self.dia + timedelta(days=1)
+        self.termina = Oferta.objects.create(
+            nombre='Termina hoy', porcentaje_descuento=Decimal('10.00'),
+            fecha_inicio=self.dia - timedelta(days=5), fecha_fin=self.dia,
+        )
+        self.empieza = Oferta.objects.create(
+            nombre='Empieza mañana', porcentaje_descuento=Decimal('25.00'),
+            fecha_inicio=manana, fecha_fin=manana + timedelta(days=5),
+        )
+        self.sin_fechas = Oferta.objects.create(nombre='Sin fechas', porcentaje_descuento=Decimal('50.00'))
+        self.inactiva = Oferta.objects.create(
+            nombre='Inactiva', activo=False, porcentaje_descuento=Decimal('50.00'),
+            fecha_inicio=self.dia, fecha_fin=manana,
+        )
+        self.productos = {
+            oferta.nombre: Producto.objects.create(
+                nombre=oferta.nombre, precio=Decimal('40.00'), descripcion='', oferta=oferta,
+            )
+            for oferta in (self.termina, self.empieza, self.sin_fechas, self.inactiva)
+        }
+
+    def precios(self):
+        return {p.nombre: p.precio_final for p in Producto.objects.all()}
+
+    def en_oferta(self, respuesta):
+        return [p.nombre for p in respuesta.context['lista_productos']]
+
+    def test_cambio_de_dia(self):
+        with self.en(self.dia, 23, 59, 59):
+            self.assertEqual(ofertas.vigentes().ids, [self.termina.pk])
+            self.assertEqual(self.precios(), {
+                'Termina hoy': Decimal('36.00'), 'Empieza mañana': Decimal('40.00'),
+                'Sin fechas': Decimal('40.00'), 'Inactiva': Decimal('40.00'),
+            })
+            self.assertEqual(self.en_oferta(self.client.get(reverse('ver_ofertas'))), ['Termina hoy'])
+
+        # Un segundo después de medianoche, sin guardar nada
+        with self.en(self.dia + timedelta(days=1), 0, 0, 1):
+            self.assertEqual(ofertas.vigentes().ids, [self.empieza.pk])
+            self.assertEqual(self.precios()['Termina hoy'], Decimal('40.00'))
+            self.assertEqual(self.precios()['Empieza mañana'], Decimal('30.00'))
+            self.assertEqual(self.en_oferta(self.client.get(reverse('ver_ofertas'))), ['Empieza mañana'])
+
+    def test_medianoche_es_la_local(self):
+        # 23:30 en México ya es el día siguiente en UTC: todavía aplica "Termina hoy"
+        with self.en(self.dia, 23, 30):
+            self.assertEqual(timezone.now().astimezone(dt_timezone.utc).date(), self.dia + timedelta(days=1))
+            self.assertEqual(ofertas.vigentes().ids, [self.termina.pk])
+            self.assertEqual(
+                ofertas.vigentes().valida_hasta,
+                timezone.make_aware(datetime(2026, 4, 1)),
+            )
+
+    def test_precio_es_busqueda_en_memoria(self):
+        with self.en(self.dia, 12):
+            ofertas.vigentes()
+            productos = list(Producto.objects.order_by('id'))
+            # Ni la oferta de cada producto ni otra consulta de ofertas
+            with self.assertNumQueries(0):
+                precios = [p.precio_final for p in productos]
+            self.assertEqual(precios, [Decimal('36.00')] + [Decimal('40.00')] * 3)
+
+    def test_guardar_oferta_refresca(self):
+        with self.en(self.dia, 12):
+            self.assertEqual(self.precios()['Termina hoy'], Decimal('36.00'))
+            self.termina.porcentaje_descuento = Decimal('20.00')
+            with self.captureOnCommitCallbacks(execute=True):
+                self.termina.save()
+            self.assertEqual(self.precios()['Termina hoy'], Decimal('32.00'))
+            # Los demás procesos lo encuentran ya calculado en la caché compartida
+            self.assertEqual(cache.get(ofertas.clave(self.dia)).descuentos, {self.termina.pk: Decimal('20.00')})
+
+            self.inactiva.activo = True
+            self.inactiva.save()
+            self.assertEqual(ofertas.vigentes().ids, [self.termina.pk, self.inactiva.pk])
+            self.inactiva.delete()
+            self.assertEqual(ofertas.vigentes().ids, [self.termina.pk])
+
+    def test_cambio_en_otro_proceso(self):
+        with self.en(self.dia, 12):
+            self.assertEqual(self.en_oferta(self.client.get(reverse('ver_ofertas'))), ['Termina hoy'])
+            # Otro proceso activa una oferta: su copia en memoria no se toca,
+            # solo la caché compartida y la versión del catálogo
+            Oferta.objects.filter(pk=self.inactiva.pk).update(activo=True)
+            with mock.patch.dict(ofertas._memoria, clear=True), self.captureOnCommitCallbacks(execute=True):
+                ofertas.ofertas_modificadas()
+            # Sin esperar FRUTERIA_OFERTAS_SEGUNDOS
+            self.assertEqual(ofertas.vigentes().ids, [self.termina.pk, self.inactiva.pk])
+            self.assertEqual(
+                self.en_oferta(self.client.get(reverse('ver_ofertas'))), ['Inactiva', 'Termina hoy'],
+            )
+
+    def test_comando_programar(self):
+        with self.en(self.dia + timedelta(days=1), 0, 0, 1):
+            call_command('programar_ofertas', verbosity=0)
+            self.assertEqual(cache.get(ofertas.clave(self.dia + timedelta(days=1))).ids, [self.empieza.pk])
+            with self.assertNumQueries(0):
+                ofertas.vigentes()
+
+
+class CacheCatalogoTests(TestCase):
+    """El HTML del catálogo se cachea y se invalida con la versión del catálogo."""
+
+    def setUp(self):
+        cache.clear()
+        crear_catalogo(3)
+
+    def test_acierto_no_consulta_productos(self):
+        primera = self.client.get(reverse('menu_virtual'))
+        with CaptureQueriesContext(connection) as consultas:
+            segunda = self.client.get(reverse('menu_virtual'))
+        self.assertEqual(primera.content, segunda.content)
+        self.assertFalse(any('app_fruteria_producto' in c['sql'] for c in consultas))
+
+    def test_guardar_producto_invalida(self):
+        self.client.get(reverse('menu_virtual'))
+        producto = Producto.objects.first()
+        producto.nombre = 'Toronja Rosa'
+        producto.save()
+        self.assertContains(self.client.get(reverse('menu_virtual')), 'Toronja Rosa')
+
+    def test_cambio_de_dia_invalida(self):
+        self.client.get(reverse('menu_virtual'))
+        manana = date.today() + timedelta(days=1)
+        with mock.patch('app_fruteria.cache.timezone.localdate', return_value=manana):
+            with CaptureQueriesContext(connection) as consultas:
+                self.client.get(reverse('menu_virtual'))
+        self.assertTrue(any('app_fruteria_producto' in c['sql'] for c in consultas))
+
+    @mock.patch('app_fruteria.views.POR_PAGINA', 1)
+    def test_parametros_ajenos_no_crean_fragmentos(self):
+        self.client.get(reverse('menu_virtual'), {'orden': 'precio', 'precio_max': '50'})
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(
+                reverse('menu_virtual') + '?utm_source=x&precio_max=50.00&orden=precio&_=123'
+            )
+        self.assertFalse(any('app_fruteria_producto' in c['sql'] for c in consultas))
+        # El enlace a la página siguiente (dentro del fragmento) solo lleva los parámetros del catálogo
+        siguiente = html.unescape(re.search(r'data-siguiente="([^"]+)"', respuesta.content.decode()).group(1))
+        self.assertTrue(siguiente.startswith(
+            reverse('pagina_catalogo', args=['menu']) + '?orden=precio&precio_max=50.00&cursor='
+        ))
+        self.assertEqual(parametros_catalogo(QueryDict('orden=azar&precio_max=NaN&q=+lim+')).urlencode(), 'q=lim')
+
+    def test_estadisticas_solo_personal(self):
+        self.client.get(reverse('menu_virtual'))
+        self.client.get(reverse('menu_virtual'))
+        self.assertEqual(self.client.get(reverse('estadisticas_cache')).status_code, 302)
+
+        staff = User.objects.create_user('staff', password='x', is_staff=True)
+        self.client.force_login(staff)
+        datos = self.client.get(reverse('estadisticas_cache')).json()
+        self.assertEqual((datos['aciertos'], datos['fallos']), (1, 1))
+
+
+class HidratacionCarritoTests(TestCase):
+    """El carrito se carga con una consulta sin importar cuántas líneas tenga."""
+
+    def setUp(self):
+        cache.clear()
+        self.productos = crear_catalogo(100)
+        self.usuario = User.objects.create_user('cliente', password='x')
+        PerfilCliente.objects.create(user=self.usuario, direccion='Calle 2')
+
+    def poner_carrito(self, productos, extra=None):
+        lineas = {p.pk: [2, 1800] for p in productos}
+        lineas.update(extra or {})
+        poner_carrito(self.client, lineas)
+
+    def contar(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return len(consultas)
+
+    def test_consultas_constantes(self):
+        self.client.force_login(self.usuario)
+        categorias.cargar()
+        usuarios.obtener(self.usuario.pk)
+        for url in (reverse('ver_carrito'), reverse('confirmar_compra')):
+            conteos = []
+            for tamano in (1, 10, 100):
+                self.poner_carrito(self.productos[:tamano])
+                conteos.append(self.contar(url))
+            with self.subTest(url=url):
+                self.assertEqual(len(set(conteos)), 1, conteos)
+
+    def test_hidratar_descarta_obsoletos(self):
+        carrito = {
+            str(self.productos[0].pk): [3, 1800],
+            '999999': [1, 500],
+            'no-es-id': [1, 500],
+        }
+        with self.assertNumQueries(1):
+            hidratado = hidratar_carrito(carrito)
+        self.assertEqual([l.producto for l in hidratado.lineas], [self.productos[0]])
+        self.assertEqual(hidratado.subtotal, Decimal('54.00'))
+        self.assertEqual(sorted(hidratado.obsoletos), ['999999', 'no-es-id'])
+
+    def test_ver_carrito_limpia_obsoletos(self):
+        self.poner_carrito(self.productos[:1], {999999: [1, 500]})
+        self.client.get(reverse('ver_carrito'))
+        self.assertEqual(list(leer_carrito(self.client)), [str(self.productos[0].pk)])
+
+
+class RegistrarCompraTests(TestCase):
+    """El pedido se guarda completo (o nada) con un número fijo de consultas."""
+
+    def setUp(self):
+        cache.clear()
+        self.productos = crear_catalogo(50)
+        self.usuario = User.objects.create_user('cliente', password='x')
+        PerfilCliente.objects.create(user=self.usuario, direccion='Calle 2')
+
+    def test_precios_desde_la_bd(self):
+        compra = registrar_compra(self.usuario, {self.productos[0].pk: 3, self.productos[1].pk: 1})
+        # 20.00 con 10% de descuento = 18.00 por kg
+        self.assertEqual(compra.total_compra, Decimal('72.00'))
+        self.assertEqual(
+            sorted(compra.detallecompra_set.values_list('cantidad', 'precio_unitario')),
+            [(1, Decimal('18.00')), (3, Decimal('18.00'))],
+        )
+
+    def test_consultas_constantes(self):
+        conteos = []
+        for tamano in (1, 50):
+            with CaptureQueriesContext(connection) as consultas:
+                registrar_compra(self.usuario, {p.pk: 1 for p in self.productos[:tamano]})
+            conteos.append(len(consultas))
+        self.assertEqual(conteos[0], conteos[1])
+
+    def test_atomico(self):
+        with mock.patch.object(DetalleCompra.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                registrar_compra(self.usuario, {self.productos[0].pk: 1})
+        self.assertFalse(Compra.objects.exists())
+
+    def test_producto_inexistente(self):
+        with self.assertRaises(PedidoInvalido):
+            registrar_compra(self.usuario, {self.productos[0].pk: 1, 999999: 1})
+        self.assertFalse(Compra.objects.exists())
+
+    def test_checkout_desde_la_vista(self):
+        self.client.force_login(self.usuario)
+        # El carrito guarda un precio viejo: no se cobra otro total sin avisar
+        poner_carrito(self.client, {self.productos[0].pk: [2, 100]})
+        respuesta = self.client.post(reverse('confirmar_compra'), {'numero_tarjeta': '4111'})
+        self.assertRedirects(respuesta, reverse('confirmar_compra'), fetch_redirect_response=False)
+        self.assertFalse(Compra.objects.exists())
+        self.assertEqual(leer_carrito(self.client), {str(self.productos[0].pk): [2, 1800]})
+        resumen = self.client.get(reverse('confirmar_compra'))
+        self.assertContains(resumen, 'Cambió el precio de')
+        self.assertEqual(resumen.context['total_general'], Decimal('36.00'))
+
+        respuesta = self.client.post(reverse('confirmar_compra'), {'numero_tarjeta': '4111'})
+        compra = Compra.objects.get()
+        self.assertRedirects(respuesta, reverse('orden_confirmada', args=[compra.pk]))
+        self.assertEqual(compra.total_compra, Decimal('36.00'))
+        self.assertEqual(leer_carrito(self.client), {})
+
+    def test_precios_esperados(self):
+        producto = self.productos[0]
+        with self.assertRaises(PreciosCambiados) as contexto:
+            registrar_compra(self.usuario, {producto.pk: 1}, precios_esperados={producto.pk: 2000})
+        self.assertEqual(contexto.exception.cambiados, {producto.pk: 1800})
+        self.assertFalse(Compra.objects.exists())
+        compra = registrar_compra(self.usuario, {producto.pk: 1}, precios_esperados={str(producto.pk): 1800})
+        self.assertEqual(compra.total_compra, Decimal('18.00'))
+
+    def test_carrito_muestra_y_guarda_el_precio_vigente(self):
+        # La oferta venció después de agregar el producto al carrito
+        producto = self.productos[0]
+        poner_carrito(self.client, {producto.pk: [2, 1800]})
+        Oferta.objects.update(activo=False)
+        respuesta = self.client.get(reverse('ver_carrito'))
+        self.assertEqual(respuesta.context['carrito_items'][0].precio_unitario, Decimal('20.00'))
+        self.assertEqual(respuesta.context['total_general'], Decimal('40.00'))
+        self.assertContains(respuesta, f'El precio de {producto.nombre} cambió')
+        self.assertEqual(leer_carrito(self.client), {str(producto.pk): [2, 2000]})
+
+    def test_comando(self):
+        salida = StringIO()
+        call_command('registrar_compra', 'cliente', f'{self.productos[0].pk}:2', stdout=salida)
+        self.assertIn('registrada', salida.getvalue())
+        self.assertEqual(Compra.objects.get().total_compra, Decimal('36.00'))
+
+
+class ExistenciasTests(TestCase):
+    """El checkout descuenta existencias por sucursal con un solo UPDATE condicional."""
+
+    def setUp(self):
+        cache.clear()
+        self.productos = crear_catalogo(3, kg_disponibles=5)
+        self.usuario = User.objects.create_user('cliente', password='x')
+        PerfilCliente.objects.create(user=self.usuario, direccion='Calle 2')
+
+    def existencias(self):
+        return dict(Existencia.objects.filter(sucursal_id=1).values_list('producto_id', 'kg_disponibles'))
+
+    def test_descuenta_al_comprar(self):
+        a, b, c = self.productos
+        with CaptureQueriesContext(connection) as consultas:
+            registrar_compra(self.usuario, {a.pk: 3, b.pk: 5})
+        self.assertEqual(self.existencias(), {a.pk: 2, b.pk: 0, c.pk: 5})
+        self.assertEqual(len([q for q in consultas if q['sql'].startswith('UPDATE "app_fruteria_existencia"')]), 1)
+
+    def test_sin_existencias_no_descuenta_nada(self):
+        a, b, _ = self.productos
+        with self.assertRaises(SinExistencias) as error:
+            registrar_compra(self.usuario, {a.pk: 1, b.pk: 6})
+        self.assertEqual(error.exception.faltantes, {b.pk: 5})
+        self.assertIn(f'{b.nombre} (quedan 5 kg)', str(error.exception))
+        self.assertEqual(set(self.existencias().values()), {5})
+        self.assertFalse(Compra.objects.exists())
+
+    def test_sin_fila_no_controla_existencias(self):
+        # Como la base ya desplegada tras la migración 0007: productos sin filas
+        nuevo = crear_catalogo(1)[0]
+        compra = registrar_compra(self.usuario, {nuevo.pk: 7, self.productos[0].pk: 1})
+        self.assertEqual(compra.num_lineas, 2)
+        self.assertFalse(Existencia.objects.filter(producto=nuevo).exists())
+        self.assertEqual(self.existencias()[self.productos[0].pk], 4)
+
+    def test_checkout_producto_sin_existencias_registradas(self):
+        nuevo = crear_catalogo(1)[0]
+        self.client.force_login(self.usuario)
+        poner_carrito(self.client, {nuevo.pk: [2, 1800]})
+        respuesta = self.client.post(reverse('confirmar_compra'), {'numero_tarjeta': '4111'})
+        self.assertRedirects(respuesta, reverse('orden_confirmada', args=[Compra.objects.get().pk]))
+
+    def test_descuenta_en_la_sucursal_del_producto(self):
+        a = self.productos[0]
+        norte = Sucursal.objects.create(nombre='Norte', direccion='Calle 3')
+        Producto.objects.filter(pk=a.pk).update(sucursal=norte)
+        Existencia.objects.create(producto=a, sucursal=norte, kg_disponibles=2)
+        with self.assertRaises(SinExistencias) as error:
+            registrar_compra(self.usuario, {a.pk: 3})
+        self.assertEqual(error.exception.faltantes, {a.pk: 2})
+        self.assertIn(f'{a.nombre} (quedan 2 kg)', str(error.exception))
+
+        compra = registrar_compra(self.usuario, {a.pk: 2})
+        self.assertEqual(compra.sucursal, norte)
+        self.assertEqual(Existencia.objects.get(producto=a, sucursal=norte).kg_disponibles, 0)
+        # La fila de la sucursal 1 no se toca
+        self.assertEqual(self.existencias()[a.pk], 5)
+
+    def test_sucursal_indicada(self):
+        a = self.productos[0]
+        norte = Sucursal.objects.create(nombre='Norte', direccion='Calle 3')
+        Existencia.objects.create(producto=a, sucursal=norte, kg_disponibles=0)
+        with self.assertRaises(SinExistencias) as error:
+            registrar_compra(self.usuario, {a.pk: 1}, sucursal=norte)
+        self.assertIn(f'{a.nombre} (agotado)', str(error.exception))
+        self.assertEqual(registrar_compra(self.usuario, {a.pk: 5}).sucursal_id, 1)
+
+    def test_checkout_sin_existencias(self):
+        a = self.productos[0]
+        self.client.force_login(self.usuario)
+        poner_carrito(self.client, {a.pk: [9, 1800]})
+        respuesta = self.client.post(reverse('confirmar_compra'), {'numero_tarjeta': '4111'}, follow=True)
+        self.assertRedirects(respuesta, reverse('ver_carrito'))
+        self.assertContains(respuesta, 'quedan 5 kg')
+        self.assertEqual(leer_carrito(self.client), {str(a.pk): [9, 1800]})
+        self.assertFalse(Compra.objects.exists())
+
+
+class ExistenciasConcurrenciaTests(SimpleTestCase):
+    """
+    Muchas compras simultáneas del mismo producto contra un archivo SQLite
+    (WAL, BEGIN IMMEDIATE): se venden exactamente los kilos que había.
+    """
+    databases = {'default'}
+    HILOS = 40
+    KG_POR_COMPRA = 2
+    KG_INICIALES = 50
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        self.ajustes = dict(connections['default'].settings_dict, NAME=os.path.join(directorio, 'tienda.sqlite3'))
+        # Cada hilo (este incluido) usa su propia conexión a ese archivo como default
+        original = connections['default']
+        self.addCleanup(connections.__setitem__, 'default', original)
+        self.conectar()
+        self.addCleanup(connections['default'].close)
+        call_command('migrate', verbosity=0)
+
+        sucursal = Sucursal.objects.create(pk=1, nombre='Centro', direccion='Calle 1')
+        self.producto = Producto.objects.create(nombre='Mango', precio=Decimal('30.00'), sucursal=sucursal)
+        Existencia.objects.create(producto=self.producto, sucursal=sucursal, kg_disponibles=self.KG_INICIALES)
+        self.usuario = User.objects.create_user('cliente', password='x')
+
+    def conectar(self):
+        connections['default'] = type(connections['default'])(self.ajustes, alias='default')
+
+    def test_sin_sobreventa(self):
+        vendidas, agotadas, errores = [], [], []
+        salida = threading.Barrier(self.HILOS)
+
+        def comprar():
+            self.conectar()
+            try:
+                salida.wait()
+                vendidas.append(registrar_compra(self.usuario, {self.producto.pk: self.KG_POR_COMPRA}).pk)
+            except SinExistencias:
+                agotadas.append(1)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connections['default'].close()
+
+        hilos = [threading.Thread(target=comprar) for _ in range(self.HILOS)]
+        inicio = perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = perf_counter() - inicio
+
+        self.assertEqual(errores, [])
+        esperadas = self.KG_INICIALES // self.KG_POR_COMPRA
+        self.assertEqual(len(vendidas), esperadas)
+        self.assertEqual(len(agotadas), self.HILOS - esperadas)
+        self.assertEqual(Existencia.objects.get().kg_disponibles, 0)
+        self.assertEqual(Compra.objects.count(), esperadas)
+        self.assertEqual(sum(DetalleCompra.objects.values_list('cantidad', flat=True)), self.KG_INICIALES)
+        # Sin errores "database is locked" ni reintentos: esperan su turno
+        # (busy_timeout); en una máquina normal tarda alrededor de un segundo
+        self.assertLess(duracion, 10, f'{self.HILOS / duracion:.0f} checkouts/s')
+
+
+class SQLiteProduccionTests(TestCase):
+    """PRAGMA por conexión, BEGIN IMMEDIATE y la fila de escritura (basedatos.py)."""
+
+    @contextmanager
+    def base_temporal(self, transaction_mode):
+        """
+        Archivo SQLite nuevo. Devuelve `abrir()`, que registra en el hilo que
+        lo llama una conexión con el alias ``temporal`` (fuera de
+        settings.DATABASES, así el TestCase la permite también en hilos).
+        """
+        directorio = tempfile.mkdtemp()
+        ajustes = dict(
+            connection.settings_dict,
+            NAME=os.path.join(directorio, 'temporal.sqlite3'),
+            OPTIONS={'transaction_mode': transaction_mode},
+        )
+
+        def abrir():
+            connections['temporal'] = type(connections['default'])(ajustes, alias='temporal')
+            return 'temporal'
+
+        try:
+            yield abrir
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    @staticmethod
+    def cerrar(alias):
+        connections[alias].close()
+        del connections[alias]
+
+    def test_pragmas_en_cada_conexion(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+    def test_wal_en_archivo(self):
+        with self.base_temporal('IMMEDIATE') as abrir:
+            alias = abrir()
+            with connections[alias].cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone()[0], 'wal')
+            self.cerrar(alias)
+
+    def escrituras_concurrentes(self, abrir):
+        """
+        Dos transacciones que leen y luego escriben, la segunda mientras la
+        primera tiene el candado. Devuelve los errores de la segunda.
+        """
+        alias = abrir()
+        with connections[alias].cursor() as cursor:
+            cursor.execute('CREATE TABLE pedido (n INTEGER)')
+        errores, leyo = [], threading.Event()
+
+        def segunda():
+            abrir()
+            try:
+                with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+                    cursor.execute('SELECT COUNT(*) FROM pedido')
+                    leyo.set()
+                    cursor.execute('INSERT INTO pedido VALUES (2)')
+            except OperationalError as e:
+                errores.append(e)
+            finally:
+                self.cerrar(alias)
+
+        hilo = threading.Thread(target=segunda)
+        with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+            cursor.execute('INSERT INTO pedido VALUES (1)')
+            hilo.start()
+            # Con IMMEDIATE la segunda no pasa del BEGIN hasta el COMMIT
+            leyo.wait(0.3)
+        hilo.join()
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM pedido')
+            filas = cursor.fetchone()[0]
+        self.cerrar(alias)
+        return errores, filas
+
+    def test_deferred_falla_con_database_is_locked(self):
+        with self.base_temporal('DEFERRED') as abrir:
+            errores, filas = self.escrituras_concurrentes(abrir)
+        self.assertEqual(len(errores), 1)
+        self.assertIn('locked', str(errores[0]))
+        self.assertEqual(filas, 1)
+
+    def test_immediate_espera_el_candado(self):
+        with self.base_temporal('IMMEDIATE') as abrir:
+            self.assertEqual(self.escrituras_concurrentes(abrir), ([], 2))
+
+    def test_escritor_unico(self):
+        def otro_hilo_entra():
+            resultado = []
+
+            def intentar():
+                resultado.append(basedatos._escritor.acquire(blocking=False))
+                if resultado[0]:
+                    basedatos._escritor.release()
+
+            hilo = threading.Thread(target=intentar)
+            hilo.start()
+            hilo.join()
+            return resultado[0]
+
+        with mock.patch.object(basedatos, 'ESCRITOR_UNICO', True):
+            with basedatos.escritura():
+                with basedatos.escritura():  # reentrante
+                    self.assertFalse(otro_hilo_entra())
+            self.assertTrue(otro_hilo_entra())
+        with basedatos.escritura():
+            self.assertTrue(otro_hilo_entra())
+
+
+class ConfiguracionBDTests(SimpleTestCase):
+    """DATABASES desde variables de entorno (backend_olivos/bd.py)."""
+
+    def test_sqlite_por_omision(self):
+        bases = bd.configurar({}, Path('/srv/olivos'))
+        self.assertEqual(list(bases), ['default'])
+        self.assertEqual(bases['default']['NAME'], Path('/srv/olivos/db.sqlite3'))
+        self.assertEqual(bases['default']['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertEqual(bases['default']['CONN_MAX_AGE'], 600)
+
+    def test_sqlite_bajo_asgi_sin_conexiones_persistentes(self):
+        bases = bd.configurar({'FRUTERIA_VISTAS_ASYNC': '1', 'FRUTERIA_BD_REPLICA_NOMBRE': '/srv/replica.sqlite3'},
+                              Path('/srv/olivos'))
+        self.assertEqual(bases['default']['CONN_MAX_AGE'], 0)
+        self.assertEqual(bases['replica']['CONN_MAX_AGE'], 0)
+
+    def test_postgresql_con_pool_y_replica(self):
+        bases = bd.configurar({
+            'FRUTERIA_BD_MOTOR': 'postgresql',
+            'FRUTERIA_BD_NOMBRE': 'olivos',
+            'FRUTERIA_BD_HOST': 'primaria.interna',
+            'FRUTERIA_BD_REPLICA_HOST': 'replica.interna',
+            'FRUTERIA_BD_POOL_MAX': '20',
+        }, Path('/srv/olivos'))
+        self.assertEqual(bases['default']['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(bases['default']['HOST'], 'primaria.interna')
+        self.assertEqual(bases['default']['CONN_MAX_AGE'], 0)
+        self.assertEqual(bases['default']['OPTIONS']['pool'], {'min_size': 2, 'max_size': 20, 'timeout': 10.0})
+        self.assertEqual(bases['replica']['HOST'], 'replica.interna')
+        self.assertEqual(bases['replica']['TEST'], {'MIRROR': 'default'})
+
+    def test_motor_desconocido(self):
+        with self.assertRaises(ImproperlyConfigured):
+            bd.configurar({'FRUTERIA_BD_MOTOR': 'oracle'}, Path('/srv/olivos'))
+
+
+@override_settings(FRUTERIA_BD_REPLICA='replica_prueba')
+class EnrutadorReplicaTests(TransactionTestCase):
+    """
+    El router contra dos bases SQLite: la de pruebas como primaria y un
+    archivo con las tablas del catálogo como réplica "atrasada" (mismos
+    IDs, otro nombre de producto).
+    """
+
+    def setUp(self):
+        cache.clear()
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        # Alias fuera de settings.DATABASES: el TestCase lo permite sin
+        # declararlo y no choca con un alias ``replica`` configurado
+        connections['replica_prueba'] = type(connections['default'])(
+            dict(connection.settings_dict, NAME=os.path.join(directorio, 'replica.sqlite3')),
+            alias='replica_prueba',
+        )
+        self.addCleanup(self.cerrar_replica)
+        with connections['replica_prueba'].schema_editor() as editor:
+            for modelo in (Sucursal, Categoria, Oferta, Producto):
+                editor.create_model(modelo)
+
+        for base, nombre in (('default', 'Mango'), ('replica_prueba', 'Mango (réplica)')):
+            sucursal = Sucursal.objects.using(base).create(pk=1, nombre='Centro', direccion='Calle 1')
+            categoria = Categoria.objects.using(base).create(pk=1, nombre='Tropicales')
+            Producto.objects.using(base).create(
+                pk=1, nombre=nombre, precio=Decimal('30.00'), categoria=categoria, sucursal=sucursal,
+            )
+        # Las existencias no son catálogo: solo en la primaria
+        Existencia.objects.create(producto_id=1, sucursal_id=1, kg_disponibles=10)
+        self.usuario = User.objects.create_user('cliente', password='x')
+        PerfilCliente.objects.create(user=self.usuario, direccion='Calle 2')
+        # Los create() de arriba fijaron la primaria por unos segundos
+        enrutador._primaria_hasta = 0.0
+        cache.delete(enrutador.CLAVE_PRIMARIA)
+        categorias.invalidar()
+
+    def cerrar_replica(self):
+        connections['replica_prueba'].close()
+        del connections['replica_prueba']
+
+    def test_catalogo_desde_la_replica(self):
+        producto = Producto.objects.with_precio_final().get(pk=1)
+        self.assertEqual(producto.nombre, 'Mango (réplica)')
+        self.assertEqual(producto._state.db, 'replica_prueba')
+        self.assertEqual(Categoria.objects.get().nombre, 'Tropicales')
+        self.assertEqual(User.objects.get()._state.db, 'default')
+
+    def test_menu_desde_la_replica(self):
+        respuesta = self.client.get(reverse('menu_virtual'))
+        self.assertContains(respuesta, 'Mango (réplica)')
+
+    def test_escrituras_a_la_primaria(self):
+        producto = Producto.objects.get(pk=1)
+        producto.precio = Decimal('35.00')
+        producto.save()
+        self.assertEqual(Producto.objects.using('default').get(pk=1).precio, Decimal('35.00'))
+        self.assertEqual(Producto.objects.using('replica_prueba').get(pk=1).precio, Decimal('30.00'))
+        # Justo después de guardar se lee de la primaria (cachés rellenadas sin datos viejos)
+        self.assertEqual(Producto.objects.get(pk=1)._state.db, 'default')
+
+    def test_escritura_en_otro_proceso(self):
+        # Otro proceso guardó el catálogo: solo queda la marca en la caché compartida
+        with mock.patch.object(enrutador, '_primaria_hasta', 0.0):
+            enrutador.catalogo_escrito()
+        self.assertEqual(Producto.objects.get(pk=1)._state.db, 'default')
+        despues = enrutador.time.time() + enrutador.RETRASO
+        with mock.patch.object(enrutador.time, 'time', return_value=despues):
+            self.assertEqual(Producto.objects.get(pk=1)._state.db, 'replica_prueba')
+
+    def test_checkout_y_pedidos_en_la_primaria(self):
+        self.client.force_login(self.usuario)
+        poner_carrito(self.client, {1: [2, 3000]})
+        respuesta = self.client.post(reverse('confirmar_compra'), {'numero_tarjeta': '4111'})
+        compra = Compra.objects.get()
+        self.assertRedirects(respuesta, reverse('orden_confirmada', args=[compra.pk]))
+        # Los precios se releyeron dentro de la transacción, de la primaria
+        self.assertEqual(compra.detallecompra_set.get().nombre_producto, 'Mango')
+        self.assertContains(self.client.get(reverse('mis_pedidos')), 'Mango (2 kg)')
+
+    def test_migraciones_solo_en_la_primaria(self):
+        router = enrutador.EnrutadorReplica()
+        self.assertTrue(router.allow_migrate('default', 'app_fruteria'))
+        self.assertFalse(router.allow_migrate('replica_prueba', 'app_fruteria'))
+
+    @override_settings(FRUTERIA_BD_REPLICA=None)
+    def test_sin_replica_todo_a_default(self):
+        self.assertEqual(Producto.objects.get(pk=1).nombre, 'Mango')
+
+
+class HistorialPedidosTests(TestCase):
+    """Resumen guardado en la compra, "mis pedidos" y orden_confirmada en consultas fijas."""
+
+    def setUp(self):
+        cache.clear()
+        self.productos = crear_catalogo(10)
+        categorias.cargar()
+        self.usuario = User.objects.create_user('cliente', password='x')
+        PerfilCliente.objects.create(user=self.usuario, direccion='Calle 2')
+        self.client.force_login(self.usuario)
+        usuarios.obtener(self.usuario.pk)
+
+    def test_copias_al_comprar(self):
+        producto = self.productos[0]
+        compra = registrar_compra(self.usuario, {producto.pk: 3, self.productos[1].pk: 1})
+        Producto.objects.filter(pk=producto.pk).update(nombre='Otro nombre')
+        detalle = compra.detallecompra_set.get(producto=producto)
+        self.assertEqual(detalle.nombre_producto, producto.nombre)
+        self.assertEqual(detalle.subtotal, Decimal('54.00'))
+        compra.refresh_from_db()
+        self.assertEqual(compra.num_lineas, 2)
+        self.assertIn(f'{producto.nombre} (3 kg)', compra.resumen)
+
+    def test_resumir(self):
+        self.assertEqual(resumir([('Limón', 2)]), 'Limón (2 kg)')
+        texto = resumir([(f'Fruta {i}', 1) for i in range(5)])
+        self.assertEqual(texto, 'Fruta 0 (1 kg), Fruta 1 (1 kg), Fruta 2 (1 kg) y 2 más')
+        self.assertEqual(len(resumir([('x' * 300, 1)])), 255)
+
+    def test_guardar_detalle_a_mano(self):
+        compra = Compra.objects.create(cliente=self.usuario)
+        detalle = DetalleCompra.objects.create(
+            compra=compra, producto=self.productos[0], cantidad=2, precio_unitario=Decimal('7.50'),
+        )
+        self.assertEqual(detalle.nombre_producto, self.productos[0].nombre)
+        self.assertEqual(detalle.subtotal, Decimal('15.00'))
+
+    def test_orden_confirmada_consultas_constantes(self):
+        conteos = []
+        for tamano in (1, 10):
+            compra = registrar_compra(self.usuario, {p.pk: 1 for p in self.productos[:tamano]})
+            with CaptureQueriesContext(connection) as consultas:
+                respuesta = self.client.get(reverse('orden_confirmada', args=[compra.pk]))
+            self.assertContains(respuesta, self.productos[0].nombre)
+            conteos.append(len(consultas))
+        self.assertEqual(conteos[0], conteos[1])
+
+    def test_mis_pedidos_paginado(self):
+        otro = User.objects.create_user('otro', password='x')
+        registrar_compra(otro, {self.productos[0].pk: 1})
+        ahora = timezone.now()
+        compras = []
+        for i in range(5):
+            compra = registrar_compra(self.usuario, {self.productos[i].pk: 1})
+            Compra.objects.filter(pk=compra.pk).update(fecha_compra=ahora - timedelta(days=i))
+            compras.append(compra.pk)
+
+        with mock.patch('app_fruteria.views.PEDIDOS_POR_PAGINA', 2):
+            vistos, parametros, conteos = [], '', []
+            while True:
+                with CaptureQueriesContext(connection) as consultas:
+                    respuesta = self.client.get(reverse('mis_pedidos') + ('?' + parametros if parametros else ''))
+                conteos.append(len(consultas))
+                pagina = respuesta.context['pedidos']
+                vistos += [pedido.pk for pedido in pagina]
+                parametros = pagina.parametros_siguiente
+                if not parametros:
+                    break
+        # Del más reciente al más antiguo, sin las compras de otro cliente
+        self.assertEqual(vistos, compras)
+        self.assertEqual(len(set(conteos)), 1)
+
+    def test_mis_pedidos_cursor_invalido(self):
+        respuesta = self.client.get(reverse('mis_pedidos') + '?cursor=basura')
+        self.assertRedirects(respuesta, reverse('mis_pedidos'))
+
+    def test_mis_pedidos_requiere_sesion(self):
+        self.client.logout()
+        respuesta = self.client.get(reverse('mis_pedidos'))
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertIn(reverse('iniciar_sesion'), respuesta['Location'])
+
+
+class AlmacenesCarritoTests(TestCase):
+    """Los tres almacenes del carrito se comportan igual; cookie y caché no tocan la BD."""
+
+    backends = {
+        'firmado': 'app_fruteria.carrito.CarritoFirmado',
+        'cache': 'app_fruteria.carrito.CarritoCache',
+        'sesion': 'app_fruteria.carrito.CarritoSesion',
+    }
+    ajax = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+
+    def setUp(self):
+        cache.clear()
+        self.producto = crear_catalogo(1)[0]
+
+    def flujo(self):
+        agregar = reverse('agregar_al_carrito', args=[self.producto.pk])
+        self.client.get(agregar, **self.ajax)
+        self.client.get(agregar, **self.ajax)
+        datos = self.client.get(
+            reverse('ajustar_cantidad', args=[self.producto.pk, 'aumentar']), **self.ajax
+        ).json()
+        self.assertEqual(datos['new_quantity'], 3)
+        self.assertEqual(Decimal(datos['new_subtotal']), Decimal('54.00'))
+        self.assertEqual(Decimal(datos['new_total_final']), Decimal('94.00'))
+
+        respuesta = self.client.get(reverse('ver_carrito'))
+        self.assertEqual(respuesta.context['carrito_items'][0].cantidad, 3)
+
+        datos = self.client.get(reverse('eliminar_item_carrito', args=[self.producto.pk]), **self.ajax).json()
+        self.assertTrue(datos['success'])
+        self.assertEqual(len(self.client.get(reverse('ver_carrito')).context['carrito_items']), 0)
+
+    def test_mismo_comportamiento(self):
+        for nombre, backend in self.backends.items():
+            with self.subTest(backend=nombre), override_settings(FRUTERIA_CARRITO_BACKEND=backend):
+                self.client = self.client_class()
+                self.flujo()
+
+    def test_clics_sin_bd(self):
+        agregar = reverse('agregar_al_carrito', args=[self.producto.pk])
+        ajustar = reverse('ajustar_cantidad', args=[self.producto.pk, 'aumentar'])
+        eliminar = reverse('eliminar_item_carrito', args=[self.producto.pk])
+        for nombre in ('firmado', 'cache'):
+            with self.subTest(backend=nombre), override_settings(FRUTERIA_CARRITO_BACKEND=self.backends[nombre]):
+                self.client = self.client_class()
+                self.client.get(agregar, **self.ajax) # calienta la caché del producto
+                with self.assertNumQueries(0):
+                    self.client.get(agregar, **self.ajax)
+                    self.client.get(ajustar, **self.ajax)
+                    self.client.get(eliminar, **self.ajax)
+
+    def test_cookie_alterada_se_descarta(self):
+        self.client.cookies[CarritoFirmado.clave] = 'basura'
+        respuesta = self.client.get(reverse('ver_carrito'))
+        self.assertEqual(respuesta.context['carrito_items'], [])
+
+    def test_carrito_grande_pasa_a_la_cache(self):
+        def guardar(lineas, cookies):
+            carrito = CarritoFirmado(RequestFactory().get('/', HTTP_COOKIE=cookies))
+            carrito.reemplazar(lineas)
+            respuesta = HttpResponse()
+            carrito.guardar(respuesta)
+            return respuesta.cookies
+
+        # ~1000 líneas firmadas y comprimidas pasan de 4 KB: el navegador tiraría la cookie
+        grande = {str(pid): [pid % 7 + 1, pid * 37 % 100000] for pid in range(1000, 2000)}
+        cookies = guardar(grande, '')
+        self.assertEqual(cookies[CarritoFirmado.clave].value, '')
+        self.assertLess(len(cookies[CarritoCache.clave].value), 100)
+        cabecera = f'{CarritoCache.clave}={cookies[CarritoCache.clave].value}'
+        self.assertEqual(CarritoFirmado(RequestFactory().get('/', HTTP_COOKIE=cabecera)).lineas, grande)
+
+        # Cuando vuelve a caber regresa a la cookie y se borra de la caché
+        cookies = guardar({'1': [2, 1800]}, cabecera)
+        self.assertEqual(signing.loads(cookies[CarritoFirmado.clave].value, salt=CarritoFirmado.sal), {'1': [2, 1800]})
+        self.assertEqual(cookies[CarritoCache.clave].value, '')
+        self.assertEqual(CarritoCache(RequestFactory().get('/', HTTP_COOKIE=cabecera)).lineas, {})
+
+
+class CarritoLoteTests(TestCase):
+    """El endpoint en lote aplica todas las operaciones o ninguna, con una sola escritura."""
+
+    def setUp(self):
+        cache.clear()
+        self.a, self.b, self.c = crear_catalogo(3)
+        self.url = reverse('actualizar_carrito_lote')
+
+    def lote(self, operaciones, client=None):
+        return (client or self.client).post(
+            self.url, data={'operaciones': operaciones}, content_type='application/json',
+        )
+
+    def test_aplica_y_devuelve_totales(self):
+        poner_carrito(self.client, {self.c.pk: [1, 1800]})
+        respuesta = self.lote([
+            {'op': 'agregar', 'producto': self.a.pk},
+            {'op': 'agregar', 'producto': self.a.pk, 'cantidad': 2},
+            {'op': 'fijar', 'producto': self.b.pk, 'cantidad': 4},
+            {'op': 'eliminar', 'producto': self.c.pk},
+        ])
+        datos = respuesta.json()
+        self.assertTrue(datos['success'])
+        self.assertEqual(leer_carrito(self.client), {str(self.a.pk): [3, 1800], str(self.b.pk): [4, 1800]})
+        self.assertEqual(datos['lineas'][str(self.b.pk)]['cantidad'], 4)
+        self.assertEqual(Decimal(datos['new_subtotal']), Decimal('126.00'))
+        self.assertEqual(Decimal(datos['new_total_final']), Decimal('166.00'))
+
+    def test_invalido_no_cambia_nada(self):
+        poner_carrito(self.client, {self.a.pk: [2, 1800]})
+        antes = self.client.cookies[CarritoFirmado.clave].value
+        for operaciones in (
+            [{'op': 'agregar', 'producto': self.b.pk}, {'op': 'agregar', 'producto': 999999}],
+            [{'op': 'fijar', 'producto': self.a.pk, 'cantidad': 0}],
+            [{'op': 'vender', 'producto': self.a.pk}],
+            [],
+        ):
+            with self.subTest(operaciones=operaciones):
+                respuesta = self.lote(operaciones)
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertNotIn(CarritoFirmado.clave, respuesta.cookies)
+        self.assertEqual(self.client.cookies[CarritoFirmado.clave].value, antes)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+    def test_una_consulta_por_lote(self):
+        operaciones = [{'op': 'agregar', 'producto': p.pk} for p in (self.a, self.b, self.c)]
+        with self.assertNumQueries(1):
+            self.lote(operaciones)
+        # Con los precios ya en caché, otro lote no toca la BD
+        with self.assertNumQueries(0):
+            self.lote(operaciones)
+        self.assertEqual(leer_carrito(self.client)[str(self.a.pk)], [2, 1800])
+
+    def test_csrf_desde_la_cookie(self):
+        client = self.client_class(enforce_csrf_checks=True)
+        token = client.get(reverse('menu_virtual')).cookies['csrftoken'].value
+        operaciones = [{'op': 'agregar', 'producto': self.a.pk}]
+        self.assertEqual(self.lote(operaciones, client).status_code, 403)
+        respuesta = client.post(
+            self.url, data={'operaciones': operaciones}, content_type='application/json',
+            headers={'X-CSRFToken': token},
+        )
+        self.assertEqual(respuesta.status_code, 200)
+
+    @override_settings(FRUTERIA_CARRITO_BACKEND='app_fruteria.carrito.CarritoSesion')
+    def test_una_escritura_de_sesion(self):
+        self.client.get(reverse('menu_virtual'))
+        operaciones = [{'op': 'agregar', 'producto': p.pk} for p in (self.a, self.b, self.c)] * 5
+        with CaptureQueriesContext(connection) as consultas:
+            self.lote(operaciones)
+        escrituras = [q for q in consultas if 'django_session' in q['sql'] and not q['sql'].startswith('SELECT')]
+        self.assertEqual(len(escrituras), 1)
+        self.assertEqual(self.client.session['carrito'][str(self.a.pk)]['cantidad'], 5)
+
+
+class ApiCatalogoTests(TestCase):
+    """API JSON: filtros, paginación por cursor y revalidación con ETag."""
+
+    def setUp(self):
+        cache.clear()
+        self.citricas = crear_catalogo(5)  # $20.00 con 10% -> $18.00
+        dulces = Categoria.objects.create(nombre='Dulces')
+        self.dulces = Producto.objects.bulk_create([
+            Producto(nombre=f'Dulce {i}', precio=Decimal(p), descripcion='x', categoria=dulces, sucursal_id=1)
+            for i, p in enumerate(['18.00', '9.50', '30.00', '18.00'])
+        ])
+        self.url = reverse('api_productos')
+
+    def recorrer(self, **parametros):
+        """Sigue `siguiente` hasta el final y devuelve todos los resultados."""
+        resultados, url, datos = [], self.url, parametros
+        while url:
+            pagina = self.client.get(url, datos).json()
+            resultados += pagina['resultados']
+            url, datos = pagina['siguiente'], None
+        return resultados
+
+    def test_paginacion_por_cursor(self):
+        for orden in ('nombre', 'precio', '-precio', 'id'):
+            with self.subTest(orden=orden):
+                resultados = self.recorrer(orden=orden, limite=2)
+                ids = [r['id'] for r in resultados]
+                self.assertEqual(sorted(ids), sorted(p.pk for p in self.citricas + self.dulces))
+                campo = {'nombre': 'nombre', 'id': 'id'}.get(orden, 'precio_final')
+                llaves = [(Decimal(r[campo]) if campo == 'precio_final' else r[campo], r['id']) for r in resultados]
+                if orden == '-precio':
+                    llaves = [(-valor, i) for valor, i in llaves]
+                self.assertEqual(llaves, sorted(llaves))
+
+    def test_filtros(self):
+        citricas = self.recorrer(categoria='Cítricas')
+        self.assertEqual(len(citricas), 5)
+        self.assertTrue(all(r['en_oferta'] and r['precio_final'] == '18.00' for r in citricas))
+        self.assertEqual(len(self.recorrer(categoria=self.dulces[0].categoria_id)), 4)
+        # Dígitos que no son ASCII ('²') o ids fuera de rango: ninguna categoría
+        for categoria in ('²', '٣', '9' * 30):
+            with self.subTest(categoria=categoria):
+                self.assertEqual(self.recorrer(categoria=categoria), [])
+        self.assertEqual(len(self.recorrer(en_oferta=0)), 4)
+        baratos = self.recorrer(precio_min='9', precio_max='18')
+        self.assertEqual(len(baratos), 8)
+        self.assertEqual({r['precio_final'] for r in baratos}, {'9.50', '18.00'})
+
+    def test_parametros_invalidos(self):
+        for parametros in ({'orden': 'azar'}, {'precio_max': 'mucho'}, {'en_oferta': 'si'},
+                           {'cursor': 'no-es-un-cursor'}, {'limite': 'x'}):
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.client.get(self.url, parametros).status_code, 400)
+        # Un cursor con el valor del tipo equivocado para su orden tampoco
+        for orden, valor in (('nombre', None), ('nombre', 3), ('precio', 'NaN'), ('precio', 'sNaN'),
+                             ('precio', 18), ('id', '7')):
+            with self.subTest(orden=orden, valor=valor):
+                cursor = codificar_cursor(orden, valor, 1)
+                self.assertEqual(self.client.get(self.url, {'orden': orden, 'cursor': cursor}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'cursor': codificar_cursor('nombre', 'A', 2 ** 64)}).status_code, 400)
+        # Un cursor de otro orden tampoco sirve
+        cursor = self.client.get(self.url, {'limite': 1}).json()['cursor_siguiente']
+        self.assertEqual(self.client.get(self.url, {'orden': 'precio', 'cursor': cursor}).status_code, 400)
+
+    def test_una_consulta_por_pagina(self):
+        ofertas.vigentes()  # una consulta al día, compartida por todas las páginas
+        with self.assertNumQueries(1):
+            self.client.get(self.url, {'limite': 3})
+        with self.assertNumQueries(1):
+            self.client.get(reverse('api_producto', args=[self.citricas[0].pk]))
+
+    def test_etag_y_304(self):
+        respuesta = self.client.get(self.url)
+        etag = respuesta.headers['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn('must-revalidate', respuesta.headers['Cache-Control'])
+        with self.assertNumQueries(0):
+            revalidada = self.client.get(self.url, headers={'If-None-Match': etag})
+            cacheada = self.client.get(self.url)
+        self.assertEqual(revalidada.status_code, 304)
+        self.assertEqual(cacheada.content, respuesta.content)
+        self.assertEqual(cacheada.headers['ETag'], etag)
+
+        # Otro filtro es otro recurso; editar el catálogo cambia el ETag
+        self.assertNotEqual(self.client.get(self.url, {'orden': 'precio'}).headers['ETag'], etag)
+        producto = self.citricas[0]
+        producto.precio = Decimal('25.00')
+        producto.save()
+        nueva = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(nueva.status_code, 200)
+        self.assertNotEqual(nueva.headers['ETag'], etag)
+
+    def test_detalle_categorias_y_ofertas(self):
+        detalle = self.client.get(reverse('api_producto', args=[self.citricas[0].pk])).json()
+        self.assertEqual(detalle['oferta']['porcentaje_descuento'], '10.00')
+        self.assertEqual(detalle['descripcion'], 'Fresca')
+        self.assertEqual(self.client.get(reverse('api_producto', args=[999999])).status_code, 404)
+
+        categorias = self.client.get(reverse('api_categorias')).json()['resultados']
+        self.assertEqual([(c['nombre'], c['productos']) for c in categorias], [('Cítricas', 5), ('Dulces', 4)])
+        ofertas = self.client.get(reverse('api_ofertas')).json()['resultados']
+        self.assertEqual([o['productos'] for o in ofertas], [5])
+        self.assertEqual(self.client.post(reverse('api_categorias')).status_code, 405)
+
+
+class BusquedaTests(TestCase):
+    """Búsqueda FTS5: sin acentos, por prefijo, ordenada y al día con el catálogo."""
+
+    def setUp(self):
+        cache.clear()
+        sucursal = Sucursal.objects.create(pk=1, nombre='Centro', direccion='Calle 1')
+        citricas = Categoria.objects.create(nombre='Cítricas')
+        dulces = Categoria.objects.create(nombre='Dulces')
+        datos = [
+            ('Limón Persa', 'Ácido y jugoso', citricas),
+            ('Agua fresca', 'Hecha con limón', None),
+            ('Mango Ataulfo', 'Dulce, de Nayarit', dulces),
+            ('Naranja Valencia', 'Para jugo', citricas),
+        ]
+        # bulk_create no manda señales: el índice se llena con los triggers
+        self.limon, self.agua, self.mango, self.naranja = Producto.objects.bulk_create([
+            Producto(nombre=n, precio=Decimal('20.00'), descripcion=d, categoria=c, sucursal=sucursal)
+            for n, d, c in datos
+        ])
+
+    def test_sin_acentos_y_por_prefijo(self):
+        self.assertEqual(busqueda.buscar('limon')[0], self.limon.pk)
+        self.assertEqual(busqueda.buscar('LIMÓN')[0], self.limon.pk)
+        self.assertEqual(set(busqueda.buscar('lim')), {self.limon.pk, self.agua.pk})
+        self.assertEqual(busqueda.buscar('citricas para'), [self.naranja.pk])
+        self.assertEqual(busqueda.buscar('l'), [])
+        # La sintaxis de FTS5 en el texto no rompe la consulta
+        self.assertEqual(busqueda.buscar('"limón*) -'), [self.limon.pk, self.agua.pk])
+
+    def test_relevancia(self):
+        # "limón" en el nombre pesa más que en la descripción
+        self.assertEqual(busqueda.buscar('limon'), [self.limon.pk, self.agua.pk])
+
+    def test_indice_al_dia(self):
+        self.assertEqual(busqueda.buscar('papaya'), [])
+        self.mango.nombre = 'Papaya Maradol'
+        self.mango.save()
+        self.assertEqual(busqueda.buscar('papaya'), [self.mango.pk])
+        self.assertEqual(busqueda.buscar('mango'), [])
+
+        Categoria.objects.filter(nombre='Dulces').update(nombre='Tropicales')
+        self.assertEqual(busqueda.buscar('tropicales'), [self.mango.pk])
+        self.naranja.delete()
+        self.assertEqual(busqueda.buscar('valencia'), [])
+
+        call_command('reconstruir_busqueda', verbosity=0)
+        self.assertEqual(busqueda.buscar('papaya'), [self.mango.pk])
+
+    def test_relevancia_entre_muchas_coincidencias(self):
+        # El más relevante (en el nombre) es la última de más de mil filas que
+        # coinciden: se ordena todo antes de cortar
+        sucursal = Sucursal.objects.get(pk=1)
+        Producto.objects.bulk_create([
+            Producto(nombre=f'Caja {i}', precio=Decimal('20.00'), descripcion='Con kiwi', sucursal=sucursal)
+            for i in range(1100)
+        ])
+        kiwi = Producto.objects.create(nombre='Kiwi', precio=Decimal('30.00'), descripcion='x', sucursal=sucursal)
+        self.assertEqual(busqueda.buscar('kiwi', limite=3)[0], kiwi.pk)
+
+    def test_orden_por_columnas_sin_ordenar_todo(self):
+        buscador = busqueda.BuscadorFTS5()
+        # Con el nombre basta: una sola consulta, sin calcular bm25
+        with self.assertNumQueries(1):
+            self.assertEqual(buscador.buscar(['limon'], 1), [self.limon.pk])
+        # Solo en la categoría: en el orden del índice, sin ordenar por bm25
+        toronja = Producto.objects.create(
+            nombre='Toronja', precio=Decimal('20.00'), descripcion='Rosa, como la naranja',
+            sucursal_id=1, categoria=Categoria.objects.get(nombre='Cítricas'),
+        )
+        self.assertEqual(buscador.buscar(['citricas'], 5), [self.limon.pk, self.naranja.pk, toronja.pk])
+        # Palabras en columnas distintas: el MATCH completo, ordenado
+        with self.assertNumQueries(3):
+            self.assertEqual(buscador.buscar(['naranja', 'rosa'], 5), [toronja.pk])
+
+    def test_respaldo_orm(self):
+        with self.settings(FRUTERIA_BUSQUEDA_BACKEND='app_fruteria.busqueda.BuscadorORM'):
+            self.assertEqual(busqueda.buscar('limón'), [self.limon.pk, self.agua.pk])
+            self.assertEqual(busqueda.buscar('valencia jugo'), [self.naranja.pk])
+
+    def test_resultados_en_cache(self):
+        busqueda.buscar('naranja')
+        with self.assertNumQueries(0):
+            self.assertEqual(busqueda.buscar('naranja'), [self.naranja.pk])
+
+    def test_pagina_y_api(self):
+        respuesta = self.client.get(reverse('buscar_productos'), {'q': 'limon'})
+        self.assertEqual(
+            [p.pk for p in respuesta.context['lista_productos']], [self.limon.pk, self.agua.pk]
+        )
+        self.assertContains(respuesta, 'Resultados para')
+        self.assertNotContains(respuesta, 'Mango Ataulfo')
+        self.assertContains(self.client.get(reverse('buscar_productos'), {'q': 'kiwi'}), 'No encontramos')
+        # El menú no comparte fragmento con la búsqueda
+        self.assertContains(self.client.get(reverse('menu_virtual'), {'q': 'limon'}), 'Mango Ataulfo')
+
+        datos = self.client.get(reverse('api_buscar'), {'q': 'mang', 'limite': 5}).json()
+        self.assertEqual([r['nombre'] for r in datos['resultados']], ['Mango Ataulfo'])
+
+
+class CategoriasTests(TestCase):
+    """Una vista y una plantilla para todas las categorías, resueltas con el mapa en memoria."""
+
+    def setUp(self):
+        cache.clear()
+        self.citricas = crear_catalogo(3)
+        self.dulces = crear_catalogo(2, categoria_nombre='Dulces')
+
+    def test_slug_desde_el_nombre(self):
+        self.assertEqual(Categoria.objects.get(nombre='Cítricas').slug, 'citricas')
+        self.assertEqual(Categoria.objects.create(nombre='Frutos Rojos').slug, 'frutos-rojos')
+        self.assertEqual(Categoria.objects.create(nombre='Otra', slug='propia').slug, 'propia')
+
+    def test_vista_por_slug(self):
+        respuesta = self.client.get(reverse('categoria', args=['dulces']))
+        self.assertTemplateUsed(respuesta, 'app_fruteria/categoria.html')
+        self.assertEqual([p.pk for p in respuesta.context['lista_productos']], [p.pk for p in self.dulces])
+        self.assertContains(respuesta, 'frutas Dulces')
+        self.assertEqual(self.client.get(reverse('categoria', args=['verduras'])).status_code, 404)
+
+    def test_categoria_nueva_sin_codigo(self):
+        crear_catalogo(1, categoria_nombre='Frutos Rojos')
+        respuesta = self.client.get(reverse('categoria', args=['frutos-rojos']))
+        self.assertEqual(len(respuesta.context['lista_productos']), 1)
+        # El submenú de todas las páginas lista las categorías de la tabla
+        menu = self.client.get(reverse('menu_virtual'))
+        for slug in ('citricas', 'dulces', 'frutos-rojos'):
+            self.assertContains(menu, f'href="{reverse("categoria", args=[slug])}"')
+
+    def test_filtra_por_id(self):
+        categorias.cargar()
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('categoria', args=['citricas']))
+        sql = ' '.join(c['sql'] for c in consultas)
+        self.assertNotIn('app_fruteria_categoria"."nombre" =', sql)
+        self.assertIn(f'"app_fruteria_producto"."categoria_id" = {self.citricas[0].categoria_id}', sql)
+
+    def test_mapa_en_memoria(self):
+        categorias.cargar()
+        with self.assertNumQueries(0):
+            self.assertEqual(categorias.por_slug('dulces').nombre, 'Dulces')
+            self.assertEqual(categorias.cargar().buscar('DULCES').slug, 'dulces')
+        # Guardar una categoría invalida el mapa de este proceso
+        categoria = Categoria.objects.get(slug='dulces')
+        categoria.slug = 'frutas-dulces'
+        categoria.save()
+        self.assertIsNone(categorias.por_slug('dulces'))
+        self.assertEqual(categorias.por_slug('frutas-dulces').id, categoria.pk)
+        categoria.delete()
+        self.assertIsNone(categorias.por_slug('frutas-dulces'))
+
+    def test_otros_procesos_releen_al_expirar(self):
+        with mock.patch('app_fruteria.categorias.TIEMPO_VIDA', 0):
+            categorias.cargar()
+            # Un cambio hecho por otro proceso no dispara las señales de este
+            Categoria.objects.filter(slug='dulces').update(nombre='Tropicales')
+            self.assertEqual(categorias.por_slug('dulces').nombre, 'Tropicales')
+
+    def test_rutas_anteriores(self):
+        self.assertRedirects(
+            self.client.get('/citricas/', {'orden': 'precio'}),
+            reverse('categoria', args=['citricas']) + '?orden=precio', status_code=301,
+        )
+
+    def test_plantillas_compiladas_una_vez(self):
+        motor = engines.all()[0].engine
+        self.assertIsInstance(motor.template_loaders[0], CachedLoader)
+        primera = get_template('app_fruteria/categoria.html')
+        self.assertIs(get_template('app_fruteria/categoria.html').template, primera.template)
+
+
+@mock.patch('app_fruteria.views.POR_PAGINA', 5)
+class PaginacionCatalogoTests(TestCase):
+    """Menú y categorías por páginas (keyset) con scroll infinito y modal bajo demanda."""
+
+    def setUp(self):
+        cache.clear()
+        self.productos = crear_catalogo(12)
+
+    def tarjetas(self, respuesta):
+        contenido = respuesta.content.decode()
+        ids = [int(i) for i in re.findall(r'js-add-to-cart"\s+data-product-id="(\d+)"', contenido)]
+        siguiente = re.search(r'data-siguiente="([^"]+)"', contenido)
+        return ids, html.unescape(siguiente.group(1)) if siguiente else None
+
+    def recorrer(self, url, parametros=None):
+        ids, siguiente = self.tarjetas(self.client.get(url, parametros))
+        while siguiente:
+            nuevos, siguiente = self.tarjetas(self.client.get(siguiente))
+            ids += nuevos
+        return ids
+
+    def test_primera_pagina_y_fragmentos(self):
+        respuesta = self.client.get(reverse('menu_virtual'))
+        ids, siguiente = self.tarjetas(respuesta)
+        self.assertEqual(ids, [p.pk for p in self.productos[:5]])
+        self.assertTrue(siguiente.startswith(reverse('pagina_catalogo', args=['menu'])))
+        # Un solo modal vacío en lugar de uno por producto
+        self.assertContains(respuesta, 'id="modal-producto"', count=1)
+        self.assertNotContains(respuesta, f'modal-{self.productos[0].pk}')
+
+        self.assertEqual(self.recorrer(reverse('menu_virtual')), [p.pk for p in self.productos])
+        precios = self.recorrer(reverse('categoria', args=['citricas']), {'orden': '-precio'})
+        self.assertEqual(sorted(precios), sorted(p.pk for p in self.productos))
+
+    def test_tamano_constante(self):
+        largo = len(self.client.get(reverse('menu_virtual')).content)
+        crear_catalogo(40)
+        cache.clear()
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(reverse('pagina_catalogo', args=['menu']))
+        self.assertEqual(len(self.tarjetas(respuesta)[0]), 5)
+        self.assertLess(abs(len(self.client.get(reverse('menu_virtual')).content) - largo), 100)
+
+    def test_fragmento_en_cache(self):
+        url = self.tarjetas(self.client.get(reverse('menu_virtual')))[1]
+        primera = self.client.get(url)
+        with CaptureQueriesContext(connection) as consultas:
+            segunda = self.client.get(url)
+        self.assertEqual(primera.content, segunda.content)
+        self.assertFalse(any('app_fruteria_producto' in c['sql'] for c in consultas))
+
+    def test_cursor_o_seccion_invalidos(self):
+        self.assertEqual(self.client.get(reverse('pagina_catalogo', args=['menu']), {'cursor': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('pagina_catalogo', args=['verduras'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('pagina_catalogo', args=['citricas'])).status_code, 200)
+        self.assertRedirects(
+            self.client.get(reverse('menu_virtual'), {'cursor': 'x'}), reverse('menu_virtual'),
+            fetch_redirect_response=False,
+        )
+
+    def test_cursor_con_valor_invalido(self):
+        # Cursores bien formados con un valor que no corresponde a su orden
+        url = reverse('categoria', args=['citricas'])
+        for orden, valor in (('nombre', None), ('precio', 'NaN'), ('-precio', 'Infinity'), ('precio', [])):
+            with self.subTest(orden=orden, valor=valor):
+                cursor = codificar_cursor(orden, valor, self.productos[0].pk)
+                respuesta = self.client.get(url, {'orden': orden, 'cursor': cursor})
+                self.assertRedirects(respuesta, f'{url}?orden={orden}')
+                fragmento = self.client.get(reverse('pagina_catalogo', args=['citricas']),
+                                            {'orden': orden, 'cursor': cursor})
+                self.assertEqual(fragmento.status_code, 400)
+
+    def test_detalle_bajo_demanda(self):
+        producto = self.productos[0]
+        respuesta = self.client.get(reverse('detalle_producto', args=[producto.pk]))
+        self.assertContains(respuesta, 'Fresca')
+        self.assertContains(respuesta, f'data-product-id="{producto.pk}"')
+        self.assertEqual(self.client.get(reverse('detalle_producto', args=[999999])).status_code, 404)
+
+
+class DineroTests(TestCase):
+    """Los totales se suman en centavos y el envío se configura en un solo lugar."""
+
+    def test_conversiones(self):
+        self.assertEqual(a_centavos('18.005'), 1801)
+        self.assertEqual(a_centavos(Decimal('21.68')), 2168)
+        self.assertEqual(a_decimal(2168), Decimal('21.68'))
+
+    def test_totales(self):
+        totales = calcular_totales([(3, 1800), (1, 999)])
+        self.assertEqual(totales.subtotal_centavos, 6399)
+        self.assertEqual(totales.total, Decimal('103.99'))
+        self.assertEqual(calcular_totales([]).total, Decimal('0.00'))
+
+    @override_settings(FRUTERIA_COSTO_ENVIO_CENTAVOS=2550)
+    def test_envio_configurable(self):
+        cache.clear()
+        producto = crear_catalogo(1)[0]
+        poner_carrito(self.client, {producto.pk: [2, 1800]})
+        respuesta = self.client.get(reverse('ver_carrito'))
+        self.assertEqual(respuesta.context['costo_envio'], Decimal('25.50'))
+        self.assertEqual(respuesta.context['total_final'], Decimal('61.50'))
+
+
+class EmailOrUsernameBackendTests(TestCase):
+    """El login ignora mayúsculas en username y email (vía LOWER(), que usa los índices)."""
+
+    def setUp(self):
+        User.objects.create_user('Ana', email='Ana@Ejemplo.mx', password='secreta-123')
+
+    def test_username_o_email_sin_mayusculas(self):
+        backend = EmailOrUsernameBackend()
+        for login in ('ana', 'ANA', 'ana@ejemplo.mx', 'ANA@EJEMPLO.MX'):
+            with self.subTest(login=login):
+                self.assertIsNotNone(backend.authenticate(None, username=login, password='secreta-123'))
+        self.assertIsNone(backend.authenticate(None, username='ana', password='otra'))
+        self.assertIsNone(backend.authenticate(None, username='nadie', password='secreta-123'))
+
+    def test_consulta_usa_lower(self):
+        sql = str(EmailOrUsernameBackend.usuarios_por_login('Ana').query)
+        self.assertIn('LOWER("auth_user"."username")', sql)
+
+
+class UsuarioSesionTests(TestCase):
+    """Un solo hash por login y el usuario con su perfil en caché entre peticiones."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user('ana', email='ana@ejemplo.mx', password='secreta-123')
+        PerfilCliente.objects.create(user=self.usuario, direccion='Calle 2')
+
+    def contar_consultas(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return [c['sql'] for c in consultas.captured_queries]
+
+    def test_login_verifica_la_contrasena_una_vez(self):
+        with mock.patch('django.contrib.auth.base_user.check_password', wraps=check_password) as verificar:
+            respuesta = self.client.post(
+                reverse('iniciar_sesion'), {'username': 'ANA@ejemplo.mx', 'password': 'secreta-123'},
+            )
+        self.assertRedirects(respuesta, reverse('menu_virtual'), fetch_redirect_response=False)
+        self.assertEqual(verificar.call_count, 1)
+        self.assertEqual(int(self.client.session['_auth_user_id']), self.usuario.pk)
+
+    def test_login_incorrecto(self):
+        respuesta = self.client.post(reverse('iniciar_sesion'), {'username': 'ana', 'password': 'otra'})
+        self.assertContains(respuesta, 'Usuario o contraseña incorrectos.')
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_perfil_sin_consultar_usuario_ni_perfil(self):
+        self.client.force_login(self.usuario)
+        cache.clear()
+        # La primera vez: usuario y perfil en un solo JOIN (antes eran dos consultas)
+        fria = self.contar_consultas(reverse('perfil'))
+        self.assertEqual(len([sql for sql in fria if 'auth_user' in sql or 'perfilcliente' in sql]), 1)
+        # Después ninguna
+        caliente = self.contar_consultas(reverse('perfil'))
+        self.assertEqual(len(fria) - len(caliente), 1)
+        self.assertFalse([sql for sql in caliente if 'auth_user' in sql or 'perfilcliente' in sql])
+
+    def test_compra_sin_consultar_perfil(self):
+        self.client.force_login(self.usuario)
+        self.contar_consultas(reverse('confirmar_compra'))
+        consultas = self.contar_consultas(reverse('confirmar_compra'))
+        self.assertFalse([sql for sql in consultas if 'auth_user' in sql or 'perfilcliente' in sql])
+
+    def test_guardar_invalida(self):
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('perfil'))
+        self.assertIsNotNone(cache.get(usuarios.clave(self.usuario.pk)))
+
+        perfil = PerfilCliente.objects.get(user=self.usuario)
+        perfil.direccion = 'Calle Nueva 5'
+        perfil.save()
+        self.assertIsNone(cache.get(usuarios.clave(self.usuario.pk)))
+        self.assertContains(self.client.get(reverse('perfil')), 'Calle Nueva 5')
+
+        self.client.post(reverse('perfil'), {'first_name': 'Ana María', 'last_name': '', 'telefono': '', 'direccion': 'X'})
+        self.assertContains(self.client.get(reverse('perfil')), 'Ana María')
+
+    def test_cambio_de_contrasena_cierra_la_sesion(self):
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('perfil'))
+        self.usuario.set_password('nueva-456')
+        self.usuario.save()
+        respuesta = self.client.get(reverse('perfil'))
+        self.assertEqual(respuesta.status_code, 302)
+
+    def test_sin_perfil(self):
+        sin_perfil = User.objects.create_user('beto', password='x')
+        self.client.force_login(sin_perfil)
+        self.assertEqual(self.client.get(reverse('perfil')).status_code, 200)
+        self.assertTrue(PerfilCliente.objects.filter(user=sin_perfil).exists())
+        self.assertEqual(usuarios.obtener(sin_perfil.pk).perfilcliente.user_id, sin_perfil.pk)
+
+    def test_aobtener(self):
+        usuario = async_to_sync(usuarios.aobtener)(self.usuario.pk)
+        self.assertEqual(usuario.perfilcliente.direccion, 'Calle 2')
+        with self.assertNumQueries(0):
+            self.assertEqual(usuarios.obtener(self.usuario.pk).pk, self.usuario.pk)
+
+    def test_cache_sin_hash_de_contrasena(self):
+        usuarios.obtener(self.usuario.pk)
+        guardado = cache.get(usuarios.clave(self.usuario.pk))
+        self.assertNotIn('password', guardado.__dict__)
+        self.assertNotIn(self.usuario.password.encode(), pickle.dumps(guardado))
+        # Guardar el usuario de la caché no borra la contraseña
+        guardado.first_name = 'Ana'
+        guardado.save()
+        self.usuario.refresh_from_db()
+        self.assertEqual(self.usuario.first_name, 'Ana')
+        self.assertTrue(self.usuario.check_password('secreta-123'))
+        self.assertIsNone(cache.get(usuarios.clave(self.usuario.pk)))
+
+    def test_usuario_inactivo_pierde_la_sesion(self):
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get(reverse('perfil')).status_code, 200)
+        self.usuario.is_active = False
+        self.usuario.save()
+        self.assertEqual(self.client.get(reverse('perfil')).status_code, 302)
+        backend = EmailOrUsernameBackend()
+        self.assertIsNone(backend.get_user(self.usuario.pk))
+        self.assertIsNone(async_to_sync(backend.aget_user)(self.usuario.pk))
+        self.assertIsNone(backend.get_user(999999))
+
+
+class SeedFruteriaTests(TestCase):
+    """seed_fruteria genera los volúmenes pedidos de forma reproducible."""
+
+    def test_volumenes_y_semilla(self):
+        opciones = dict(productos=30, compras=12, usuarios=4, ofertas=3, sucursales=2, verbosity=0)
+        call_command('seed_fruteria', semilla=5, **opciones)
+        self.assertEqual(Producto.objects.count(), 30)
+        self.assertEqual(Compra.objects.count(), 12)
+        self.assertEqual(PerfilCliente.objects.count(), 4)
+        self.assertEqual(Existencia.objects.count(), 30 * 2)
+        self.assertTrue(DetalleCompra.objects.exists())
+        primeros = list(Producto.objects.order_by('pk').values_list('nombre', 'precio'))
+
+        call_command('seed_fruteria', semilla=5, limpiar=True, **opciones)
+        self.assertEqual(list(Producto.objects.order_by('pk').values_list('nombre', 'precio')), primeros)
+        compra = Compra.objects.first()
+        self.assertEqual(compra.total_compra, sum(d.subtotal for d in compra.detallecompra_set.all()))
+
+
+class BenchmarksTests(SimpleTestCase):
+    """Los scripts de benchmarks/ siguen funcionando con el esquema actual (corrida mínima)."""
+
+    def test_planes_consulta(self):
+        raiz = Path(__file__).resolve().parent.parent
+        salida = subprocess.run(
+            [sys.executable, str(raiz / 'benchmarks' / 'planes_consulta.py'),
+             '--productos', '50', '--compras', '50', '--repeticiones', '1'],
+            cwd=raiz, capture_output=True, text=True, timeout=120,
+        )
+        self.assertEqual(salida.returncode, 0, salida.stderr)
+        self.assertIn('ANTES (sin los índices de 0002)', salida.stdout)
+        self.assertIn('USING INDEX producto_nombre_idx', salida.stdout)
+
+
+@override_settings(FRUTERIA_PERFILAMIENTO_ACTIVO=True, FRUTERIA_PERFILAMIENTO_MUESTREO=1.0)
+class PerfilamientoTests(TestCase):
+    """El middleware mide SQL, plantillas y sesión, y detecta consultas repetidas."""
+
+    def setUp(self):
+        cache.clear()
+        perfilamiento.buffer.vaciar()
+        crear_catalogo(3)
+
+    def test_server_timing_y_muestra(self):
+        respuesta = self.client.get(reverse('menu_virtual'))
+        self.assertIn('db;dur=', respuesta['Server-Timing'])
+        self.assertIn('tpl;dur=', respuesta['Server-Timing'])
+        muestra = perfilamiento.buffer.muestras()[-1]
+        self.assertEqual(muestra['vista'], 'menu_virtual')
+        self.assertGreater(muestra['sql_consultas'], 0)
+        self.assertGreater(muestra['plantillas_ms'], 0)
+
+    def test_detecta_repetidas(self):
+        registro = perfilamiento.RegistroSQL()
+        with connection.execute_wrapper(registro):
+            for producto in Producto.objects.all():
+                producto.categoria.nombre # N+1 a propósito
+        self.assertIn(3, registro.repetidas().values())
+
+    def test_resumen_solo_personal(self):
+        self.client.get(reverse('menu_virtual'))
+        self.assertEqual(self.client.get(reverse('resumen_perfilamiento')).status_code, 302)
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+        datos = self.client.get(reverse('resumen_perfilamiento')).json()
+        self.assertIn('menu_virtual', [v['vista'] for v in datos['vistas_mas_lentas']])
+        self.assertTrue(datos['sql_mas_repetido'])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_vistas_async(self):
+        # Bajo ASGI el ORM de las vistas async corre en otro hilo: sus
+        # consultas también se cuentan
+        respuesta = async_to_sync(self.async_client.get)('/menu/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('db;dur=', respuesta['Server-Timing'])
+        muestra = perfilamiento.buffer.muestras()[-1]
+        self.assertEqual(muestra['vista'], 'menu_virtual')
+        self.assertGreater(muestra['sql_consultas'], 0)
+        self.assertGreater(muestra['plantillas_ms'], 0)
+
+        # En una cadena async el middleware es una corrutina (sin pasar por un hilo)
+        async def vista(request):
+            return HttpResponse()
+        self.assertTrue(iscoroutinefunction(perfilamiento.PerfilamientoMiddleware(vista)))
+        self.assertFalse(iscoroutinefunction(perfilamiento.PerfilamientoMiddleware(lambda request: None)))
+
+    @override_settings(FRUTERIA_PERFILAMIENTO_ACTIVO=False)
+    def test_desactivado(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('menu_virtual')))
+
+
+def imagen_png(ancho=1200, alto=900, color=(200, 120, 40)):
+    buffer = BytesIO()
+    Image.new('RGB', (ancho, alto), color).save(buffer, format='PNG')
+    return ContentFile(buffer.getvalue(), name='fruta.png')
+
+
+class DerivadosImagenTests(TestCase):
+    """Al guardar un producto con imagen se generan miniaturas con hash y srcset."""
+
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajuste = override_settings(MEDIA_ROOT=self.media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        self.producto = crear_catalogo(1)[0]
+
+    def variantes(self, producto):
+        return producto.imagen_derivados['variantes']
+
+    def test_genera_al_guardar(self):
+        self.producto.imagen = imagen_png()
+        self.producto.save()
+        guardado = Producto.objects.get(pk=self.producto.pk)
+        jpeg = self.variantes(guardado)['jpg']
+        self.assertEqual([a for a, _ in jpeg], [120, 240, 480, 960])
+        huella = guardado.imagen_derivados['huella']
+        for ancho, nombre in jpeg:
+            self.assertTrue(nombre.startswith('productos/fruta'))
+            self.assertTrue(nombre.endswith(f'-{huella}-{ancho}w.jpg'))
+            with default_storage.open(nombre) as archivo:
+                self.assertEqual(Image.open(archivo).size, (ancho, ancho * 3 // 4))
+
+    def test_no_agranda_ni_regenera(self):
+        self.producto.imagen = imagen_png(200, 100)
+        self.producto.save()
+        self.assertEqual([a for a, _ in self.variantes(self.producto)['jpg']], [120])
+        with mock.patch('app_fruteria.imagenes.Image.open') as abrir:
+            self.producto.save()
+        abrir.assert_not_called()
+
+    def test_cambio_de_imagen_borra_derivados_anteriores(self):
+        self.producto.imagen = imagen_png()
+        self.producto.save()
+        anteriores = [n for _, n in self.variantes(self.producto)['jpg']]
+        self.producto.imagen = imagen_png(color=(10, 200, 10))
+        self.producto.save()
+        self.assertFalse(any(default_storage.exists(n) for n in anteriores))
+
+    def test_srcset_en_menu(self):
+        self.producto.imagen = imagen_png()
+        self.producto.save()
+        html = self.client.get(reverse('menu_virtual')).content.decode()
+        self.assertIn('<picture>', html)
+        self.assertIn('-240w.jpg 240w', html)
+        self.assertIn('sizes="230px"', html)
+        self.assertNotIn(f'src="{self.producto.imagen.url}"', html)
+
+    @override_settings(FRUTERIA_IMAGEN_DERIVADOS_AL_GUARDAR=False)
+    def test_comando_rellena_existentes(self):
+        self.producto.imagen = imagen_png()
+        self.producto.save()
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).imagen_derivados, {})
+        call_command('generar_derivados', verbosity=0)
+        self.assertTrue(self.variantes(Producto.objects.get(pk=self.producto.pk))['jpg'])
+
+
+class ServidorArchivosTests(TestCase):
+    """El servidor de archivos responde con ETag, 304, Range y variantes comprimidas."""
+
+    def setUp(self):
+        self.raiz = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.raiz, ignore_errors=True)
+        self.contenido = b'body { color: green; }\n' * 200
+        with open(os.path.join(self.raiz, 'estilos.0123456789ab.css'), 'wb') as archivo:
+            archivo.write(self.contenido)
+        with open(os.path.join(self.raiz, 'estilos.0123456789ab.css.gz'), 'wb') as archivo:
+            archivo.write(gzip.compress(self.contenido))
+        with open(os.path.join(self.raiz, 'foto.png'), 'wb') as archivo:
+            archivo.write(b'0123456789')
+        self.django = mock.Mock(return_value=[b'django'])
+        self.servidor = ServidorArchivosWSGI(self.django, rutas=[('/static/', os.path.realpath(self.raiz))])
+
+    def pedir(self, ruta, metodo='GET', **cabeceras):
+        environ = {'REQUEST_METHOD': metodo, 'PATH_INFO': ruta}
+        environ.update({'HTTP_' + k.upper(): v for k, v in cabeceras.items()})
+        inicio = {}
+
+        def start_response(estado, lista):
+            inicio['estado'] = int(estado.split()[0])
+            inicio['cabeceras'] = dict(lista)
+
+        cuerpo = b''.join(self.servidor(environ, start_response))
+        return inicio.get('estado'), inicio.get('cabeceras', {}), cuerpo
+
+    def test_hash_es_immutable_y_304(self):
+        estado, cabeceras, cuerpo = self.pedir('/static/estilos.0123456789ab.css')
+        self.assertEqual((estado, cuerpo), (200, self.contenido))
+        self.assertIn('immutable', cabeceras['Cache-Control'])
+        estado, _, cuerpo = self.pedir('/static/estilos.0123456789ab.css', if_none_match=cabeceras['ETag'])
+        self.assertEqual((estado, cuerpo), (304, b''))
+
+    def test_gzip_segun_accept_encoding(self):
+        estado, cabeceras, cuerpo = self.pedir('/static/estilos.0123456789ab.css', accept_encoding='gzip, br')
+        self.assertEqual(cabeceras['Content-Encoding'], 'gzip')
+        self.assertEqual(cabeceras['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(cuerpo), self.contenido)
+        _, cabeceras, _ = self.pedir('/static/estilos.0123456789ab.css', accept_encoding='gzip;q=0')
+        self.assertNotIn('Content-Encoding', cabeceras)
+
+    def test_rangos(self):
+        estado, cabeceras, cuerpo = self.pedir('/static/foto.png', range='bytes=2-4')
+        self.assertEqual((estado, cuerpo, cabeceras['Content-Range']), (206, b'234', 'bytes 2-4/10'))
+        self.assertEqual(self.pedir('/static/foto.png', range='bytes=-3')[2], b'789')
+        self.assertEqual(self.pedir('/static/foto.png', range='bytes=20-')[0], 416)
+        self.assertEqual(self.pedir('/static/foto.png', range='bytes=0-1', if_range='"otro"')[0], 200)
+        self.assertEqual(self.pedir('/static/foto.png')[1]['Cache-Control'], 'public, max-age=60')
+
+    def test_lo_demas_pasa_a_django(self):
+        for ruta in ('/menu/', '/static/no-existe.css', '/static/../foto.png', '/static/'):
+            self.assertEqual(self.pedir(ruta)[2], b'django')
+        self.assertEqual(self.django.call_count, 4)
+
+    def test_collectstatic_genera_hash_y_gzip(self):
+        destino = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, destino, ignore_errors=True)
+        almacenamiento = {
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'app_fruteria.archivos.EstaticosComprimidos'},
+        }
+        with override_settings(STATIC_ROOT=destino, STORAGES=almacenamiento):
+            call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(destino, 'staticfiles.json')) as archivo:
+            manifiesto = json.load(archivo)['paths']
+        css = manifiesto['admin/css/base.css']
+        self.assertRegex(css, r'base\.[0-9a-f]{12}\.css$')
+        self.assertTrue(os.path.exists(os.path.join(destino, css + '.gz')))
+
+
+class PlantillaBaseTests(TestCase):
+    """Las páginas heredan de base.html y traen el CSS/JS como archivos estáticos."""
+
+    def setUp(self):
+        cache.clear()
+        crear_catalogo(3)
+        self.usuario = User.objects.create_user('cliente', password='x')
+        PerfilCliente.objects.create(user=self.usuario, direccion='Calle 2')
+
+    def test_sin_estilos_ni_scripts_en_linea(self):
+        compra = registrar_compra(self.usuario, {Producto.objects.first().pk: 1})
+        anonimas = ['inicio', 'menu_virtual', 'ver_ofertas', 'ver_carrito', 'iniciar_sesion', 'registro']
+        con_sesion = ['perfil', 'confirmar_compra', 'mis_pedidos']
+        paginas = [reverse(nombre) for nombre in anonimas]
+        paginas.append(reverse('categoria', args=[Categoria.objects.get().slug]))
+        for i, url in enumerate(paginas + [reverse(n) for n in con_sesion] + [reverse('orden_confirmada', args=[compra.pk])]):
+            if i == len(paginas):
+                self.client.force_login(self.usuario)
+            with self.subTest(url=url):
+                respuesta = self.client.get(url)
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertTemplateUsed(respuesta, 'app_fruteria/base.html')
+                contenido = respuesta.content.decode()
+                self.assertNotIn('<style', contenido)
+                self.assertNotRegex(contenido, r'<script(?![^>]*\ssrc=)')
+                self.assertIn('app_fruteria/css/base.css', contenido)
+
+    def test_menu_y_mensajes_compartidos(self):
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('menu_virtual'))
+        self.assertTemplateUsed(respuesta, 'app_fruteria/_navegacion.html')
+        self.assertContains(respuesta, f'href="{reverse("mis_pedidos")}"')
+        # Sin menú en el inicio de sesión
+        self.client.logout()
+        respuesta = self.client.post(reverse('iniciar_sesion'), {'username': 'cliente', 'password': 'mal'})
+        self.assertTemplateNotUsed(respuesta, 'app_fruteria/_navegacion.html')
+        self.assertTemplateUsed(respuesta, 'app_fruteria/_mensajes.html')
+
+    def test_collectstatic_con_hash(self):
+        destino = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, destino, ignore_errors=True)
+        almacenamiento = {
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'app_fruteria.archivos.EstaticosComprimidos'},
+        }
+        with override_settings(STATIC_ROOT=destino, STORAGES=almacenamiento, DEBUG=False):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            contenido = self.client.get(reverse('menu_virtual')).content.decode()
+        self.assertRegex(contenido, r'app_fruteria/css/base\.[0-9a-f]{12}\.css')
+        self.assertRegex(contenido, r'app_fruteria/js/catalogo\.[0-9a-f]{12}\.js')
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class VistasAsyncTests(TestCase):
+    """Las vistas async del catálogo y el carrito responden igual que las síncronas."""
+
+    ajax = {'x-requested-with': 'XMLHttpRequest'}
+
+    def setUp(self):
+        cache.clear()
+        self.producto = crear_catalogo(2)[0]
+
+    def test_menu_y_cache(self):
+        # Prueba síncrona para poder contar consultas (el ORM async vuelve a este hilo)
+        pedir = async_to_sync(self.async_client.get)
+        self.assertContains(pedir('/menu/'), self.producto.nombre)
+        # Con el fragmento en caché no hay consultas (anónimo, sin sesión)
+        with self.assertNumQueries(0):
+            respuesta = pedir('/menu/')
+        self.assertContains(respuesta, self.producto.nombre)
+        # Los parámetros que no cambian el catálogo usan el mismo fragmento
+        with self.assertNumQueries(0):
+            pedir('/menu/', {'utm_source': 'boletin', 'orden': 'nombre'})
+
+    async def test_categoria_filtra(self):
+        otra = await Categoria.objects.acreate(nombre='Dulces')
+        await Producto.objects.filter(pk=self.producto.pk).aupdate(categoria=otra)
+        respuesta = await self.async_client.get('/categoria/citricas/')
+        self.assertNotContains(respuesta, self.producto.nombre)
+        self.assertEqual(respuesta.context['categoria'].nombre, 'Cítricas')
+        respuesta = await self.async_client.get('/categoria/dulces/')
+        self.assertContains(respuesta, self.producto.nombre)
+        self.assertEqual((await self.async_client.get('/categoria/verduras/')).status_code, 404)
+        # Un cursor con un valor inválido vuelve a la primera página, con el mismo orden
+        cursor = codificar_cursor('precio', 'NaN', self.producto.pk)
+        respuesta = await self.async_client.get('/categoria/dulces/', {'orden': 'precio', 'cursor': cursor})
+        self.assertRedirects(respuesta, '/categoria/dulces/?orden=precio', fetch_redirect_response=False)
+
+    async def test_ofertas(self):
+        # Las ofertas vigentes se cargan con el ORM async antes de armar la consulta
+        ofertas._memoria.clear()
+        respuesta = await self.async_client.get(reverse('ver_ofertas'))
+        self.assertContains(respuesta, self.producto.nombre)
+
+    async def test_flujo_carrito(self):
+        for backend in AlmacenesCarritoTests.backends.values():
+            with self.subTest(backend=backend), override_settings(FRUTERIA_CARRITO_BACKEND=backend):
+                self.async_client = self.async_client_class()
+                agregar = reverse('agregar_al_carrito', args=[self.producto.pk])
+                await self.async_client.get(agregar, headers=self.ajax)
+                datos = (await self.async_client.get(
+                    reverse('ajustar_cantidad', args=[self.producto.pk, 'aumentar']), headers=self.ajax
+                )).json()
+                self.assertEqual(datos['new_quantity'], 2)
+                self.assertEqual(Decimal(datos['new_total_final']), Decimal('76.00'))
+
+                respuesta = await self.async_client.get(reverse('ver_carrito'))
+                self.assertEqual(respuesta.context['carrito_items'][0].cantidad, 2)
+
+                await self.async_client.get(reverse('eliminar_item_carrito', args=[self.producto.pk]), headers=self.ajax)
+                respuesta = await self.async_client.get(reverse('ver_carrito'))
+                self.assertEqual(respuesta.context['carrito_items'], [])
+
+    async def test_lote(self):
+        respuesta = await self.async_client.post(
+            reverse('actualizar_carrito_lote'), content_type='application/json',
+            data={'operaciones': [{'op': 'agregar', 'producto': self.producto.pk, 'cantidad': 3}]},
+        )
+        self.assertEqual(respuesta.json()['lineas'][str(self.producto.pk)]['cantidad'], 3)
+
+    async def test_pagina_y_detalle(self):
+        with mock.patch('app_fruteria.views.POR_PAGINA', 1):
+            respuesta = await self.async_client.get(reverse('menu_virtual'))
+            siguiente = html.unescape(re.search(r'data-siguiente="([^"]+)"', respuesta.content.decode()).group(1))
+            fragmento = await self.async_client.get(siguiente)
+        self.assertContains(fragmento, 'Fruta 0001')
+        self.assertNotContains(fragmento, 'data-siguiente')
+        detalle = await self.async_client.get(reverse('detalle_producto', args=[self.producto.pk]))
+        self.assertContains(detalle, self.producto.nombre)
+
+    async def test_producto_inexistente(self):
+        respuesta = await self.async_client.get(reverse('agregar_al_carrito', args=[999999]))
+        self.assertEqual(respuesta.status_code, 404)
+
+    def test_middleware_async(self):
+        async def vista(request):
+            pass
+        self.assertTrue(asyncio.iscoroutinefunction(CarritoMiddleware(vista)))
+        self.assertFalse(asyncio.iscoroutinefunction(CarritoMiddleware(lambda request: None)))
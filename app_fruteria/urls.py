@@ -1,36 +1,68 @@
 # tienda/urls.py
 
+from django.conf import settings
 from django.urls import path
+from django.views.generic import RedirectView
 from . import views # Importa las funciones de lógica (Vistas) que crearemos
+from . import views_async
+from . import api
 
-urlpatterns = [
-    # HOME / LANDING PAGE
-    path('', views.index, name='inicio'), 
-    
-    # MENÚS Y CATÁLOGOS
-    path('menu/', views.menu_virtual, name='menu_virtual'), 
-    path('citricas/', views.frutas_citricas, name='frutas_citricas'), 
-    path('dulces/', views.frutas_dulces, name='frutas_dulces'),
-    path('neutras/', views.frutas_neutras, name='frutas_neutras'),
-    path('ofertas/', views.ver_ofertas, name='ver_ofertas'),
-    
-    # AUTENTICACIÓN
-    path('registro/', views.registro_usuario, name='registro'),
-    path('iniciar-sesion/', views.iniciar_sesion, name='iniciar_sesion'),
-    path('perfil/', views.perfil_usuario, name='perfil'),
-    path('cerrar-sesion/', views.cerrar_sesion, name='cerrar_sesion'),
-
-    path('compra/', views.confirmar_compra, name='compra'),
-    
-    # CARRITO Y COMPRA
-    path('carrito/', views.ver_carrito, name='ver_carrito'),
-    path('comprar/', views.confirmar_compra, name='confirmar_compra'),
-    path('agregar-carrito/<int:producto_id>/', views.agregar_al_carrito, name='agregar_al_carrito'),
-    path('eliminar-carrito/<int:producto_id>/', views.eliminar_item_carrito, name='eliminar_item_carrito'),
-    path('ajustar-cantidad/<int:producto_id>/<str:accion>/', views.ajustar_cantidad, name='ajustar_cantidad'),
-    
-    # ACCIONES (Estas no muestran páginas completas, solo procesan datos)
-    path('agregar-carrito/<int:producto_id>/', views.agregar_al_carrito, name='agregar_al_carrito'),
-
-    path('orden-confirmada/<int:pedido_id>/', views.orden_confirmada, name='orden_confirmada'),
-]
\ No newline at end of file
+
+def construir_urlpatterns(asincronas=False):
+    """
+    Con `asincronas` el catálogo y el carrito usan views_async (ASGI); el
+    resto de las páginas son las mismas vistas síncronas.
+    """
+    v = views_async if asincronas else views
+    return [
+        # HOME / LANDING PAGE
+        path('', views.index, name='inicio'), 
+        
+        # MENÚS Y CATÁLOGOS
+        path('menu/', v.menu_virtual, name='menu_virtual'), 
+        path('categoria/<slug:slug>/', v.ver_categoria, name='categoria'),
+        path('ofertas/', v.ver_ofertas, name='ver_ofertas'),
+        path('buscar/', v.buscar_productos, name='buscar_productos'),
+        path('catalogo/<slug:seccion>/pagina/', v.pagina_catalogo, name='pagina_catalogo'),
+        path('producto/<int:producto_id>/detalle/', v.detalle_producto, name='detalle_producto'),
+        # Rutas anteriores de las categorías (enlaces guardados)
+        *[
+            path(f'{slug}/', RedirectView.as_view(pattern_name='categoria', permanent=True, query_string=True),
+                 {'slug': slug})
+            for slug in ('citricas', 'dulces', 'neutras')
+        ],
+        path('catalogo/cache/', views.estadisticas_cache, name='estadisticas_cache'),
+        path('perfilamiento/', views.resumen_perfilamiento, name='resumen_perfilamiento'),
+        
+        # AUTENTICACIÓN
+        path('registro/', views.registro_usuario, name='registro'),
+        path('iniciar-sesion/', views.iniciar_sesion, name='iniciar_sesion'),
+        path('perfil/', views.perfil_usuario, name='perfil'),
+        path('cerrar-sesion/', views.cerrar_sesion, name='cerrar_sesion'),
+
+        path('compra/', views.confirmar_compra, name='compra'),
+        
+        # CARRITO Y COMPRA
+        path('carrito/', v.ver_carrito, name='ver_carrito'),
+        path('comprar/', views.confirmar_compra, name='confirmar_compra'),
+        path('agregar-carrito/<int:producto_id>/', v.agregar_al_carrito, name='agregar_al_carrito'),
+        path('eliminar-carrito/<int:producto_id>/', v.eliminar_item_carrito, name='eliminar_item_carrito'),
+        path('ajustar-cantidad/<int:producto_id>/<str:accion>/', v.ajustar_cantidad, name='ajustar_cantidad'),
+        path('carrito/lote/', v.actualizar_carrito_lote, name='actualizar_carrito_lote'),
+        
+        # ACCIONES (Estas no muestran páginas completas, solo procesan datos)
+        path('agregar-carrito/<int:producto_id>/', v.agregar_al_carrito, name='agregar_al_carrito'),
+
+        path('orden-confirmada/<int:pedido_id>/', views.orden_confirmada, name='orden_confirmada'),
+        path('mis-pedidos/', views.mis_pedidos, name='mis_pedidos'),
+
+        # API JSON DEL CATÁLOGO (solo lectura, ver api.py)
+        path('api/productos/', api.productos, name='api_productos'),
+        path('api/productos/<int:producto_id>/', api.producto, name='api_producto'),
+        path('api/categorias/', api.categorias, name='api_categorias'),
+        path('api/ofertas/', api.ofertas, name='api_ofertas'),
+        path('api/buscar/', api.buscar, name='api_buscar'),
+    ]
+
+
+urlpatterns = construir_urlpatterns(getattr(settings, 'FRUTERIA_VISTAS_ASYNC', False))
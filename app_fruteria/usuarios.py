@@ -0,0 +1,71 @@
+# app_fruteria/usuarios.py
+"""
+Usuario de la sesión (con su PerfilCliente) en caché.
+
+Con sesión iniciada, cada petición pasa por
+`EmailOrUsernameBackend.get_user()`; sin caché eso es un SELECT a auth_user
+en cada página, más otro a perfilcliente en las que muestran la dirección
+(perfil, compra). Aquí se lee una sola vez con
+``select_related('perfilcliente')`` y se guarda en la caché compartida por
+id de usuario, así ``request.user.perfilcliente`` ya no consulta la BD.
+
+Lo guardado es un `UsuarioSesion` (proxy de User) sin el hash de la
+contraseña: la caché puede ser compartida (Redis, memcached) y no debe
+guardar credenciales. Solo lleva el HMAC con el que Django verifica la
+sesión, que es lo mismo que ya va en la sesión.
+
+`signals.py` borra la entrada al guardar o borrar un User o su
+PerfilCliente (incluye cambio de contraseña y el ``last_login`` de cada
+inicio de sesión), de inmediato y otra vez al confirmarse la transacción.
+Con una caché por proceso (LocMem), los demás procesos lo ven cuando pasa
+FRUTERIA_USUARIO_SEGUNDOS; por eso es corto: de eso depende cuánto tarda
+en cerrarse la sesión en otro worker tras cambiar la contraseña.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import UsuarioSesion
+
+# Segundos que vive el usuario en la caché si no se guarda antes
+TIEMPO_VIDA = getattr(settings, 'FRUTERIA_USUARIO_SEGUNDOS', 60)
+
+
+def clave(user_id):
+    return f'usuario:{user_id}'
+
+
+def _consulta(user_id):
+    return UsuarioSesion.objects.select_related('perfilcliente').filter(pk=user_id)
+
+
+def obtener(user_id):
+    """El User `user_id` con su perfil ya cargado; None si no existe."""
+    usuario = cache.get(clave(user_id))
+    if usuario is None:
+        usuario = _consulta(user_id).first()
+        if usuario is not None:
+            usuario.sin_contrasena()
+            cache.set(clave(user_id), usuario, TIEMPO_VIDA)
+    return usuario
+
+
+async def aobtener(user_id):
+    """Como `obtener()` con el ORM async (``request.auser()`` bajo ASGI)."""
+    usuario = await cache.aget(clave(user_id))
+    if usuario is None:
+        usuario = await _consulta(user_id).afirst()
+        if usuario is not None:
+            usuario.sin_contrasena()
+            await cache.aset(clave(user_id), usuario, TIEMPO_VIDA)
+    return usuario
+
+
+def invalidar(user_id):
+    """
+    El usuario o su perfil cambiaron. Se borra ya y otra vez al confirmar:
+    una petición que lo leyó antes del COMMIT podría haber guardado la
+    versión anterior.
+    """
+    cache.delete(clave(user_id))
+    transaction.on_commit(lambda: cache.delete(clave(user_id)))
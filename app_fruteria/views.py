@@ -2,16 +2,36 @@
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth import login, logout
 from django.contrib import messages 
 from django.contrib.auth.forms import AuthenticationForm
-import datetime 
 from decimal import Decimal # Importado una sola vez
 from .forms import RegistroClienteForm
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_POST
+import json
 from django.db.models import Q 
 from django.utils import timezone # Necesario para la fecha de compra
 import decimal
+from . import busqueda
+from . import cache as cache_catalogo
+from . import categorias
+from . import perfilamiento
+from .carrito import (
+    OperacionInvalida,
+    aplicar_lote,
+    datos_producto_carrito,
+    datos_productos_carrito,
+    hidratar_carrito,
+    normalizar_operaciones,
+    productos_por_consultar,
+)
+from .dinero import a_decimal, costo_envio_centavos
+from .paginacion import ORDENES_PEDIDOS, CursorInvalido, Pagina
+from .pedidos import PedidoInvalido, PreciosCambiados, registrar_compra
 
 # ====================================================================
 # --- CORREGIDO: Importación de Modelos Limpia ---
@@ -23,94 +43,170 @@ from .models import (
     Categoria, 
     Oferta, 
     PerfilCliente, 
-    Sucursal,
     Compra,
-    DetalleCompra
 )
 
 # --------------------------------------------------------------------------
 # A. VISTAS DEL CATÁLOGO Y HOME
 # --------------------------------------------------------------------------
 
+# Valores permitidos para ?orden= en las páginas del catálogo
+ORDENES_CATALOGO = {
+    'nombre': ('nombre',),
+    'precio': ('precio_efectivo', 'nombre'),
+    '-precio': ('-precio_efectivo', 'nombre'),
+}
+
+# Productos por página en el menú y las categorías (el resto llega con scroll)
+POR_PAGINA = getattr(settings, 'FRUTERIA_CATALOGO_POR_PAGINA', 24)
+
+# Sección del scroll infinito con todo el catálogo; las demás son slugs de categoría
+SECCION_MENU = 'menu'
+
+# Pedidos por página en "mis pedidos"
+PEDIDOS_POR_PAGINA = getattr(settings, 'FRUTERIA_PEDIDOS_POR_PAGINA', 20)
+
+def _filtrar_precio_max(request, productos):
+    precio_max = request.GET.get('precio_max')
+    if precio_max:
+        try:
+            limite = Decimal(precio_max)
+        except decimal.InvalidOperation:
+            return productos # Ignoramos valores no numéricos
+        # NaN, sNaN e Infinity se aceptan como Decimal pero no sirven de filtro
+        if limite.is_finite():
+            productos = productos.filter(precio_efectivo__lte=limite)
+    return productos
+
+
+def _aplicar_filtros_precio(request, productos):
+    """
+    Aplica ?orden=precio|-precio|nombre y ?precio_max=N sobre un queryset
+    anotado con `with_precio_final()`. Todo se resuelve en la misma consulta SQL.
+    """
+    orden = ORDENES_CATALOGO.get(request.GET.get('orden'), ORDENES_CATALOGO['nombre'])
+    return _filtrar_precio_max(request, productos.order_by(*orden))
+
+
+def _categoria_seccion(seccion, mapa):
+    """
+    Categoría (InfoCategoria) de la sección, o None para todo el menú.
+    `mapa` es el de categorias.py; un slug que no existe da 404.
+    """
+    if seccion == SECCION_MENU:
+        return None
+    categoria = mapa.por_slug.get(seccion)
+    if categoria is None:
+        raise Http404("Categoría no encontrada")
+    return categoria
+
+
+def _pagina_catalogo(request, categoria=None):
+    """
+    Una página (POR_PAGINA productos) del menú o de la `categoria`, según
+    ?orden=, ?precio_max= y ?cursor=. Es perezosa: si el fragmento está en
+    caché no se consulta la BD. Lanza CursorInvalido si el cursor no sirve.
+    """
+    productos = Producto.objects.catalogo()
+    if categoria:
+        # Por id (índice categoria_id, nombre), sin JOIN con la tabla de categorías
+        productos = productos.filter(categoria_id=categoria.id)
+    orden = request.GET.get('orden')
+    if orden not in ORDENES_CATALOGO:
+        orden = 'nombre'
+    return Pagina(
+        _filtrar_precio_max(request, productos), orden, request.GET.get('cursor'), POR_PAGINA,
+        parametros=cache_catalogo.parametros_catalogo(request.GET),
+    )
+
+
 def index(request):
     """
     Vista para la página principal (index.html).
     """
-    productos_destacados = Producto.objects.all().order_by('-id')[:3] 
+    productos_destacados = Producto.objects.catalogo().order_by('-id')[:3] 
     
     contexto = {
         'productos_destacados': productos_destacados
     }
     return render(request, 'app_fruteria/index.html', contexto)
 
+def _primera_pagina(request):
+    """URL de la primera página con los mismos filtros (?orden=, ?precio_max=), sin el cursor."""
+    parametros = request.GET.copy()
+    parametros.pop('cursor', None)
+    return f'{request.path}?{parametros.urlencode()}' if parametros else request.path
+
+def _seccion_catalogo(request, seccion, plantilla, categoria=None, contexto=None):
+    """Primera página (o la del ?cursor=) de una sección; el resto llega por pagina_catalogo."""
+    try:
+        pagina = _pagina_catalogo(request, categoria)
+    except CursorInvalido:
+        return redirect(_primera_pagina(request))
+    contexto = {
+        **(contexto or {}),
+        'lista_productos': pagina,
+        'seccion': seccion,
+        'fragmento_catalogo': seccion if categoria is None else f'categoria-{seccion}',
+    }
+    return render(request, plantilla, contexto)
+
+@ensure_csrf_cookie
 def menu_virtual(request):
     """
     Muestra el catálogo completo de productos (menu.html).
     """
-    productos = Producto.objects.all().order_by('nombre')
-    
-    contexto = {
-        'lista_productos': productos
-    }
-    return render(request, 'app_fruteria/menu.html', contexto)
+    return _seccion_catalogo(request, SECCION_MENU, 'app_fruteria/menu.html')
 
-def frutas_citricas(request):
+@ensure_csrf_cookie
+def ver_categoria(request, slug):
     """
-    Muestra solo las frutas de la categoría 'Cítricas' (citricas.html).
+    Productos de una categoría (categoria.html), por su slug: /categoria/citricas/.
+    Las categorías salen de la tabla; agregar una no requiere vista ni plantilla.
     """
-    try:
-        productos = Producto.objects.filter(categoria__nombre='Cítricas').order_by('nombre')
-    except:
-        productos = Producto.objects.none()
-
-    contexto = {
-        'lista_productos': productos,
-        'nombre_seccion': 'Frutas Cítricas'
-    }
-    return render(request, 'app_fruteria/citricas.html', contexto)
-
-def frutas_dulces(request):
+    categoria = categorias.por_slug(slug)
+    if categoria is None:
+        raise Http404("Categoría no encontrada")
+    return _seccion_catalogo(
+        request, slug, 'app_fruteria/categoria.html', categoria, {'categoria': categoria}
+    )
+
+def pagina_catalogo(request, seccion):
     """
-    Muestra solo las frutas de la categoría 'Dulces' (dulces.html).
+    Tarjetas de la página siguiente (fragmento HTML) para el scroll infinito.
+    La página incluye al final el enlace a la que sigue.
     """
+    categoria = _categoria_seccion(seccion, categorias.cargar())
     try:
-        productos = Producto.objects.filter(categoria__nombre='Dulces').order_by('nombre')
-    except:
-        productos = Producto.objects.none() 
-
+        pagina = _pagina_catalogo(request, categoria)
+    except CursorInvalido as e:
+        return HttpResponseBadRequest(str(e))
     contexto = {
-        'lista_productos': productos,
-        'nombre_seccion': 'Frutas Dulces'
+        'lista_productos': pagina,
+        'seccion': seccion,
+        'fragmento_catalogo': f'pagina-{seccion}',
     }
-    return render(request, 'app_fruteria/dulces.html', contexto)
+    return render(request, 'app_fruteria/_pagina_catalogo.html', contexto)
 
-def frutas_neutras(request):
+def detalle_producto(request, producto_id):
     """
-    Muestra solo las frutas de la categoría 'Neutras' (neutras.html).
+    Contenido del modal "Ver más"; se pide al abrirlo en lugar de renderizar
+    un modal por cada producto de la página.
     """
-    try:
-        productos = Producto.objects.filter(categoria__nombre='Neutras').order_by('nombre')
-    except:
-        productos = Producto.objects.none() 
-
-    contexto = {
-        'lista_productos': productos,
-        'nombre_seccion': 'Frutas Neutras'
-    }
-    return render(request, 'app_fruteria/neutras.html', contexto)
+    producto = get_object_or_404(Producto.objects.catalogo(), pk=producto_id)
+    return render(request, 'app_fruteria/_detalle_producto.html', {'producto': producto})
 
+@ensure_csrf_cookie
 def ver_ofertas(request):
     """
     Muestra todos los productos que están asignados a ofertas activas y vigentes.
     """
-    hoy = datetime.date.today()
+    hoy = timezone.localdate()
     
     
-    lista_productos_oferta = Producto.objects.filter(
-        oferta__isnull=False,
-        oferta__fecha_inicio__lte=hoy, 
-        oferta__fecha_fin__gte=hoy
-    ).order_by('nombre')
+    lista_productos_oferta = _aplicar_filtros_precio(
+        request, Producto.objects.catalogo(hoy).en_oferta(hoy)
+    )
 
     contexto = {
         'lista_productos': lista_productos_oferta, 
@@ -121,6 +217,45 @@ def ver_ofertas(request):
     return render(request, 'app_fruteria/ofertas.html', contexto)
 
 
+@ensure_csrf_cookie
+def buscar_productos(request):
+    """
+    Resultados de la búsqueda (?q=) en la plantilla del menú, del más al menos
+    relevante (ver busqueda.py).
+    """
+    texto = request.GET.get('q', '').strip()
+    productos = busqueda.ordenar_por_ids(Producto.objects.catalogo(), busqueda.buscar(texto))
+
+    contexto = {
+        'lista_productos': productos,
+        'busqueda': texto,
+        'fragmento_catalogo': 'busqueda',
+        'mensaje_vacio': f'No encontramos productos para “{texto}”.',
+    }
+    return render(request, 'app_fruteria/menu.html', contexto)
+
+
+@staff_member_required
+def estadisticas_cache(request):
+    """
+    Aciertos/fallos de la caché del catálogo (solo personal).
+    """
+    return JsonResponse(cache_catalogo.estadisticas())
+
+
+@staff_member_required
+def resumen_perfilamiento(request):
+    """
+    Vistas más lentas y SQL más repetido según las muestras del
+    PerfilamientoMiddleware (solo personal).
+    """
+    try:
+        limite = int(request.GET.get('limite', 20))
+    except ValueError:
+        limite = 20
+    return JsonResponse(perfilamiento.resumen(limite), json_dumps_params={'ensure_ascii': False})
+
+
 # --------------------------------------------------------------------------
 # B. VISTAS DE AUTENTICACIÓN
 # --------------------------------------------------------------------------
@@ -166,16 +301,11 @@ def iniciar_sesion(request):
         form = AuthenticationForm(request, data=request.POST)
         
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(username=username, password=password)
-            
-            if user is not None:
-                login(request, user)
-                messages.success(request, f'¡Bienvenido de nuevo! Sesión iniciada.')
-                return redirect(request.POST.get('next') or 'menu_virtual')
-            else:
-                messages.error(request, 'Usuario o contraseña incorrectos.')
+            # El formulario ya llamó a authenticate() al validar: se usa ese
+            # usuario en lugar de verificar la contraseña (PBKDF2) otra vez
+            login(request, form.get_user())
+            messages.success(request, f'¡Bienvenido de nuevo! Sesión iniciada.')
+            return redirect(request.POST.get('next') or 'menu_virtual')
         else:
             messages.error(request, 'Usuario o contraseña incorrectos.')
 
@@ -193,15 +323,13 @@ def perfil_usuario(request):
     Muestra y actualiza la información del perfil del usuario (perfil.html).
     """
     
-    # Obtenemos el usuario y su perfil
+    # Obtenemos el usuario y su perfil (ya viene cargado con el usuario, ver usuarios.py)
     usuario = request.user
     try:
-        # Aseguramos que el perfil se cree si no existe
-        perfil, created = PerfilCliente.objects.get_or_create(user=usuario)
+        perfil = usuario.perfilcliente
     except PerfilCliente.DoesNotExist:
-        # Esto es un fallback, pero get_or_create debería manejarlo
-        messages.error(request, 'Error crítico al cargar tu perfil.')
-        return redirect('inicio')
+        # Aseguramos que el perfil se cree si no existe
+        perfil = PerfilCliente.objects.create(user=usuario)
 
     # --- Lógica de ACTUALIZACIÓN (POST) ---
     if request.method == 'POST':
@@ -252,28 +380,19 @@ def agregar_al_carrito(request, producto_id):
     """ 
     Añade un producto al carrito, aplicando el precio final (con descuento).
     """
-    producto = get_object_or_404(Producto, pk=producto_id)
-    carrito = request.session.get('carrito', {})
-    producto_id_str = str(producto_id)
+    # (nombre, precio final en centavos); sale de la caché del catálogo
+    # cuando está disponible, así que normalmente no toca la BD.
+    return _respuesta_agregado(request, producto_id, datos_producto_carrito(producto_id))
+
+def _respuesta_agregado(request, producto_id, datos):
+    """Parte común (sin E/S) de agregar_al_carrito y su versión async."""
+    if datos is None:
+        raise Http404('Producto no encontrado')
+    nombre_producto, precio_centavos = datos
     
-    # Usamos el .precio_final (que ya calcula la oferta en models.py)
-    precio_a_guardar = str(producto.precio_final)
+    cantidad_actual = request.carrito.agregar(producto_id, precio_centavos)
     
-    if producto_id_str in carrito:
-        carrito[producto_id_str]['cantidad'] += 1
-        cantidad_actual = carrito[producto_id_str]["cantidad"]
-        carrito[producto_id_str]['precio'] = precio_a_guardar 
-    else:
-        carrito[producto_id_str] = {
-            'cantidad': 1,
-            'precio': precio_a_guardar
-        }
-        cantidad_actual = 1
-        
-    request.session['carrito'] = carrito
-    request.session.modified = True 
-    
-    mensaje = f'✅ ¡{producto.nombre} añadido! Cantidad total: {cantidad_actual} kg.'
+    mensaje = f'✅ ¡{nombre_producto} añadido! Cantidad total: {cantidad_actual} kg.'
     
     if request.headers.get('x-requested-with') == 'XMLHttpRequest': 
         return JsonResponse({ 
@@ -284,92 +403,122 @@ def agregar_al_carrito(request, producto_id):
     messages.success(request, mensaje)
     return redirect(request.META.get('HTTP_REFERER') or 'menu_virtual')
 
+@require_POST
+def actualizar_carrito_lote(request):
+    """
+    Aplica en una sola petición varias operaciones sobre el carrito y
+    devuelve los totales nuevos. Cuerpo JSON::
+
+        {"operaciones": [{"op": "agregar", "producto": 3, "cantidad": 2},
+                         {"op": "fijar", "producto": 5, "cantidad": 4},
+                         {"op": "eliminar", "producto": 8}]}
+
+    O se aplican todas o ninguna; el carrito se guarda una sola vez.
+    """
+    try:
+        operaciones = _leer_lote(request)
+        datos = datos_productos_carrito(productos_por_consultar(request.carrito, operaciones))
+        return _respuesta_lote(request, operaciones, datos)
+    except OperacionInvalida as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+def _leer_lote(request):
+    try:
+        cuerpo = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        raise OperacionInvalida('JSON inválido.')
+    return normalizar_operaciones(cuerpo.get('operaciones') if isinstance(cuerpo, dict) else None)
+
+def _respuesta_lote(request, operaciones, datos):
+    """Parte común (sin E/S) de actualizar_carrito_lote y su versión async."""
+    carrito = request.carrito
+    aplicar_lote(carrito, operaciones, datos)
+
+    agregados = {pid for tipo, pid, _ in operaciones if tipo == 'agregar'}
+    if len(operaciones) == 1 and len(agregados) == 1:
+        pid = agregados.pop()
+        mensaje = f'✅ ¡{datos[pid][0]} añadido! Cantidad total: {carrito.cantidad(pid)} kg.'
+    elif agregados and all(tipo == 'agregar' for tipo, _, _ in operaciones):
+        mensaje = f'✅ ¡{len(agregados)} productos añadidos a tu carrito!'
+    else:
+        mensaje = 'Carrito actualizado.'
+
+    totals = _get_cart_totals(carrito)
+    return JsonResponse({
+        'success': True,
+        'message': mensaje,
+        'lineas': {
+            id_str: {'cantidad': cantidad, 'subtotal': a_decimal(cantidad * centavos)}
+            for id_str, (cantidad, centavos) in carrito.lineas.items()
+        },
+        'new_subtotal': totals['subtotal'],
+        'new_total_final': totals['total_final'],
+    })
+
+@ensure_csrf_cookie
 def ver_carrito(request):
     """
     Muestra los productos en el carrito (carrito.html) y calcula totales.
     """
-    carrito = request.session.get('carrito', {})
-    carrito_items = []
-    
-    # --- CORREGIDO: Usamos Decimal para todo el dinero ---
-    total_general = Decimal('0.00')
-    costo_envio = Decimal('40.00')
-    
-    for id_str, data in carrito.copy().items():
-        try:
-            producto = Producto.objects.get(pk=int(id_str))
-            cantidad = int(data.get('cantidad', 0))
-            precio = Decimal(data.get('precio', 0)) # Convertimos a Decimal
-            
-            subtotal = cantidad * precio
-            total_general += subtotal
-            
-            carrito_items.append({
-                'producto': producto,
-                'cantidad': cantidad,
-                'subtotal': subtotal,
-                'precio_unitario': precio, 
-            })
-            
-        except (Producto.DoesNotExist, ValueError, TypeError, decimal.InvalidOperation):
-            # Si el producto no existe o el precio está corrupto, lo borramos
-            del carrito[id_str]
-            request.session.modified = True
-            messages.error(request, f"Error al leer un producto ID {id_str}. Eliminado del carrito.")
-
-    request.session['carrito'] = carrito
-
-    total_final = total_general + costo_envio if total_general > 0 else Decimal('0.00')
+    # Una sola consulta para todos los productos del carrito
+    hidratado = hidratar_carrito(request.carrito.lineas)
+    return render(request, 'app_fruteria/carrito.html', _contexto_carrito(request, hidratado))
+
+def _actualizar_precios(request, hidratado):
+    """El carrito guarda los precios vigentes y se avisa de los que cambiaron."""
+    if not hidratado.cambiados:
+        return
+    request.carrito.actualizar_precios(hidratado.cambiados)
+    for linea in hidratado.lineas:
+        if str(linea.producto.id) in hidratado.cambiados:
+            messages.warning(request, f'El precio de {linea.producto.nombre} cambió: ahora ${linea.precio_unitario}.')
+
+def _contexto_carrito(request, hidratado):
+    """Parte común (sin E/S) de ver_carrito y su versión async."""
+    # Si el producto ya no existe, lo borramos
+    for id_str in hidratado.obsoletos:
+        request.carrito.eliminar(id_str)
+        messages.error(request, f"Error al leer un producto ID {id_str}. Eliminado del carrito.")
+    _actualizar_precios(request, hidratado)
+
+    # Sumas en centavos enteros; Decimal solo para la plantilla
+    totales = hidratado.totales()
 
-    contexto = {
-        'carrito_items': carrito_items,
-        'total_general': total_general,
-        'costo_envio': costo_envio,
-        'total_final': total_final, 
+    return {
+        'carrito_items': hidratado.lineas,
+        'total_general': totales.subtotal,
+        'costo_envio': a_decimal(costo_envio_centavos()),
+        'total_final': totales.total, 
     }
-    
-    return render(request, 'app_fruteria/carrito.html', contexto)
 
 # en app_fruteria/views.py
 
-def _get_cart_totals(carrito_session):
+def _get_cart_totals(carrito):
     """
     Función de ayuda para recalcular los totales del carrito.
     """
-    total_general = Decimal('0.00')
-    costo_envio = Decimal('40.00') # Coincide con tu carrito.html
-    
-    for id_str, data in carrito_session.items():
-        try:
-            # No necesitamos golpear la BD, solo usamos los datos de la sesión
-            cantidad = int(data.get('cantidad', 0))
-            precio = Decimal(data.get('precio', 0))
-            total_general += cantidad * precio
-        except Exception:
-            continue # Omitir items malformados
-
-    total_final = total_general + costo_envio if total_general > 0 else Decimal('0.00')
+    # No necesitamos golpear la BD, solo usamos los datos del carrito
+    totales = carrito.totales()
     
     return {
-        'subtotal': total_general,
-        'total_final': total_final,
+        'subtotal': totales.subtotal,
+        'total_final': totales.total,
     }
 
 # en app_fruteria/views.py
 
 def ajustar_cantidad(request, producto_id, accion):
     
-    carrito = request.session.get('carrito', {})
-    producto_id_str = str(producto_id)
+    carrito = request.carrito
     mensaje = "Error"
     success = False
     
     new_quantity = 0
-    new_item_subtotal = Decimal('0.00')
+    new_item_subtotal = a_decimal(0)
 
-    if producto_id_str in carrito:
-        cantidad_actual = carrito[producto_id_str]['cantidad']
-        precio_guardado = Decimal(carrito[producto_id_str]['precio']) 
+    if producto_id in carrito:
+        cantidad_actual = carrito.cantidad(producto_id)
+        precio_centavos = carrito.precio_centavos(producto_id)
         
         if accion == 'aumentar':
             new_quantity = cantidad_actual + 1
@@ -388,12 +537,10 @@ def ajustar_cantidad(request, producto_id, accion):
                 success = False # No fue un éxito 'total', pero no es un error
         
         if success:
-            carrito[producto_id_str]['cantidad'] = new_quantity
-            request.session['carrito'] = carrito
-            request.session.modified = True 
+            carrito.fijar_cantidad(producto_id, new_quantity)
         
         # Calculamos el nuevo subtotal para ESE item
-        new_item_subtotal = precio_guardado * new_quantity
+        new_item_subtotal = a_decimal(precio_centavos * new_quantity)
     
     # --- LÓGICA DE RESPUESTA INTELIGENTE ---
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
@@ -425,7 +572,7 @@ def ajustar_cantidad(request, producto_id, accion):
 # ====================================================================
 # --- FUNCIÓN TOTALMENTE CORREGIDA ---
 # Esta es la función que estaba mal.
-# Ahora usa Compra, DetalleCompra y Sucursal, como lo pide tu db.sqlite3
+# La compra (Compra + DetalleCompra) la registra pedidos.registrar_compra
 # ====================================================================
 
 # en app_fruteria/views.py
@@ -434,12 +581,13 @@ def ajustar_cantidad(request, producto_id, accion):
 def confirmar_compra(request):
     
     # --- Parte 1: Obtener carrito y perfil (para GET y POST) ---
+    # El perfil viene con el usuario de la sesión (usuarios.py): sin consulta
     try:
         perfil_usuario = request.user.perfilcliente
     except PerfilCliente.DoesNotExist:
         perfil_usuario = None 
 
-    carrito_session = request.session.get('carrito', {})
+    carrito = request.carrito
     
     # --- Parte 2: Lógica de PROCESAR PAGO (cuando se presiona "PAGAR") ---
     if request.method == 'POST':
@@ -452,7 +600,7 @@ def confirmar_compra(request):
             return redirect('confirmar_compra')
 
         # B. Validación de Carrito y Perfil
-        if not carrito_session:
+        if not carrito:
             messages.error(request, 'Tu carrito está vacío.')
             return redirect('menu_virtual')
         
@@ -463,56 +611,36 @@ def confirmar_compra(request):
 
         # C. ¡GUARDAR EN LA BASE DE DATOS (Forma correcta)!
         try:
-            # ... (El resto de tu lógica de guardado de Compra se queda igual) ...
-            
-            # 1. Recalculamos el total y preparamos los items
-            subtotal_pedido = Decimal('0.00')
-            items_para_guardar = []
-            
-            for producto_id, item_data in carrito_session.items():
-                producto = Producto.objects.get(id=producto_id)
-                cantidad_real = int(item_data['cantidad'])
-                precio_unitario = Decimal(item_data['precio'])
-                
-                subtotal_item = precio_unitario * cantidad_real
-                subtotal_pedido += subtotal_item
-                
-                items_para_guardar.append({
-                    'producto': producto,
-                    'cantidad': cantidad_real,
-                    'precio_unitario': precio_unitario
-                })
-
-            # 2. Asignamos la Sucursal
-            sucursal_asignada = Sucursal.objects.first()
-            if not sucursal_asignada:
-                messages.error(request, 'Error del sistema: No hay sucursales configuradas.')
-                return redirect('confirmar_compra')
-
-            # 3. Crear el objeto Compra
-            nueva_compra = Compra.objects.create(
-                cliente=request.user,
-                fecha_compra=timezone.now(),
-                total_compra=subtotal_pedido,
-                estado="Pagado",
-                sucursal=sucursal_asignada
-            )
+            # Compra + todos los DetalleCompra en una sola transacción; los
+            # precios se vuelven a leer de la BD dentro del servicio.
+            cantidades = {
+                producto_id: cantidad
+                for producto_id, (cantidad, _centavos) in carrito.lineas.items()
+            }
+            # Se cobra lo que se mostró: si un precio cambió desde el
+            # resumen, no se registra y el cliente vuelve a verlo
+            precios = {
+                producto_id: centavos
+                for producto_id, (_cantidad, centavos) in carrito.lineas.items()
+            }
+            nueva_compra = registrar_compra(request.user, cantidades, precios_esperados=precios)
             
-            # 4. Crear los objetos DetalleCompra
-            for item in items_para_guardar:
-                DetalleCompra.objects.create(
-                    compra=nueva_compra,
-                    producto=item['producto'],
-                    cantidad=item['cantidad'],
-                    precio_unitario=item['precio_unitario']
-                )
-            
-            # D. Limpia el carrito de la sesión
-            del request.session['carrito']
+            # D. Limpia el carrito
+            carrito.vaciar()
             
             messages.success(request, '¡Tu pedido ha sido confirmado!')
             return redirect('orden_confirmada', pedido_id=nueva_compra.id)
 
+        except PreciosCambiados as e:
+            carrito.actualizar_precios({str(pid): centavos for pid, centavos in e.cambiados.items()})
+            messages.warning(request, str(e))
+            return redirect('confirmar_compra')
+
+        except PedidoInvalido as e:
+            # Ej. productos que ya no existen: el carrito los limpia al mostrarse
+            messages.error(request, f'No pudimos confirmar tu pedido: {e}')
+            return redirect('ver_carrito')
+
         except Exception as e:
             messages.error(request, f'Error al guardar tu pedido: {e}')
             return redirect('confirmar_compra')
@@ -521,35 +649,17 @@ def confirmar_compra(request):
     # --- Parte 3: Lógica para MOSTRAR la página (petición GET) ---
     # (El resto de la función se queda igual)
     
-    items_para_plantilla = []
-    subtotal = Decimal('0.00')
-    
-    for producto_id, item_data in carrito_session.items():
-        try:
-            producto = Producto.objects.get(id=producto_id)
-            cantidad_real = int(item_data['cantidad'])
-            precio_item = Decimal(item_data['precio']) 
-            total_item = precio_item * cantidad_real
-            subtotal += total_item
-            
-            items_para_plantilla.append({
-                'producto': producto,
-                'cantidad': cantidad_real,
-                'subtotal': total_item, 
-            })
-        except (Producto.DoesNotExist, TypeError, KeyError, ValueError, decimal.InvalidOperation):
-            continue
-    
-    costo_envio = Decimal('40.00') 
-    total_con_envio = subtotal + costo_envio
+    hidratado = hidratar_carrito(carrito.lineas)
+    _actualizar_precios(request, hidratado)
+    totales = hidratado.totales()
 
     contexto = {
-        'carrito_items': items_para_plantilla, 
-        'total_general': subtotal,             
+        'carrito_items': hidratado.lineas, 
+        'total_general': totales.subtotal,             
         'perfil': perfil_usuario,              
         'usuario': request.user,               
-        'total_con_envio': total_con_envio,
-        'costo_envio': costo_envio,
+        'total_con_envio': totales.total,
+        'costo_envio': totales.envio,
     }
     
     return render(request, 'app_fruteria/compra.html', contexto)
@@ -561,36 +671,54 @@ def confirmar_compra(request):
 @login_required
 def orden_confirmada(request, pedido_id):
     try:
-        # Buscamos una Compra que coincida con el ID y el cliente
-        compra = Compra.objects.get(id=pedido_id, cliente=request.user)
-        
-        # También buscamos los detalles de esa compra
-        detalles = DetalleCompra.objects.filter(compra=compra)
-        
-        contexto = { 
-            'pedido': compra, # Pasamos la compra como 'pedido'
-            'detalles': detalles # Pasamos los items
-        }
-        return render(request, 'app_fruteria/orden_confirmada.html', contexto)
-    
+        # Buscamos una Compra que coincida con el ID y el cliente (con la
+        # dirección del perfil en el mismo JOIN)
+        compra = Compra.objects.select_related('cliente__perfilcliente').get(
+            id=pedido_id, cliente=request.user
+        )
     except Compra.DoesNotExist:
         messages.error(request, 'No se encontró ese pedido.')
         return redirect('menu_virtual')
-    
+
+    # Los detalles traen copiados el nombre y el subtotal: una sola consulta
+    # sin importar cuántas líneas tenga el pedido
+    detalles = compra.detallecompra_set.order_by('id')
+
+    contexto = {
+        'pedido': compra, # Pasamos la compra como 'pedido'
+        'detalles': detalles # Pasamos los items
+    }
+    return render(request, 'app_fruteria/orden_confirmada.html', contexto)
+
+
+@login_required
+def mis_pedidos(request):
+    """
+    Historial de compras del cliente, del más reciente al más antiguo.
+
+    Cada fila sale de la propia Compra (num_lineas y resumen se guardan al
+    comprar), así la página es una consulta sobre compra_cliente_fecha_idx;
+    "Ver pedidos anteriores" sigue con el cursor de paginacion.py.
+    """
+    try:
+        pedidos = Pagina(
+            Compra.objects.filter(cliente=request.user), '-fecha', request.GET.get('cursor'),
+            PEDIDOS_POR_PAGINA, parametros=request.GET, ordenes=ORDENES_PEDIDOS,
+        )
+    except CursorInvalido:
+        return redirect('mis_pedidos')
+    return render(request, 'app_fruteria/mis_pedidos.html', {'pedidos': pedidos})
+
 
 def eliminar_item_carrito(request, producto_id):
     """
     Elimina un producto del carrito (compatible con AJAX y enlaces normales).
     """
-    carrito = request.session.get('carrito', {})
-    producto_id_str = str(producto_id)
+    carrito = request.carrito
     mensaje = "Error"
     success = False
 
-    if producto_id_str in carrito:
-        del carrito[producto_id_str]
-        request.session['carrito'] = carrito
-        request.session.modified = True
+    if carrito.eliminar(producto_id):
         mensaje = "Producto eliminado del carrito."
         success = True
     else:
@@ -0,0 +1,179 @@
+# app_fruteria/views_async.py
+"""
+Versiones async de las vistas del catálogo y del carrito.
+
+Se usan cuando la app corre bajo ASGI (``backend_olivos/asgi.py`` activa
+``FRUTERIA_VISTAS_ASYNC``); con WSGI `urls.py` sigue apuntando a las vistas
+síncronas de views.py. Una vista síncrona bajo ASGI ocupa un hilo durante
+toda la petición; estas solo esperan en la E/S (caché, sesión, BD) y el resto
+de la lógica es la misma de views.py.
+
+Antes de renderizar se carga el usuario con ``request.auser()`` (que también
+carga la sesión), porque la plantilla no puede consultar la BD desde un
+contexto async.
+"""
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
+from django.shortcuts import redirect, render
+from django.utils import timezone
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_POST
+
+from . import busqueda, categorias, ofertas, views
+from .cache import aclave_fragmento, parametros_catalogo
+from .carrito import (
+    OperacionInvalida,
+    adatos_producto_carrito,
+    adatos_productos_carrito,
+    ahidratar_carrito,
+    productos_por_consultar,
+)
+from .models import Producto
+from .paginacion import CursorInvalido, Pagina
+
+
+async def _arender_catalogo(request, plantilla, fragmento, productos, contexto=None):
+    """
+    Si el fragmento del catálogo está en caché se entrega ya leído (la
+    plantilla no toca el queryset); si no, los productos se cargan con el ORM
+    async antes de renderizar. Lo mismo con el usuario y las categorías del
+    menú de navegación: la plantilla no puede consultar la BD desde aquí.
+    """
+    variante = parametros_catalogo(request.GET).urlencode()
+    html = await cache.aget(await aclave_fragmento(fragmento, [variante]))
+    if html is None:
+        if isinstance(productos, Pagina):
+            await productos.acargar()
+        else:
+            productos = [producto async for producto in productos]
+    request.user = await request.auser()
+    contexto = {
+        **(contexto or {}),
+        'lista_productos': productos,
+        'fragmento_precargado': html,
+        'categorias_menu': (await categorias.acargar()).categorias,
+    }
+    return render(request, plantilla, contexto)
+
+
+# --------------------------------------------------------------------------
+# A. CATÁLOGO
+# --------------------------------------------------------------------------
+
+async def _seccion_catalogo(request, seccion, plantilla, categoria=None, contexto=None):
+    try:
+        pagina = views._pagina_catalogo(request, categoria)
+    except CursorInvalido:
+        return redirect(views._primera_pagina(request))
+    fragmento = seccion if categoria is None else f'categoria-{seccion}'
+    return await _arender_catalogo(
+        request, plantilla, fragmento, pagina,
+        {**(contexto or {}), 'seccion': seccion, 'fragmento_catalogo': fragmento},
+    )
+
+
+@ensure_csrf_cookie
+async def menu_virtual(request):
+    return await _seccion_catalogo(request, views.SECCION_MENU, 'app_fruteria/menu.html')
+
+
+@ensure_csrf_cookie
+async def ver_categoria(request, slug):
+    categoria = (await categorias.acargar()).por_slug.get(slug)
+    if categoria is None:
+        raise Http404("Categoría no encontrada")
+    return await _seccion_catalogo(
+        request, slug, 'app_fruteria/categoria.html', categoria, {'categoria': categoria}
+    )
+
+
+async def pagina_catalogo(request, seccion):
+    categoria = views._categoria_seccion(seccion, await categorias.acargar())
+    try:
+        pagina = views._pagina_catalogo(request, categoria)
+    except CursorInvalido as e:
+        return HttpResponseBadRequest(str(e))
+    fragmento = f'pagina-{seccion}'
+    return await _arender_catalogo(
+        request, 'app_fruteria/_pagina_catalogo.html', fragmento, pagina,
+        {'seccion': seccion, 'fragmento_catalogo': fragmento},
+    )
+
+
+async def detalle_producto(request, producto_id):
+    try:
+        producto = await Producto.objects.catalogo().aget(pk=producto_id)
+    except Producto.DoesNotExist:
+        raise Http404("Producto no encontrado")
+    return render(request, 'app_fruteria/_detalle_producto.html', {'producto': producto})
+
+
+@ensure_csrf_cookie
+async def ver_ofertas(request):
+    hoy = timezone.localdate()
+    # en_oferta() lee las ofertas vigentes de memoria; se cargan antes sin bloquear
+    await ofertas.avigentes(hoy)
+    productos = views._aplicar_filtros_precio(request, Producto.objects.catalogo(hoy).en_oferta(hoy))
+    return await _arender_catalogo(
+        request, 'app_fruteria/ofertas.html', 'ofertas', productos,
+        {'titulo_seccion': ' Ofertas y Promociones Vigentes'},
+    )
+
+
+@ensure_csrf_cookie
+async def buscar_productos(request):
+    texto = request.GET.get('q', '').strip()
+    # La consulta FTS5 es SQL crudo (sin ORM async); los ids salen de la caché casi siempre
+    ids = await sync_to_async(busqueda.buscar)(texto)
+    productos = busqueda.ordenar_por_ids(Producto.objects.catalogo(), ids)
+    return await _arender_catalogo(
+        request, 'app_fruteria/menu.html', 'busqueda', productos,
+        {
+            'busqueda': texto,
+            'fragmento_catalogo': 'busqueda',
+            'mensaje_vacio': f'No encontramos productos para “{texto}”.',
+        },
+    )
+
+
+# --------------------------------------------------------------------------
+# C. CARRITO
+# --------------------------------------------------------------------------
+
+async def agregar_al_carrito(request, producto_id):
+    await request.carrito.apreparar()
+    datos = await adatos_producto_carrito(producto_id)
+    return views._respuesta_agregado(request, producto_id, datos)
+
+
+@ensure_csrf_cookie
+async def ver_carrito(request):
+    carrito = await request.carrito.apreparar()
+    hidratado = await ahidratar_carrito(carrito.lineas)
+    contexto = views._contexto_carrito(request, hidratado)
+    request.user = await request.auser()
+    contexto['categorias_menu'] = (await categorias.acargar()).categorias
+    return render(request, 'app_fruteria/carrito.html', contexto)
+
+
+async def ajustar_cantidad(request, producto_id, accion):
+    # Con el carrito cargado, la vista síncrona ya no hace E/S
+    await request.carrito.apreparar()
+    return views.ajustar_cantidad(request, producto_id, accion)
+
+
+async def eliminar_item_carrito(request, producto_id):
+    await request.carrito.apreparar()
+    return views.eliminar_item_carrito(request, producto_id)
+
+
+@require_POST
+async def actualizar_carrito_lote(request):
+    try:
+        operaciones = views._leer_lote(request)
+        carrito = await request.carrito.apreparar()
+        datos = await adatos_productos_carrito(productos_por_consultar(carrito, operaciones))
+        return views._respuesta_lote(request, operaciones, datos)
+    except OperacionInvalida as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
@@ -12,5 +12,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_olivos.settings')
+# Bajo ASGI el catálogo y el carrito usan las vistas async (views_async.py) y
+# SQLite no guarda conexiones persistentes (bd.py)
+os.environ.setdefault('FRUTERIA_VISTAS_ASYNC', '1')
 
-application = get_asgi_application()
+# STATIC_URL y MEDIA_URL se sirven sin pasar por Django (ETag, Range, .gz/.br)
+from app_fruteria.archivos import ServidorArchivosASGI  # noqa: E402
+
+application = ServidorArchivosASGI(get_asgi_application())
@@ -0,0 +1,87 @@
+"""
+DATABASES a partir de variables de entorno (lo usa settings.py).
+
+Sin variables se usa el db.sqlite3 del proyecto, como siempre. Variables:
+
+* ``FRUTERIA_BD_MOTOR``: ``sqlite`` (por omisión) o ``postgresql``.
+* ``FRUTERIA_BD_NOMBRE``: archivo SQLite o nombre de la base en PostgreSQL.
+* ``FRUTERIA_BD_USUARIO``, ``FRUTERIA_BD_CLAVE``, ``FRUTERIA_BD_HOST``,
+  ``FRUTERIA_BD_PUERTO``: conexión a PostgreSQL.
+* ``FRUTERIA_BD_POOL_MIN``, ``FRUTERIA_BD_POOL_MAX``,
+  ``FRUTERIA_BD_POOL_ESPERA``: pool nativo de Django para PostgreSQL
+  (requiere ``psycopg[pool]``); ESPERA son los segundos que una petición
+  espera una conexión libre antes de fallar.
+* ``FRUTERIA_BD_REPLICA_HOST`` (PostgreSQL) o ``FRUTERIA_BD_REPLICA_NOMBRE``
+  (SQLite): agrega el alias ``replica``, que app_fruteria/enrutador.py usa
+  para las lecturas del catálogo. En las pruebas es un espejo de default.
+* ``FRUTERIA_VISTAS_ASYNC`` (lo pone backend_olivos/asgi.py): bajo ASGI
+  SQLite usa ``CONN_MAX_AGE = 0``. Django cierra las conexiones viejas al
+  terminar la petición en otro hilo que el que las abrió, así que las
+  conexiones persistentes de los hilos de ``sync_to_async`` nunca se cierran.
+
+Solo importa excepciones de Django: settings.py lo carga antes de configurar nada.
+"""
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+
+ALIAS_REPLICA = 'replica'
+
+
+def _sqlite(nombre, asgi=False):
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': Path(nombre),
+        # Con WSGI cada hilo conserva su conexión (y sus PRAGMA) entre
+        # peticiones; bajo ASGI una conexión por petición
+        'CONN_MAX_AGE': 0 if asgi else 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # atomic() abre con BEGIN IMMEDIATE: las escrituras esperan el
+            # candado (busy_timeout) en vez de fallar con "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+
+
+def _postgresql(entorno, host):
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': entorno.get('FRUTERIA_BD_NOMBRE', 'olivos'),
+        'USER': entorno.get('FRUTERIA_BD_USUARIO', 'olivos'),
+        'PASSWORD': entorno.get('FRUTERIA_BD_CLAVE', ''),
+        'HOST': host,
+        'PORT': entorno.get('FRUTERIA_BD_PUERTO', '5432'),
+        # Con pool las conexiones las reutiliza el pool: CONN_MAX_AGE debe ser 0
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(entorno.get('FRUTERIA_BD_POOL_MIN', 2)),
+                'max_size': int(entorno.get('FRUTERIA_BD_POOL_MAX', 10)),
+                'timeout': float(entorno.get('FRUTERIA_BD_POOL_ESPERA', 10)),
+            },
+        },
+    }
+
+
+def configurar(entorno, base_dir):
+    """Devuelve el diccionario DATABASES para `entorno` (normalmente os.environ)."""
+    motor = entorno.get('FRUTERIA_BD_MOTOR', 'sqlite')
+    asgi = entorno.get('FRUTERIA_VISTAS_ASYNC', '0') == '1'
+    if motor == 'sqlite':
+        bases = {'default': _sqlite(entorno.get('FRUTERIA_BD_NOMBRE', base_dir / 'db.sqlite3'), asgi)}
+        replica = entorno.get('FRUTERIA_BD_REPLICA_NOMBRE')
+        if replica:
+            bases[ALIAS_REPLICA] = _sqlite(replica, asgi)
+    elif motor == 'postgresql':
+        bases = {'default': _postgresql(entorno, entorno.get('FRUTERIA_BD_HOST', 'localhost'))}
+        replica = entorno.get('FRUTERIA_BD_REPLICA_HOST')
+        if replica:
+            bases[ALIAS_REPLICA] = _postgresql(entorno, replica)
+    else:
+        raise ImproperlyConfigured(f'FRUTERIA_BD_MOTOR desconocido: {motor!r} (usa sqlite o postgresql)')
+
+    if ALIAS_REPLICA in bases:
+        # En las pruebas la réplica es la misma base de prueba que default
+        bases[ALIAS_REPLICA]['TEST'] = {'MIRROR': 'default'}
+    return bases
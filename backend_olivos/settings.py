@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from . import bd
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,8 +44,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir la petición completa (solo actúa si
+    # FRUTERIA_PERFILAMIENTO_ACTIVO es True)
+    'app_fruteria.perfilamiento.PerfilamientoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'app_fruteria.carrito.CarritoMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -54,14 +61,24 @@ ROOT_URLCONF = 'backend_olivos.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates + medición de tiempo de render para el perfilamiento
+        'BACKEND': 'app_fruteria.perfilamiento.PlantillasCronometradas',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'app_fruteria.context_processors.categorias',
+            ],
+            # Cada plantilla se compila una vez por proceso y se reutiliza
+            # (categoria.html sirve a todas las categorías). Con DEBUG el
+            # autoreload de Django vacía esta caché al editar una plantilla.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
             ],
         },
     },
@@ -73,13 +90,95 @@ WSGI_APPLICATION = 'backend_olivos.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# Por omisión db.sqlite3; PostgreSQL con pool y réplica de lectura según las
+# variables FRUTERIA_BD_* (ver backend_olivos/bd.py)
+DATABASES = bd.configurar(os.environ, BASE_DIR)
+
+# Lecturas del catálogo a la réplica si existe el alias (app_fruteria/enrutador.py)
+DATABASE_ROUTERS = ['app_fruteria.enrutador.EnrutadorReplica']
+FRUTERIA_BD_REPLICA = bd.ALIAS_REPLICA if bd.ALIAS_REPLICA in DATABASES else None
+# Segundos que un proceso lee el catálogo de la primaria después de guardarlo,
+# para no rellenar sus cachés con datos de una réplica atrasada
+FRUTERIA_BD_REPLICA_RETRASO = 5
+
+# PRAGMA que app_fruteria/basedatos.py aplica a cada conexión SQLite nueva
+FRUTERIA_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',           # lectores y escritor no se bloquean entre sí
+    'synchronous': 'NORMAL',         # seguro con WAL; menos fsync por transacción
+    'busy_timeout': 5000,            # ms que se espera el candado de escritura
+    'mmap_size': 256 * 1024 * 1024,  # lecturas por memoria mapeada (256 MB)
+    'cache_size': -20000,            # caché de páginas por conexión (~20 MB)
+}
+
+# Fila de escritura por proceso para el checkout (basedatos.escritura()):
+# los hilos esperan su turno en Python en vez de competir por el candado
+FRUTERIA_SQLITE_ESCRITOR_UNICO = False
+
+
+# Caché (fragmentos del catálogo). En producción con varios procesos conviene
+# un backend compartido (Redis o Memcached) para que la versión del catálogo
+# y los contadores sean los mismos en todos los workers.
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'olivos-verdes',
     }
 }
 
+# Segundos que vive un fragmento del catálogo en la caché
+FRUTERIA_CACHE_CATALOGO_SEGUNDOS = 60 * 60
+
+# Dónde se guarda el carrito entre peticiones:
+#   'app_fruteria.carrito.CarritoFirmado' -> cookie firmada compacta (sin BD)
+#   'app_fruteria.carrito.CarritoCache'   -> caché, la cookie solo lleva el ID
+#   'app_fruteria.carrito.CarritoSesion'  -> sesión (formato anterior)
+FRUTERIA_CARRITO_BACKEND = 'app_fruteria.carrito.CarritoFirmado'
+
+# Vistas async del catálogo y el carrito (app_fruteria/views_async.py).
+# backend_olivos/asgi.py lo activa; con WSGI se usan las vistas síncronas.
+FRUTERIA_VISTAS_ASYNC = os.environ.get('FRUTERIA_VISTAS_ASYNC', '0') == '1'
+
+# Productos por página en el menú y las categorías (el resto llega con scroll infinito)
+FRUTERIA_CATALOGO_POR_PAGINA = 24
+
+# Pedidos por página en "mis pedidos" (historial del cliente)
+FRUTERIA_PEDIDOS_POR_PAGINA = 20
+
+# Segundos que cada proceso usa el mapa de categorías en memoria antes de
+# releerlo (app_fruteria/categorias.py); en el propio proceso se invalida al guardar
+FRUTERIA_CATEGORIAS_SEGUNDOS = 5 * 60
+
+# Segundos que el usuario de la sesión y su perfil viven en la caché
+# (app_fruteria/usuarios.py); al guardarlos se borran de inmediato
+FRUTERIA_USUARIO_SEGUNDOS = 60
+
+# Segundos que cada proceso usa su copia de las ofertas vigentes del día
+# (app_fruteria/ofertas.py); cambian a medianoche local y al guardar una Oferta
+FRUTERIA_OFERTAS_SEGUNDOS = 60
+
+# API JSON del catálogo (app_fruteria/api.py): tamaño de página y max-age
+FRUTERIA_API_LIMITE = 50
+FRUTERIA_API_LIMITE_MAXIMO = 200
+FRUTERIA_API_MAX_AGE = 0
+
+# Búsqueda de productos (app_fruteria/busqueda.py). None = según el motor:
+# FTS5 en SQLite, 'app_fruteria.busqueda.BuscadorORM' en las demás.
+FRUTERIA_BUSQUEDA_BACKEND = None
+FRUTERIA_BUSQUEDA_LIMITE = 60
+
+# Costo fijo de envío, en centavos ($40.00)
+FRUTERIA_COSTO_ENVIO_CENTAVOS = 4000
+
+# Miniaturas de Producto.imagen (ver app_fruteria/imagenes.py)
+FRUTERIA_IMAGEN_ANCHOS = (120, 240, 480, 960)
+FRUTERIA_IMAGEN_CALIDAD = 80
+FRUTERIA_IMAGEN_DERIVADOS_AL_GUARDAR = True
+
+# Perfilamiento por petición (cabecera Server-Timing + /perfilamiento/ para staff)
+FRUTERIA_PERFILAMIENTO_ACTIVO = False
+FRUTERIA_PERFILAMIENTO_MUESTREO = 0.1   # fracción de peticiones guardadas en el buffer
+FRUTERIA_PERFILAMIENTO_CAPACIDAD = 1000 # tamaño del buffer circular
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -122,21 +221,33 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-import os
-# Directorio raíz del proyecto
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-
 # URL base para los archivos estáticos
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     # Si tuvieras archivos estáticos globales (no específicos de una app), irían aquí
 ]
+# Destino de `collectstatic`; en producción lo sirve app_fruteria.archivos
+STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 # URL donde se accederán los archivos que sube el usuario (imágenes de Producto)
 MEDIA_URL = '/media/'
 # Ruta física donde Django guardará los archivos subidos por el usuario (como las fotos de las frutas)
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Fuera de DEBUG los estáticos llevan hash en el nombre y variantes .gz/.br
+# (requiere haber corrido `collectstatic`)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'app_fruteria.archivos.EstaticosComprimidos'
+        ),
+    },
+}
+
+# Cache-Control de archivos sin hash en el nombre (los que lo tienen son "immutable")
+FRUTERIA_ARCHIVOS_MAX_AGE = 60
 
 # 1. URL a donde redirigir si se requiere iniciar sesión (CORRECCIÓN CRUCIAL)
 LOGIN_URL = '/iniciar-sesion/' 
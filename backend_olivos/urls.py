@@ -15,6 +15,5 @@ urlpatterns = [
 if settings.DEBUG:
     # Esto le dice a Django dónde buscar los archivos MEDIA_URL
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    
-    # Opcional: Esto ayuda si tienes problemas con los archivos STATIC
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
+    # Los STATIC los sirve `runserver` (staticfiles) en desarrollo y
+    # app_fruteria.archivos en producción (ver wsgi.py / asgi.py)
\ No newline at end of file
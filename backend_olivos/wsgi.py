@@ -13,4 +13,7 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_olivos.settings')
 
-application = get_wsgi_application()
+# STATIC_URL y MEDIA_URL se sirven sin pasar por Django (ETag, Range, .gz/.br)
+from app_fruteria.archivos import ServidorArchivosWSGI  # noqa: E402
+
+application = ServidorArchivosWSGI(get_wsgi_application())
@@ -0,0 +1,174 @@
+"""
+Tiempos de /api/productos/ (app_fruteria/api.py) sobre 100k productos.
+
+Crea una base SQLite temporal, la llena con ``manage.py seed_fruteria`` y
+compara, dentro del mismo proceso (cliente de pruebas de Django, sin red):
+
+* página por cursor (keyset) vs. la misma página con OFFSET, al principio y
+  al fondo del catálogo;
+* serializar desde ``.values()`` vs. desde instancias del modelo;
+* la petición completa en frío (sin caché), con el cuerpo ya en caché y la
+  revalidación con ``If-None-Match`` (304).
+
+Uso (desde la raíz del proyecto):
+
+    python benchmarks/api_productos.py                    # 100k productos
+    python benchmarks/api_productos.py --productos 20000 --repeticiones 20
+
+La base db.sqlite3 del proyecto no se toca.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_olivos.settings')
+
+from django.conf import settings  # noqa: E402
+
+
+def configurar_base(ruta):
+    # Debe hacerse antes de django.setup() / la primera conexión
+    settings.DATABASES['default']['NAME'] = ruta
+    settings.ALLOWED_HOSTS = ['testserver']
+    settings.DEBUG = False
+
+
+def cronometrar(funcion, repeticiones):
+    funcion()  # calentar
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) * 1000 / repeticiones
+
+
+def paginas(repeticiones, limite):
+    """Keyset vs. OFFSET para la primera página y una del fondo, ordenando por nombre."""
+    from django.db.models import Q
+    from django.utils import timezone
+
+    from app_fruteria.api import CAMPOS_LISTA
+    from app_fruteria.models import Producto
+
+    hoy = timezone.localdate()
+    consulta = Producto.objects.with_precio_final(hoy).with_oferta_vigente(hoy).order_by('nombre', 'id')
+    total = consulta.count()
+
+    print(f'\n===== Paginación ({limite} por página, ORDER BY nombre, id) =====')
+    print(f'{"posición":<14} {"OFFSET ms":>10} {"cursor ms":>10}')
+    for posicion in (0, total // 2, total - limite):
+        def con_offset():
+            return list(consulta.values(*CAMPOS_LISTA)[posicion:posicion + limite])
+
+        anterior = consulta.values('nombre', 'id')[posicion - 1] if posicion else None
+
+        def con_cursor():
+            qs = consulta
+            if anterior:
+                # igual que api._paginar
+                qs = qs.filter(
+                    Q(nombre__gte=anterior['nombre']),
+                    Q(nombre__gt=anterior['nombre']) | Q(id__gt=anterior['id']),
+                )
+            return list(qs.values(*CAMPOS_LISTA)[:limite])
+
+        assert con_offset() == con_cursor()
+        print(f'{posicion:<14} {cronometrar(con_offset, repeticiones):>10.2f} '
+              f'{cronometrar(con_cursor, repeticiones):>10.2f}')
+
+
+def serializacion(repeticiones, limite):
+    """Armar el JSON de una página desde .values() vs. desde instancias."""
+    import json
+
+    from django.core.serializers.json import DjangoJSONEncoder
+    from django.utils import timezone
+
+    from app_fruteria.api import CAMPOS_LISTA, _producto_json
+    from app_fruteria.models import Producto
+
+    hoy = timezone.localdate()
+    consulta = Producto.objects.with_precio_final(hoy).with_oferta_vigente(hoy).order_by('id')
+
+    def desde_values():
+        filas = consulta.values(*CAMPOS_LISTA)[:limite]
+        return json.dumps([_producto_json(f) for f in filas], cls=DjangoJSONEncoder)
+
+    def desde_instancias():
+        productos = consulta.select_related('categoria')[:limite]
+        return json.dumps([{
+            'id': p.id, 'nombre': p.nombre, 'precio': p.precio, 'precio_final': p.precio_final,
+            'en_oferta': p.oferta_vigente, 'oferta': p.oferta_id if p.oferta_vigente else None,
+            'categoria': {'id': p.categoria.id, 'nombre': p.categoria.nombre} if p.categoria else None,
+            'imagen': p.imagen.url if p.imagen else None,
+        } for p in productos], cls=DjangoJSONEncoder)
+
+    print(f'\n===== Serialización de {limite} filas =====')
+    print(f'{".values()":<14} {cronometrar(desde_values, repeticiones):>8.2f} ms')
+    print(f'{"instancias":<14} {cronometrar(desde_instancias, repeticiones):>8.2f} ms')
+
+
+def peticiones(repeticiones, limite):
+    """Petición completa: en frío, con el cuerpo en caché y revalidación 304."""
+    from django.core.cache import cache
+    from django.test import Client
+
+    cliente = Client()
+    parametros = {'limite': limite, 'categoria': 'Cítricas', 'orden': 'precio'}
+    etag = None
+
+    def fria():
+        cache.clear()
+        assert cliente.get('/api/productos/', parametros).status_code == 200
+
+    def cacheada():
+        assert cliente.get('/api/productos/', parametros).status_code == 200
+
+    def revalidada():
+        nonlocal etag
+        etag = etag or cliente.get('/api/productos/', parametros).headers['ETag']
+        respuesta = cliente.get('/api/productos/', parametros, headers={'If-None-Match': etag})
+        assert respuesta.status_code == 304
+
+    print(f'\n===== GET /api/productos/?{"&".join(f"{k}={v}" for k, v in parametros.items())} =====')
+    for nombre, funcion in (('en frío', fria), ('en caché', cacheada), ('304', revalidada)):
+        ms = cronometrar(funcion, repeticiones)
+        print(f'{nombre:<14} {ms:>8.2f} ms  {1000 / ms:>8.0f} req/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--productos', type=int, default=100_000)
+    parser.add_argument('--limite', type=int, default=50)
+    parser.add_argument('--repeticiones', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        configurar_base(os.path.join(directorio, 'bench.sqlite3'))
+
+        import django
+        from django.core.management import call_command
+        from django.db import connection
+
+        django.setup()
+        call_command('migrate', verbosity=0)
+        inicio = time.perf_counter()
+        call_command(
+            'seed_fruteria', semilla=7, productos=args.productos, compras=10,
+            ofertas=200, usuarios=10, lineas_por_compra=0, lote=5000, verbosity=0,
+        )
+        print(f'Datos sintéticos: {args.productos} productos ({time.perf_counter() - inicio:.1f} s)')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        paginas(args.repeticiones, args.limite)
+        serializacion(args.repeticiones, args.limite)
+        peticiones(args.repeticiones, args.limite)
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
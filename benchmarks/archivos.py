@@ -0,0 +1,137 @@
+"""
+Peticiones por segundo al pedir imágenes: vista ``static()`` de Django vs.
+``app_fruteria.archivos.ServidorArchivosWSGI``.
+
+Por defecto se llama a las dos aplicaciones WSGI dentro del mismo proceso (sin
+red), así se compara solo el costo del lado del servidor. Se usa una copia de
+``media/productos/1.png`` (2.5 MB) y un derivado WebP de 240 px en un
+MEDIA_ROOT temporal.
+
+Uso (desde la raíz del proyecto):
+
+    python benchmarks/archivos.py [--peticiones 300]
+
+Contra un servidor real (gunicorn/uvicorn ya levantado), con hilos:
+
+    python benchmarks/archivos.py --url http://127.0.0.1:8000/media/productos/1.png --hilos 16
+"""
+import argparse
+import hashlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_olivos.settings')
+
+from django.conf import settings  # noqa: E402
+
+
+def preparar_media():
+    """MEDIA_ROOT temporal con el PNG original y un derivado con hash."""
+    destino = Path(tempfile.mkdtemp(prefix='bench_archivos_'))
+    (destino / 'productos').mkdir()
+    original = destino / 'productos' / '1.png'
+    shutil.copyfile(RAIZ / 'media' / 'productos' / '1.png', original)
+
+    from PIL import Image
+    imagen = Image.open(original).convert('RGB')
+    imagen = imagen.resize((240, round(imagen.height * 240 / imagen.width)))
+    buffer = io.BytesIO()
+    imagen.save(buffer, format='WEBP', quality=80)
+    huella = hashlib.sha256(original.read_bytes()).hexdigest()[:12]
+    (destino / 'productos' / f'1-{huella}-240w.webp').write_bytes(buffer.getvalue())
+    return destino, f'/media/productos/1-{huella}-240w.webp'
+
+
+def llamar(aplicacion, ruta, cabeceras):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': ruta, 'SCRIPT_NAME': '', 'QUERY_STRING': '',
+        'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    environ.update(cabeceras)
+    estado = []
+    cuerpo = aplicacion(environ, lambda s, h, exc_info=None: estado.append(s))
+    total = sum(len(bloque) for bloque in cuerpo)
+    if hasattr(cuerpo, 'close'):
+        cuerpo.close()
+    return estado[0].split()[0], total
+
+
+def medir(aplicacion, ruta, cabeceras, peticiones):
+    llamar(aplicacion, ruta, cabeceras)  # calentar
+    inicio = time.perf_counter()
+    for _ in range(peticiones):
+        estado, total = llamar(aplicacion, ruta, cabeceras)
+    segundos = time.perf_counter() - inicio
+    return estado, total, peticiones / segundos
+
+
+def en_proceso(peticiones):
+    media, derivado = preparar_media()
+    settings.MEDIA_ROOT = media
+    settings.DEBUG = True  # para que urls.py registre static(MEDIA_URL)
+    settings.ALLOWED_HOSTS = ['testserver']
+
+    import django
+    django.setup()
+    from django.core.wsgi import get_wsgi_application
+    from app_fruteria.archivos import ServidorArchivosWSGI
+
+    django_app = get_wsgi_application()
+    servidor = ServidorArchivosWSGI(django_app)
+    etag = dict(servidor.resolutor.resolver('GET', derivado, {}).cabeceras)['ETag']
+
+    escenarios = [
+        ('original 2.5 MB', '/media/productos/1.png', {}),
+        ('derivado 240w webp', derivado, {}),
+        ('revalidación (304)', derivado, {'HTTP_IF_NONE_MATCH': etag}),
+        ('rango 64 KB', '/media/productos/1.png', {'HTTP_RANGE': 'bytes=0-65535'}),
+    ]
+    try:
+        print(f'{"escenario":<22} {"aplicación":<10} {"estado":>6} {"bytes":>9} {"req/s":>9}')
+        for nombre, ruta, extra in escenarios:
+            for etiqueta, aplicacion in (('django', django_app), ('servidor', servidor)):
+                estado, total, por_segundo = medir(aplicacion, ruta, extra, peticiones)
+                print(f'{nombre:<22} {etiqueta:<10} {estado:>6} {total:>9} {por_segundo:>9.0f}')
+    finally:
+        shutil.rmtree(media, ignore_errors=True)
+
+
+def contra_url(url, peticiones, hilos):
+    def una(_):
+        with urllib.request.urlopen(url) as respuesta:
+            return len(respuesta.read())
+
+    una(0)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(hilos) as grupo:
+        total = sum(grupo.map(una, range(peticiones)))
+    segundos = time.perf_counter() - inicio
+    print(f'{peticiones} peticiones, {hilos} hilos: {peticiones / segundos:.0f} req/s, '
+          f'{total / segundos / 1e6:.1f} MB/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--peticiones', type=int, default=300)
+    parser.add_argument('--url', help='medir contra un servidor HTTP ya levantado')
+    parser.add_argument('--hilos', type=int, default=8)
+    args = parser.parse_args()
+    if args.url:
+        contra_url(args.url, args.peticiones, args.hilos)
+    else:
+        en_proceso(args.peticiones)
+
+
+if __name__ == '__main__':
+    main()
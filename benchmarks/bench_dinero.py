@@ -0,0 +1,71 @@
+"""
+Micro-benchmark: totales del carrito con Decimal (ruta anterior) vs. centavos enteros.
+
+Uso (desde la raíz del proyecto):
+
+    python benchmarks/bench_dinero.py [--repeticiones 200]
+
+La ruta anterior guardaba ``{'cantidad': int, 'precio': str}`` en la sesión y
+convertía cada precio a Decimal en cada petición; la nueva suma pares
+``[kg, centavos]`` con aritmética entera y convierte a Decimal una sola vez.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_olivos.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from app_fruteria.dinero import calcular_totales  # noqa: E402
+
+
+def totales_decimal(carrito_session):
+    """Copia de la ruta anterior (_get_cart_totals con strings en la sesión)."""
+    total_general = Decimal('0.00')
+    costo_envio = Decimal('40.00')
+    for data in carrito_session.values():
+        total_general += int(data.get('cantidad', 0)) * Decimal(data.get('precio', 0))
+    total_final = total_general + costo_envio if total_general > 0 else Decimal('0.00')
+    return total_general, total_final
+
+
+def totales_centavos(lineas):
+    totales = calcular_totales(lineas.values())
+    return totales.subtotal, totales.total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeticiones', type=int, default=200)
+    args = parser.parse_args()
+
+    azar = random.Random(42)
+    print(f"{'líneas':>7} {'decimal (µs)':>14} {'centavos (µs)':>14} {'aceleración':>12}")
+    for tamano in (1, 10, 100, 1000):
+        compacto = {
+            str(i): [azar.randint(1, 10), azar.randint(500, 9999)] for i in range(tamano)
+        }
+        sesion = {
+            k: {'cantidad': kg, 'precio': f'{c / 100:.2f}'} for k, (kg, c) in compacto.items()
+        }
+        assert totales_decimal(sesion) == totales_centavos(compacto)
+
+        t_decimal = min(timeit.repeat(lambda: totales_decimal(sesion), number=args.repeticiones, repeat=5))
+        t_centavos = min(timeit.repeat(lambda: totales_centavos(compacto), number=args.repeticiones, repeat=5))
+        por_llamada = 1e6 / args.repeticiones
+        print(
+            f'{tamano:>7} {t_decimal * por_llamada:>14.2f} {t_centavos * por_llamada:>14.2f} '
+            f'{t_decimal / t_centavos:>11.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Latencia de la búsqueda de productos (app_fruteria/busqueda.py) sobre 100k productos.
+
+Crea una base SQLite temporal, la llena con ``manage.py seed_fruteria`` (los
+triggers de la migración 0004 llenan el índice FTS5) y mide p50/p95 de
+búsquedas típicas mientras se escribe:
+
+* ``fts5``  -> ``BuscadorFTS5.buscar``, sin caché (nombre, categoría y solo
+  si no alcanza el MATCH completo ordenado);
+* ``bm25``  -> el MATCH completo ordenado por relevancia siempre (como antes
+  de consultar por columna), para comparar;
+* ``orm``   -> respaldo con icontains (lo que haría una búsqueda sin índice);
+* ``caché`` -> ``busqueda.buscar()`` con los ids ya en la caché.
+
+Uso (desde la raíz del proyecto):
+
+    python benchmarks/busqueda.py
+    python benchmarks/busqueda.py --productos 20000 --repeticiones 50
+
+La base db.sqlite3 del proyecto no se toca.
+
+Medición de referencia (100k productos, límite 8, SQLite 3.40):
+
+    backend    p50 ms   p95 ms   máx ms
+    fts5         0.21     1.49     3.00
+    bm25         7.93    45.32    70.50   <- "citricas" (29k filas) y "man" (12k)
+    orm         56.62    67.74    68.47
+    caché        0.05     0.06     0.13
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_olivos.settings')
+
+from django.conf import settings  # noqa: E402
+
+# Lo que escribe alguien buscando "limón persa" / "mango orgánico", letra por letra
+BUSQUEDAS = [
+    'li', 'lim', 'limo', 'limon', 'limón pre', 'man', 'mango', 'mango org', 'mango orgánico',
+    'naranja', 'sandia', 'aguacate crio', 'citricas', 'kumquat silvestre', 'pera 123',
+]
+
+
+def configurar_base(ruta):
+    # Debe hacerse antes de django.setup() / la primera conexión
+    settings.DATABASES['default']['NAME'] = ruta
+
+
+def percentiles(tiempos):
+    tiempos = sorted(tiempos)
+    return statistics.median(tiempos), tiempos[int(len(tiempos) * 0.95) - 1]
+
+
+def medir(nombre, funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        for texto in BUSQUEDAS:
+            inicio = time.perf_counter()
+            funcion(texto)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    p50, p95 = percentiles(tiempos)
+    print(f'{nombre:<8} {p50:>8.2f} {p95:>8.2f} {max(tiempos):>8.2f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--productos', type=int, default=100_000)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--limite', type=int, default=8, help='resultados por búsqueda (sugerencias)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        configurar_base(os.path.join(directorio, 'bench.sqlite3'))
+
+        import django
+        from django.core.management import call_command
+        from django.db import connection
+
+        django.setup()
+        from app_fruteria import busqueda
+
+        call_command('migrate', verbosity=0)
+        inicio = time.perf_counter()
+        call_command(
+            'seed_fruteria', semilla=7, productos=args.productos, compras=10,
+            ofertas=200, usuarios=10, lineas_por_compra=0, lote=5000, verbosity=0,
+        )
+        print(f'Datos sintéticos: {args.productos} productos ({time.perf_counter() - inicio:.1f} s)')
+        call_command('reconstruir_busqueda', verbosity=0)  # deja el índice optimizado
+
+        fts5, orm = busqueda.BuscadorFTS5(), busqueda.BuscadorORM()
+        for texto in BUSQUEDAS:
+            terminos = busqueda.palabras(texto)
+            print(f'  {texto!r:<20} -> {len(fts5.buscar(terminos, 10**6)):>6} coincidencias')
+
+        print(f'\n{"backend":<8} {"p50 ms":>8} {"p95 ms":>8} {"máx ms":>8}   (límite {args.limite})')
+        medir('fts5', lambda t: fts5.buscar(busqueda.palabras(t), args.limite), args.repeticiones)
+        medir('bm25', lambda t: fts5._consultar(fts5.expresion(busqueda.palabras(t)), args.limite, ordenar=True),
+              args.repeticiones)
+        medir('orm', lambda t: orm.buscar(busqueda.palabras(t), args.limite), max(1, args.repeticiones // 10))
+        for texto in BUSQUEDAS:
+            busqueda.buscar(texto, args.limite)
+        medir('caché', lambda t: busqueda.buscar(t, args.limite), args.repeticiones)
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
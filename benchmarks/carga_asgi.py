@@ -0,0 +1,192 @@
+"""
+Prueba de carga: vistas async bajo uvicorn vs. la app WSGI actual.
+
+Levanta cada servidor en un subproceso contra una base SQLite temporal
+llenada con ``seed_fruteria`` y lanza N clientes concurrentes (asyncio, sin
+dependencias) contra el catálogo y los clics del carrito:
+
+* ``wsgi``       -> backend_olivos.wsgi con gunicorn (``--threads``) si está
+                    instalado, si no con el servidor WSGI con hilos de la
+                    biblioteca estándar;
+* ``asgi-sync``  -> uvicorn con las vistas síncronas (FRUTERIA_VISTAS_ASYNC=0);
+* ``asgi``       -> uvicorn con views_async.py.
+
+Uso (desde la raíz del proyecto; requiere ``pip install uvicorn``):
+
+    python benchmarks/carga_asgi.py --concurrencia 50 --segundos 10
+    python benchmarks/carga_asgi.py --solo asgi wsgi --ruta /menu/
+
+La base db.sqlite3 del proyecto no se toca.
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+SERVIDORES = ('wsgi', 'asgi-sync', 'asgi')
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def preparar_entorno(directorio, productos):
+    """Módulo de settings que apunta a una base temporal, migrada y con datos."""
+    base = directorio / 'carga.sqlite3'
+    (directorio / 'settings_carga.py').write_text(textwrap.dedent(f'''
+        from backend_olivos.settings import *  # noqa
+        DEBUG = False
+        ALLOWED_HOSTS = ['127.0.0.1']
+        DATABASES['default']['NAME'] = {str(base)!r}
+    '''))
+    entorno = dict(os.environ)
+    entorno['PYTHONPATH'] = os.pathsep.join([str(directorio), str(RAIZ), entorno.get('PYTHONPATH', '')])
+    entorno['DJANGO_SETTINGS_MODULE'] = 'settings_carga'
+    manage = [sys.executable, str(RAIZ / 'manage.py')]
+    subprocess.run(manage + ['migrate', '-v', '0'], env=entorno, check=True)
+    subprocess.run(
+        manage + ['seed_fruteria', '--productos', str(productos), '--compras', '10', '-v', '0'],
+        env=entorno, check=True,
+    )
+    return entorno
+
+
+def comando_servidor(nombre, puerto, hilos):
+    if nombre == 'wsgi':
+        if importlib.util.find_spec('gunicorn'):
+            return [sys.executable, '-m', 'gunicorn', 'backend_olivos.wsgi:application',
+                    '-b', f'127.0.0.1:{puerto}', '--workers', '1', '--threads', str(hilos),
+                    '--log-level', 'warning']
+        codigo = textwrap.dedent(f'''
+            from socketserver import ThreadingMixIn
+            from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+            from backend_olivos.wsgi import application
+
+            class Servidor(ThreadingMixIn, WSGIServer):
+                daemon_threads = True
+
+            class Silencioso(WSGIRequestHandler):
+                def log_message(self, *args):
+                    pass
+
+            make_server('127.0.0.1', {puerto}, application, Servidor, Silencioso).serve_forever()
+        ''')
+        return [sys.executable, '-c', codigo]
+    return [sys.executable, '-m', 'uvicorn', 'backend_olivos.asgi:application',
+            '--host', '127.0.0.1', '--port', str(puerto), '--workers', '1', '--log-level', 'warning']
+
+
+async def pedir(puerto, ruta, cabeceras):
+    lector, escritor = await asyncio.open_connection('127.0.0.1', puerto)
+    extra = ''.join(f'{k}: {v}\r\n' for k, v in cabeceras.items())
+    escritor.write(
+        f'GET {ruta} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n{extra}\r\n'.encode('latin-1')
+    )
+    await escritor.drain()
+    respuesta = await lector.read()
+    escritor.close()
+    return int(respuesta.split(b' ', 2)[1])
+
+
+async def esperar_servidor(puerto, proceso, limite=30):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        if proceso.poll() is not None:
+            raise RuntimeError('El servidor terminó antes de aceptar conexiones.')
+        try:
+            await pedir(puerto, '/menu/', {})
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError('El servidor no respondió a tiempo.')
+
+
+async def carga(puerto, rutas, concurrencia, segundos):
+    latencias, errores = [], 0
+    fin = time.monotonic() + segundos
+
+    async def cliente(indice):
+        nonlocal errores
+        i = indice
+        while time.monotonic() < fin:
+            ruta, cabeceras = rutas[i % len(rutas)]
+            i += 1
+            inicio = time.perf_counter()
+            try:
+                estado = await pedir(puerto, ruta, cabeceras)
+            except OSError:
+                errores += 1
+                continue
+            if estado >= 400:
+                errores += 1
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.monotonic()
+    await asyncio.gather(*(cliente(i) for i in range(concurrencia)))
+    total = time.monotonic() - inicio
+    return latencias, errores, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--solo', nargs='+', choices=SERVIDORES, default=list(SERVIDORES))
+    parser.add_argument('--concurrencia', type=int, default=50)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--hilos', type=int, default=8, help='hilos del servidor WSGI')
+    parser.add_argument('--productos', type=int, default=200)
+    parser.add_argument('--ruta', action='append',
+                        help='rutas a pedir (por defecto catálogo + clics AJAX del carrito)')
+    args = parser.parse_args()
+
+    if any(n.startswith('asgi') for n in args.solo) and not importlib.util.find_spec('uvicorn'):
+        parser.error('uvicorn no está instalado (pip install uvicorn).')
+
+    ajax = {'X-Requested-With': 'XMLHttpRequest'}
+    if args.ruta:
+        rutas = [(r, {}) for r in args.ruta]
+    else:
+        rutas = [('/menu/', {}), ('/ofertas/', {})] + [
+            (f'/agregar-carrito/{pid}/', ajax) for pid in range(1, 9)
+        ]
+
+    directorio = Path(tempfile.mkdtemp(prefix='carga_asgi_'))
+    try:
+        entorno = preparar_entorno(directorio, args.productos)
+        print(f'{"servidor":<10} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"errores":>8}')
+        for nombre in args.solo:
+            puerto = puerto_libre()
+            env = dict(entorno, FRUTERIA_VISTAS_ASYNC='1' if nombre == 'asgi' else '0')
+            proceso = subprocess.Popen(comando_servidor(nombre, puerto, args.hilos), env=env, cwd=RAIZ)
+            try:
+                asyncio.run(esperar_servidor(puerto, proceso))
+                latencias, errores, total = asyncio.run(
+                    carga(puerto, rutas, args.concurrencia, args.segundos)
+                )
+            finally:
+                proceso.terminate()
+                proceso.wait(10)
+            if not latencias:
+                print(f'{nombre:<10} {"-":>8} {"-":>8} {"-":>8} {errores:>8}')
+                continue
+            p95 = statistics.quantiles(latencias, n=20)[-1] if len(latencias) > 1 else latencias[0]
+            print(f'{nombre:<10} {len(latencias) / total:>8.0f} {statistics.median(latencias):>8.1f} '
+                  f'{p95:>8.1f} {errores:>8}')
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
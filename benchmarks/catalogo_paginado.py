@@ -0,0 +1,102 @@
+"""
+Tamaño y tiempo de respuesta del menú paginado a medida que crece el catálogo.
+
+Crea una base SQLite temporal y, para cada tamaño de catálogo, mide (sin
+caché, cliente de pruebas de Django en el mismo proceso):
+
+* ``/menu/``                      -> primera página completa;
+* ``/catalogo/menu/pagina/``      -> fragmento del scroll infinito, al fondo
+                                     del catálogo (cursor de la última página);
+* ``/producto/<id>/detalle/``     -> contenido del modal.
+
+Uso (desde la raíz del proyecto):
+
+    python benchmarks/catalogo_paginado.py
+    python benchmarks/catalogo_paginado.py --tamanos 1000 10000 --repeticiones 10
+
+La base db.sqlite3 del proyecto no se toca.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_olivos.settings')
+
+from django.conf import settings  # noqa: E402
+
+
+def configurar_base(ruta):
+    # Debe hacerse antes de django.setup() / la primera conexión
+    settings.DATABASES['default']['NAME'] = ruta
+    settings.ALLOWED_HOSTS = ['testserver']
+    settings.DEBUG = False
+
+
+def medir(cliente, url, repeticiones):
+    from django.core.cache import cache
+
+    tiempos = []
+    for _ in range(repeticiones):
+        cache.clear()
+        inicio = time.perf_counter()
+        respuesta = cliente.get(url)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        assert respuesta.status_code == 200, (url, respuesta.status_code)
+    return len(respuesta.content), sorted(tiempos)[len(tiempos) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        configurar_base(os.path.join(directorio, 'bench.sqlite3'))
+
+        import django
+        from django.core.management import call_command
+        from django.db import connection
+
+        django.setup()
+        from django.test import Client
+        from django.urls import reverse
+
+        from app_fruteria.models import Producto
+        from app_fruteria.paginacion import codificar_cursor
+        from app_fruteria.views import POR_PAGINA
+
+        call_command('migrate', verbosity=0)
+        cliente = Client()
+        existentes = 0
+        print(f'{"productos":>10}  {"ruta":<28} {"bytes":>8} {"p50 ms":>8}')
+        for tamano in sorted(args.tamanos):
+            call_command(
+                'seed_fruteria', semilla=tamano, productos=tamano - existentes, compras=0,
+                ofertas=20, usuarios=0, lineas_por_compra=0, lote=5000, verbosity=0,
+            )
+            existentes = tamano
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            penultimo = Producto.objects.order_by('-nombre', '-id').values('nombre', 'id')[POR_PAGINA]
+            fondo = reverse('pagina_catalogo', args=['menu']) + '?cursor=' + codificar_cursor(
+                'nombre', penultimo['nombre'], penultimo['id']
+            )
+            rutas = [
+                ('/menu/', reverse('menu_virtual')),
+                ('fragmento (última página)', fondo),
+                ('detalle (modal)', reverse('detalle_producto', args=[penultimo['id']])),
+            ]
+            for nombre, url in rutas:
+                total, p50 = medir(cliente, url, args.repeticiones)
+                print(f'{tamano:>10}  {nombre:<28} {total:>8} {p50:>8.2f}')
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""
+Prueba de concurrencia sobre SQLite: checkouts, sesiones y lecturas a la vez.
+
+Cada configuración corre en un subproceso propio contra una copia de la
+misma base temporal (migrada y llenada con ``seed_fruteria``). N hilos
+repiten durante S segundos una mezcla de operaciones como las de una
+petición: ``registrar_compra`` (lee precios, descuenta existencias y escribe
+la compra), crear una sesión y leer una página del catálogo. Al final de
+cada operación se llama ``close_old_connections()``, como hace Django al
+terminar una petición. La columna "agotado" cuenta los checkouts que
+terminaron en SinExistencias (respuesta válida, no error).
+
+* ``antes``     -> configuración anterior: journal DELETE, BEGIN DEFERRED,
+                   sin CONN_MAX_AGE (conexión nueva por petición);
+* ``wal``       -> settings.py actual: WAL, synchronous=NORMAL,
+                   busy_timeout, BEGIN IMMEDIATE y conexiones persistentes;
+* ``wal+fila``  -> lo mismo con FRUTERIA_SQLITE_ESCRITOR_UNICO.
+
+Uso (desde la raíz del proyecto):
+
+    python benchmarks/concurrencia_sqlite.py --hilos 16 --segundos 10
+    python benchmarks/concurrencia_sqlite.py --solo antes wal --mezcla 3:1:6
+
+La base db.sqlite3 del proyecto no se toca.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import textwrap
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+CONFIGURACIONES = {
+    'antes': '''
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS'] = {}
+        FRUTERIA_SQLITE_PRAGMAS = {'journal_mode': 'DELETE'}
+    ''',
+    'wal': '',
+    'wal+fila': '''
+        FRUTERIA_SQLITE_ESCRITOR_UNICO = True
+    ''',
+}
+
+
+def escribir_settings(directorio, nombre, base):
+    modulo = 'settings_' + nombre.replace('+', '_')
+    (directorio / f'{modulo}.py').write_text(textwrap.dedent(f'''
+        from backend_olivos.settings import *  # noqa
+        DEBUG = False
+        DATABASES['default']['NAME'] = {str(base)!r}
+    ''') + textwrap.dedent(CONFIGURACIONES[nombre]))
+    return modulo
+
+
+def entorno_para(directorio, modulo):
+    entorno = dict(os.environ)
+    entorno['PYTHONPATH'] = os.pathsep.join([str(directorio), str(RAIZ), entorno.get('PYTHONPATH', '')])
+    entorno['DJANGO_SETTINGS_MODULE'] = modulo
+    return entorno
+
+
+def preparar_base(directorio, productos):
+    """Base migrada y con datos, en modo DELETE para poder copiarla como un solo archivo."""
+    base = directorio / 'semilla.sqlite3'
+    entorno = entorno_para(directorio, escribir_settings(directorio, 'antes', base))
+    manage = [sys.executable, str(RAIZ / 'manage.py')]
+    subprocess.run(manage + ['migrate', '-v', '0'], env=entorno, check=True)
+    subprocess.run(
+        manage + ['seed_fruteria', '--productos', str(productos), '--compras', '10', '-v', '0'],
+        env=entorno, check=True,
+    )
+    return base
+
+
+def trabajador(hilos, segundos, mezcla):
+    """Corre dentro del subproceso; imprime un JSON con latencias y errores."""
+    import random
+    import threading
+    import time
+
+    import django
+
+    django.setup()
+
+    from django.contrib.auth.models import User
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.db import OperationalError, close_old_connections
+
+    from app_fruteria.models import Producto
+    from app_fruteria.pedidos import SinExistencias, registrar_compra
+
+    cliente = User.objects.order_by('pk').first()
+    ids = list(Producto.objects.values_list('pk', flat=True))
+    close_old_connections()
+
+    def comprar(azar):
+        registrar_compra(cliente, {pid: azar.randint(1, 3) for pid in azar.sample(ids, 3)})
+
+    def sesion(azar):
+        sesion = SessionStore()
+        sesion['carrito'] = {str(azar.choice(ids)): [1, 1000]}
+        sesion.create()
+
+    def leer(azar):
+        list(Producto.objects.with_precio_final().order_by('pk')[:24])
+
+    operaciones = [comprar] * mezcla[0] + [sesion] * mezcla[1] + [leer] * mezcla[2]
+    resultados = {'latencias': [], 'bloqueos': 0, 'agotados': 0, 'otros_errores': 0}
+    candado = threading.Lock()
+    fin = time.monotonic() + segundos
+
+    def hilo(semilla):
+        azar = random.Random(semilla)
+        latencias, bloqueos, agotados, otros = [], 0, 0, 0
+        while time.monotonic() < fin:
+            inicio = time.perf_counter()
+            try:
+                azar.choice(operaciones)(azar)
+            except SinExistencias:
+                # Respuesta válida del checkout: cuenta como operación
+                agotados += 1
+                latencias.append((time.perf_counter() - inicio) * 1000)
+            except OperationalError as e:
+                if 'locked' in str(e):
+                    bloqueos += 1
+                else:
+                    otros += 1
+            else:
+                latencias.append((time.perf_counter() - inicio) * 1000)
+            finally:
+                close_old_connections()
+        with candado:
+            resultados['latencias'] += latencias
+            resultados['bloqueos'] += bloqueos
+            resultados['agotados'] += agotados
+            resultados['otros_errores'] += otros
+
+    inicio = time.monotonic()
+    corriendo = [threading.Thread(target=hilo, args=(i,)) for i in range(hilos)]
+    for t in corriendo:
+        t.start()
+    for t in corriendo:
+        t.join()
+    resultados['segundos'] = time.monotonic() - inicio
+    print(json.dumps(resultados))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--solo', nargs='+', choices=CONFIGURACIONES, default=list(CONFIGURACIONES))
+    parser.add_argument('--hilos', type=int, default=16)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--productos', type=int, default=200)
+    parser.add_argument('--mezcla', default='3:1:6',
+                        help='proporción compras:sesiones:lecturas (por defecto 3:1:6)')
+    parser.add_argument('--trabajador', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    mezcla = [int(x) for x in args.mezcla.split(':')]
+
+    if args.trabajador:
+        trabajador(args.hilos, args.segundos, mezcla)
+        return
+
+    directorio = Path(tempfile.mkdtemp(prefix='concurrencia_sqlite_'))
+    try:
+        semilla = preparar_base(directorio, args.productos)
+        print(f'{"config":<9} {"ops/s":>8} {"p50 ms":>8} {"p99 ms":>8} {"locked":>8} {"agotado":>8} {"otros":>6}')
+        for nombre in args.solo:
+            base = directorio / f'{nombre.replace("+", "_")}.sqlite3'
+            shutil.copyfile(semilla, base)
+            entorno = entorno_para(directorio, escribir_settings(directorio, nombre, base))
+            salida = subprocess.run(
+                [sys.executable, __file__, '--trabajador', '--hilos', str(args.hilos),
+                 '--segundos', str(args.segundos), '--mezcla', args.mezcla],
+                env=entorno, cwd=RAIZ, check=True, capture_output=True, text=True,
+            ).stdout
+            r = json.loads(salida.strip().splitlines()[-1])
+            latencias = r['latencias']
+            if len(latencias) < 2:
+                print(f'{nombre:<9} {"-":>8} {"-":>8} {"-":>8} {r["bloqueos"]:>8} {r["agotados"]:>8} '
+                      f'{r["otros_errores"]:>6}')
+                continue
+            p99 = statistics.quantiles(latencias, n=100)[-1]
+            print(f'{nombre:<9} {len(latencias) / r["segundos"]:>8.0f} {statistics.median(latencias):>8.1f} '
+                  f'{p99:>8.1f} {r["bloqueos"]:>8} {r["agotados"]:>8} {r["otros_errores"]:>6}')
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
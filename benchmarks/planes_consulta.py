@@ -0,0 +1,137 @@
+"""
+Planes de consulta y tiempos antes/después de la migración 0002 (índices).
+
+Crea una base SQLite temporal con todas las migraciones, la llena con datos
+sintéticos (``manage.py seed_fruteria``, que usa los modelos actuales), y
+mide EXPLAIN QUERY PLAN y el tiempo de las consultas frecuentes sin los
+índices de 0002 (se borran con DROP INDEX) y después de volver a crearlos
+con el mismo SQL.
+
+Uso (desde la raíz del proyecto):
+
+    python benchmarks/planes_consulta.py                       # 100k productos / 1M compras
+    python benchmarks/planes_consulta.py --productos 5000 --compras 20000
+
+La base db.sqlite3 del proyecto no se toca.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_olivos.settings')
+
+from django.conf import settings  # noqa: E402
+
+
+def configurar_base(ruta):
+    # Debe hacerse antes de django.setup() / la primera conexión
+    settings.DATABASES['default']['NAME'] = ruta
+
+
+# Índices que agregó la migración 0002 (los que sigan existiendo; 0008 quitó
+# compra_cliente_id_idx)
+INDICES_0002 = (
+    'oferta_vigencia_idx',
+    'producto_nombre_idx',
+    'producto_categoria_nombre_idx',
+    'auth_user_username_lower_idx',
+    'auth_user_email_lower_idx',
+)
+
+
+def quitar_indices(cursor):
+    """Borra los índices de 0002 y devuelve su CREATE INDEX para recrearlos."""
+    marcadores = ', '.join(['%s'] * len(INDICES_0002))
+    cursor.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND name IN ({marcadores})",
+        INDICES_0002,
+    )
+    creados = cursor.fetchall()
+    for nombre, _sql in creados:
+        cursor.execute(f'DROP INDEX {nombre}')
+    return [sql for _nombre, sql in creados]
+
+
+def poblar(productos, compras):
+    from django.core.management import call_command
+
+    call_command(
+        'seed_fruteria', semilla=7, productos=productos, compras=compras,
+        ofertas=200, usuarios=1000, lineas_por_compra=0, lote=5000, verbosity=0,
+    )
+
+
+def consultas():
+    """Consultas de las rutas calientes (mismo código que usan las vistas)."""
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+
+    from app_fruteria.backends import EmailOrUsernameBackend
+    from app_fruteria.models import Compra, Producto
+
+    hoy = timezone.localdate()
+    compra = Compra.objects.order_by('-id').values('id', 'cliente_id').first()
+    usuario = User.objects.order_by('-id').values_list('username', flat=True).first()
+    return {
+        'menu (ORDER BY nombre)': Producto.objects.catalogo().order_by('nombre')[:50],
+        'categoría Cítricas': Producto.objects.catalogo().filter(categoria__nombre='Cítricas').order_by('nombre')[:50],
+        'ofertas vigentes': Producto.objects.catalogo(hoy).en_oferta(hoy).order_by('nombre'),
+        'orden_confirmada (id, cliente)': Compra.objects.filter(id=compra['id'], cliente_id=compra['cliente_id']),
+        'login (username/email)': EmailOrUsernameBackend.usuarios_por_login(usuario.upper()),
+    }
+
+
+def medir(titulo, repeticiones):
+    print(f'\n===== {titulo} =====')
+    for nombre, qs in consultas().items():
+        plan = qs.explain()
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            list(qs.all())
+        ms = (time.perf_counter() - inicio) * 1000 / repeticiones
+        print(f'\n-- {nombre}: {ms:.2f} ms')
+        for linea in plan.splitlines():
+            print(f'   {linea}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN QUERY PLAN sin/con los índices de 0002')
+    parser.add_argument('--productos', type=int, default=100_000)
+    parser.add_argument('--compras', type=int, default=1_000_000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        configurar_base(os.path.join(directorio, 'bench.sqlite3'))
+
+        import django
+        from django.core.management import call_command
+        from django.db import connection
+
+        django.setup()
+        call_command('migrate', verbosity=0)
+
+        inicio = time.perf_counter()
+        poblar(args.productos, args.compras)
+        print(f'Datos sintéticos: {args.productos} productos, {args.compras} compras '
+              f'({time.perf_counter() - inicio:.1f} s)')
+
+        with connection.cursor() as cursor:
+            crear = quitar_indices(cursor)
+            cursor.execute('ANALYZE')
+        medir('ANTES (sin los índices de 0002)', args.repeticiones)
+
+        with connection.cursor() as cursor:
+            for sql in crear:
+                cursor.execute(sql)
+            cursor.execute('ANALYZE')
+        medir('DESPUÉS (con los índices de 0002)', args.repeticiones)
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()